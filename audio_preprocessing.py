@@ -0,0 +1,183 @@
+# audio_preprocessing.py
+import os
+import time
+import logging
+import tempfile
+
+try:
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence, detect_silence, split_on_silence
+except ImportError:  # pydub missing: recordings are uploaded as-is
+    AudioSegment = None
+
+TARGET_SAMPLE_RATE = int(os.environ.get("AUDIO_SAMPLE_RATE", 16000))
+UPLOAD_FORMAT = os.environ.get("AUDIO_UPLOAD_FORMAT", "mp3")
+UPLOAD_BITRATE = os.environ.get("AUDIO_UPLOAD_BITRATE", "32k")
+
+# Silence is anything this many dB below the recording's average loudness
+SILENCE_OFFSET_DB = 16
+# Keep this much audio around speech so word onsets are not clipped
+EDGE_PADDING_MS = 200
+# Internal pauses longer than this are shortened to PAUSE_KEEP_MS
+MAX_PAUSE_MS = 1000
+PAUSE_KEEP_MS = 300
+# Silence detection resolution; 1 ms steps are far too slow for long recordings
+SEEK_STEP_MS = 10
+
+
+class PreparedAudio:
+    """Path of the audio to upload plus what preprocessing saved"""
+
+    def __init__(self, path, original_path, original_bytes, processed_bytes,
+                 original_duration, processed_duration, seconds):
+        self.path = path
+        self.original_path = original_path
+        self.original_bytes = original_bytes
+        self.processed_bytes = processed_bytes
+        self.original_duration = original_duration
+        self.processed_duration = processed_duration
+        self.seconds = seconds
+
+    @property
+    def is_temporary(self):
+        return self.path != self.original_path
+
+    def stats(self):
+        return {
+            "original_bytes": self.original_bytes,
+            "processed_bytes": self.processed_bytes,
+            "bytes_saved": self.original_bytes - self.processed_bytes,
+            "original_duration_s": self.original_duration,
+            "processed_duration_s": self.processed_duration,
+            "duration_saved_s": (round(self.original_duration - self.processed_duration, 3)
+                                 if self.original_duration is not None else None),
+            "seconds": round(self.seconds, 4),
+        }
+
+    def cleanup(self):
+        """Remove the temporary upload file, if one was created"""
+        if self.is_temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _silence_threshold(audio):
+    # dBFS of pure silence is -inf; fall back to a fixed floor
+    if audio.dBFS == float("-inf"):
+        return -50.0
+    return audio.dBFS - SILENCE_OFFSET_DB
+
+
+def trim_silence(audio):
+    """Drop leading/trailing silence and shorten long pauses"""
+    threshold = _silence_threshold(audio)
+    start = detect_leading_silence(audio, silence_threshold=threshold)
+    end = len(audio) - detect_leading_silence(audio.reverse(), silence_threshold=threshold)
+    if end <= start:
+        return audio  # all silence; let the STT model decide
+    audio = audio[max(0, start - EDGE_PADDING_MS):min(len(audio), end + EDGE_PADDING_MS)]
+
+    chunks = split_on_silence(audio, min_silence_len=MAX_PAUSE_MS, silence_thresh=threshold,
+                              keep_silence=PAUSE_KEEP_MS // 2, seek_step=SEEK_STEP_MS)
+    if len(chunks) > 1:
+        joined = chunks[0]
+        for chunk in chunks[1:]:
+            joined += chunk
+        audio = joined
+    return audio
+
+
+def split_on_pauses(audio, chunk_ms, overlap_ms=500, min_pause_ms=300):
+    """Split audio into pieces of at most ~chunk_ms, cutting in pauses where possible.
+
+    Each piece extends overlap_ms past its cut points so words at a seam are
+    heard whole by at least one piece. Returns (start_ms, segment) pairs.
+    """
+    if len(audio) <= chunk_ms:
+        return [(0, audio)]
+    pauses = detect_silence(audio, min_silence_len=min_pause_ms,
+                            silence_thresh=_silence_threshold(audio), seek_step=SEEK_STEP_MS)
+    midpoints = [(start + end) // 2 for start, end in pauses]
+
+    pieces = []
+    start = 0
+    while len(audio) - start > chunk_ms:
+        # Cut at the last pause in the back half of the window, or hard-cut
+        candidates = [m for m in midpoints if start + chunk_ms // 2 <= m <= start + chunk_ms]
+        cut = candidates[-1] if candidates else start + chunk_ms
+        begin = max(0, start - overlap_ms)
+        pieces.append((begin, audio[begin:cut + overlap_ms]))
+        start = cut
+    begin = max(0, start - overlap_ms)
+    pieces.append((begin, audio[begin:]))
+    return pieces
+
+
+def _export(segment, upload_format, bitrate):
+    fd, out_path = tempfile.mkstemp(suffix=f".{upload_format}", prefix="stt_upload_")
+    os.close(fd)
+    export_args = {"format": upload_format}
+    if upload_format not in ("wav", "flac"):
+        export_args["bitrate"] = bitrate
+    try:
+        segment.export(out_path, **export_args)
+    except Exception:
+        os.remove(out_path)
+        raise
+    return out_path
+
+
+def export_segment(segment, upload_format=None, bitrate=None):
+    """Write segment to a temporary upload file, falling back to WAV if the codec is unavailable"""
+    upload_format = upload_format or UPLOAD_FORMAT
+    try:
+        return _export(segment, upload_format, bitrate or UPLOAD_BITRATE)
+    except Exception as e:
+        if upload_format == "wav":
+            raise
+        logging.warning(f"Could not export {upload_format} ({e}), uploading WAV instead")
+        return _export(segment, "wav", None)
+
+
+def prepare_audio(audio_filepath, sample_rate=None, upload_format=None, bitrate=None):
+    """Trim silence, downmix to mono, resample and re-encode a recording for upload.
+
+    Falls back to the original file if pydub/ffmpeg cannot decode it or the
+    processed file would not be smaller.
+    """
+    sample_rate = sample_rate or TARGET_SAMPLE_RATE
+    upload_format = upload_format or UPLOAD_FORMAT
+    bitrate = bitrate or UPLOAD_BITRATE
+    start = time.perf_counter()
+    original_bytes = os.path.getsize(audio_filepath)
+
+    def unchanged(duration=None):
+        return PreparedAudio(audio_filepath, audio_filepath, original_bytes, original_bytes,
+                             duration, duration, time.perf_counter() - start)
+
+    if AudioSegment is None:
+        return unchanged()
+
+    try:
+        audio = AudioSegment.from_file(audio_filepath)
+    except Exception as e:
+        logging.warning(f"Audio preprocessing skipped, could not decode {audio_filepath}: {e}")
+        return unchanged()
+
+    original_duration = round(len(audio) / 1000, 3)
+    try:
+        processed = trim_silence(audio).set_channels(1).set_frame_rate(sample_rate)
+        out_path = _export(processed, upload_format, bitrate)
+    except Exception as e:
+        logging.warning(f"Audio preprocessing failed, uploading original: {e}")
+        return unchanged(original_duration)
+
+    processed_bytes = os.path.getsize(out_path)
+    if processed_bytes >= original_bytes:
+        os.remove(out_path)
+        return unchanged(original_duration)
+
+    prepared = PreparedAudio(out_path, audio_filepath, original_bytes, processed_bytes,
+                             original_duration, round(len(processed) / 1000, 3),
+                             time.perf_counter() - start)
+    logging.info(f"Prepared audio {os.path.basename(audio_filepath)}: {prepared.stats()}")
+    return prepared
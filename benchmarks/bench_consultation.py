@@ -0,0 +1,219 @@
+# benchmarks/bench_consultation.py
+"""Offline benchmark of every consultation stage and the full path.
+
+Replays the repo's sample inputs (acne.jpg, patient_voice_test_for_patient.mp3,
+recording.mp3) against a local fake Groq server and a stubbed gTTS backend,
+both with configurable injected latency. It then runs full consultations
+through the UI's handler at several concurrency levels, optionally in job
+or streaming mode. Results are written as JSON so runs from
+different versions can be compared:
+
+    python benchmarks/bench_consultation.py --output before.json
+    python benchmarks/bench_consultation.py --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import resource
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+IMAGE_FIXTURES = [os.path.join(REPO_ROOT, "acne.jpg")]
+AUDIO_FIXTURES = [os.path.join(REPO_ROOT, name)
+                  for name in ("patient_voice_test_for_patient.mp3", "recording.mp3")]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed=None):
+    values = sorted(latencies)
+    summary = {
+        "count": len(values),
+        "p50_s": round(percentile(values, 50), 4) if values else None,
+        "p95_s": round(percentile(values, 95), 4) if values else None,
+        "p99_s": round(percentile(values, 99), 4) if values else None,
+        "max_s": round(values[-1], 4) if values else None,
+    }
+    if elapsed:
+        summary["throughput_per_s"] = round(len(values) / elapsed, 3)
+    return summary
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def time_calls(func, iterations):
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_stages(workdir, iterations):
+    from image_preprocessing import prepare_image
+    from brain_of_the_doctor import analyze_image_with_query, translate_text
+    from voice_of_the_patient import transcribe_with_groq
+    from voice_of_the_doctor import text_to_speech_with_gtts
+    from database import save_consultation
+    from consultation import system_prompt, STT_MODEL, VISION_MODEL
+
+    key = os.environ["GROQ_API_KEY"]
+    image = prepare_image(IMAGE_FIXTURES[0])
+    results = {}
+
+    for path in IMAGE_FIXTURES:
+        results[f"encode_image[{os.path.basename(path)}]"] = time_calls(lambda i: prepare_image(path), iterations)
+    for path in AUDIO_FIXTURES:
+        results[f"transcribe[{os.path.basename(path)}]"] = time_calls(
+            lambda i: transcribe_with_groq(STT_MODEL, path, key), iterations)
+    results["translate"] = time_calls(
+        lambda i: translate_text(f"Mere chehre par daane hain {i}", "hi", "en", key, use_cache=False), iterations)
+    results["analyze"] = time_calls(
+        lambda i: analyze_image_with_query(f"{system_prompt}\n\nPatient says: rash", VISION_MODEL,
+                                           image.data, mime_type=image.mime_type), iterations)
+    results["tts"] = time_calls(
+        lambda i: text_to_speech_with_gtts(f"Please keep the area clean {i}.",
+                                           os.path.join(workdir, f"stage_tts_{i}.mp3"), use_cache=False),
+        iterations)
+    results["save"] = time_calls(
+        lambda i: save_consultation(1, AUDIO_FIXTURES[0], IMAGE_FIXTURES[0], "speech", "response",
+                                    "r.mp3", "English"), iterations)
+    return results
+
+
+def bench_end_to_end(workdir, concurrency, requests, language):
+    """Consultations driven through the UI handler, as a browser session would.
+
+    process_inputs goes through the job queue, streaming and media store
+    paths selected by JOB_MODE, STREAMING_TTS and STREAMING_ANALYSIS, so
+    the benchmark measures whichever mode the app would run in.
+    """
+    from gradio_app import process_inputs
+
+    def one(i):
+        user_state = {"user_id": 1 + i % 20, "full_name": f"Bench User {1 + i % 20}"}
+        start = time.perf_counter()
+        first_response = None
+        for _, response, _, _ in process_inputs(random.choice(AUDIO_FIXTURES), random.choice(IMAGE_FIXTURES),
+                                                language, user_state):
+            if response and first_response is None:
+                first_response = time.perf_counter() - start
+        return time.perf_counter() - start, first_response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    result = summarize([total for total, _ in samples], elapsed)
+    result["first_response"] = summarize([first for _, first in samples if first is not None])
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous_path):
+    """Print p50/p95 and throughput deltas against an earlier results file"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nComparison with {previous_path} ({previous.get('revision')}):")
+    for section in ("stages", "end_to_end"):
+        for name, now in current[section].items():
+            before = previous.get(section, {}).get(name)
+            if not before:
+                continue
+            for metric in ("p50_s", "p95_s", "throughput_per_s"):
+                if now.get(metric) is None or not before.get(metric):
+                    continue
+                change = (now[metric] - before[metric]) / before[metric] * 100
+                print(f"  {section}/{name} {metric}: {before[metric]} -> {now[metric]} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline consultation benchmark")
+    parser.add_argument("--groq-latency", type=float, default=0.3, help="Injected latency per Groq call (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="Injected base latency per gTTS call (s)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Consultations per concurrency level")
+    parser.add_argument("--iterations", type=int, default=5, help="Calls per stage benchmark")
+    parser.add_argument("--language", default="Hindi", choices=["English", "Hindi"])
+    parser.add_argument("--job-mode", action="store_true", help="Run end-to-end consultations on the job queue")
+    parser.add_argument("--streaming-tts", action="store_true", help="Stream the doctor's voice sentence by sentence")
+    parser.add_argument("--streaming-analysis", action="store_true", help="Stream the analysis token by token")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    random.seed(1234)
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_bench_")
+    output = os.path.abspath(args.output) if args.output else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    # The database and caches live relative to the working directory
+    os.chdir(workdir)
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    # The UI reads its mode flags at import time
+    for flag, enabled in (("JOB_MODE", args.job_mode), ("STREAMING_TTS", args.streaming_tts),
+                          ("STREAMING_ANALYSIS", args.streaming_analysis)):
+        if enabled:
+            os.environ[flag] = "1"
+
+    from fake_groq_server import FakeGroqServer
+    from fake_gtts import install
+    install(base_latency=args.tts_latency)
+
+    try:
+        with FakeGroqServer(latency=args.groq_latency, unique=True) as server:
+            from groq_client import configure_client_manager
+            configure_client_manager(base_url=server.base_url)
+
+            results = {
+                "revision": git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "config": vars(args),
+                "stages": bench_stages(workdir, args.iterations),
+                "end_to_end": {},
+            }
+            for level in (int(c) for c in args.concurrency.split(",")):
+                results["end_to_end"][f"concurrency_{level}"] = bench_end_to_end(
+                    workdir, level, args.requests, args.language)
+            results["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    if compare_path:
+        compare(results, compare_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_fused_hindi.py
+"""Latency of Hindi consultations: separate translation calls vs fused analysis.
+
+Runs the same Hindi consultations through the default path
+(transcribe -> translate -> analyze -> translate) and the fused path
+(transcribe -> bilingual analyze) against the fake Groq server.
+
+    python benchmarks/bench_fused_hindi.py --groq-latency 0.4 --requests 16
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_consultation import REPO_ROOT, IMAGE_FIXTURES, AUDIO_FIXTURES, summarize
+
+CHAT_PATH = "/openai/v1/chat/completions"
+
+
+def run_mode(server, workdir, fused, concurrency, requests):
+    from consultation import run_consultation
+
+    def one(i):
+        start = time.perf_counter()
+        run_consultation(
+            user_id=1,
+            audio_filepath=AUDIO_FIXTURES[i % len(AUDIO_FIXTURES)],
+            image_filepath=IMAGE_FIXTURES[0],
+            language="Hindi",
+            audio_response_path=os.path.join(workdir, f"{'fused' if fused else 'split'}_{concurrency}_{i}.mp3"),
+            fused=fused,
+        )
+        return time.perf_counter() - start
+
+    calls_before = server.requests.get(CHAT_PATH, 0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["chat_calls_per_consultation"] = round((server.requests.get(CHAT_PATH, 0) - calls_before) / requests, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused vs split Hindi consultation benchmark")
+    parser.add_argument("--groq-latency", type=float, default=0.4, help="Injected latency per Groq call (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="Injected base latency per gTTS call (s)")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="Consultations per mode and level")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_fused_")
+    os.chdir(workdir)
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+    from fake_groq_server import FakeGroqServer
+    from fake_gtts import install
+    install(base_latency=args.tts_latency)
+
+    results = {}
+    try:
+        # unique replies keep the translation cache from hiding the extra calls
+        with FakeGroqServer(latency=args.groq_latency, unique=True) as server:
+            from groq_client import configure_client_manager
+            configure_client_manager(base_url=server.base_url)
+            for level in (int(c) for c in args.concurrency.split(",")):
+                split = run_mode(server, workdir, False, level, args.requests)
+                fused = run_mode(server, workdir, True, level, args.requests)
+                results[f"concurrency_{level}"] = {
+                    "split": split,
+                    "fused": fused,
+                    "p50_reduction_pct": round((1 - fused["p50_s"] / split["p50_s"]) * 100, 1),
+                }
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
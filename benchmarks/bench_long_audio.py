@@ -0,0 +1,92 @@
+# benchmarks/bench_long_audio.py
+"""Single-call vs chunked parallel transcription by recording length.
+
+Builds synthetic speech-like recordings (tone bursts separated by pauses)
+of several lengths and transcribes each against the fake Groq server, whose
+transcription latency grows with upload size like a real STT service.
+
+    python benchmarks/bench_long_audio.py --lengths 30,60,120,300 --per-mb-latency 2.0
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def synthetic_recording(seconds, path):
+    """Alternate 1-4 s "utterances" with 0.3-1.2 s pauses, like someone describing symptoms"""
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+
+    audio = AudioSegment.silent(duration=500, frame_rate=16000)
+    while len(audio) < seconds * 1000:
+        tone = Sine(random.choice((180, 220, 260))).to_audio_segment(duration=random.randint(1000, 4000))
+        audio += tone.set_frame_rate(16000) - 12
+        audio += AudioSegment.silent(duration=random.randint(300, 1200), frame_rate=16000)
+    audio[:seconds * 1000].set_channels(1).export(path, format="wav")
+
+
+def time_transcription(path, long_audio, repeats):
+    from voice_of_the_patient import transcribe_with_groq
+    from consultation import STT_MODEL
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        transcribe_with_groq(STT_MODEL, path, os.environ["GROQ_API_KEY"], long_audio=long_audio)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return round(latencies[len(latencies) // 2], 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-audio transcription benchmark")
+    parser.add_argument("--lengths", default="30,60,120,300", help="Recording lengths in seconds")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fixed latency per STT call (s)")
+    parser.add_argument("--per-mb-latency", type=float, default=2.0, help="Extra STT latency per MB uploaded (s)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(1234)
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    # WAV needs no ffmpeg, so the benchmark runs anywhere pydub does
+    os.environ.setdefault("AUDIO_UPLOAD_FORMAT", "wav")
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_long_audio_")
+
+    from fake_groq_server import FakeGroqServer
+    from groq_client import configure_client_manager
+
+    results = {}
+    try:
+        with FakeGroqServer(latency=args.latency, per_mb_latency=args.per_mb_latency) as server:
+            configure_client_manager(base_url=server.base_url)
+            for seconds in (int(s) for s in args.lengths.split(",")):
+                path = os.path.join(workdir, f"recording_{seconds}s.wav")
+                synthetic_recording(seconds, path)
+                before = server.requests.get("/openai/v1/audio/transcriptions", 0)
+                single = time_transcription(path, False, args.repeats)
+                middle = server.requests.get("/openai/v1/audio/transcriptions", 0)
+                chunked = time_transcription(path, True, args.repeats)
+                after = server.requests.get("/openai/v1/audio/transcriptions", 0)
+                results[f"{seconds}s"] = {
+                    "single_p50_s": single,
+                    "chunked_p50_s": chunked,
+                    "speedup": round(single / chunked, 2) if chunked else None,
+                    "calls_single": (middle - before) // args.repeats,
+                    "calls_chunked": (after - middle) // args.repeats,
+                }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/bench_search.py
+"""FTS5 consultation search vs LIKE scans on a large synthetic database.
+
+Builds a database of synthetic English and Hindi consultations through the
+real migrations (so the FTS triggers index every insert), then times the
+same per-user and rare-term queries with search_consultations() and with
+the LIKE '%term%' scan it replaces.
+
+    python benchmarks/bench_search.py --rows 1000000 --users 2000
+    python benchmarks/bench_search.py --db big.db --reuse   # skip the build
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_consultation import summarize
+
+ENGLISH_WORDS = ("rash itchy red bumps skin face arm leg swelling pain fever acne eczema psoriasis "
+                 "dry patches burning spots pimples infection allergy blister scaly flaky cream "
+                 "moisturize dermatitis fungal ringworm hives sunburn mole wound bleeding").split()
+HINDI_WORDS = ("मेरे चेहरे पर दाने हैं खुजली हो रही है लाल त्वचा सूजन दर्द बुखार हाथ पैर "
+               "जलन धब्बे फुंसी संक्रमण एलर्जी छाले सूखी पपड़ी क्रीम घाव खून").split()
+# Appear in roughly 1 in 10,000 consultations
+RARE_TERMS = ["melanoma", "vitiligo", "सोरायसिस"]
+RESPONSE = ("With what I see, I think you have {a}. It could also be {b}; keep the area clean, "
+            "avoid scratching and apply a gentle {c} twice a day.")
+
+SQL_LIKE = '''SELECT id, timestamp, language, patient_speech, doctor_response
+              FROM consultations
+              WHERE user_id = ? AND (patient_speech LIKE ? OR doctor_response LIKE ?)
+              ORDER BY timestamp DESC, id DESC
+              LIMIT ?'''
+
+
+def synthetic_rows(count, users, rnd, heavy_share):
+    for _ in range(count):
+        hindi = rnd.random() < 0.4
+        words = HINDI_WORDS if hindi else ENGLISH_WORDS
+        speech = " ".join(rnd.choices(words, k=rnd.randint(8, 30)))
+        if rnd.random() < 1e-4:
+            speech += " " + rnd.choice(RARE_TERMS)
+        response = RESPONSE.format(a=rnd.choice(ENGLISH_WORDS), b=rnd.choice(ENGLISH_WORDS),
+                                   c=rnd.choice(ENGLISH_WORDS))
+        # User 1 stands in for a clinic account holding a large share of all rows
+        user_id = 1 if rnd.random() < heavy_share else rnd.randint(2, users)
+        yield (user_id, None, None, speech, response, None, "Hindi" if hindi else "English")
+
+
+def build(database, rows, users, heavy_share, batch=20000):
+    rnd = random.Random(42)
+    start = time.perf_counter()
+    generator = synthetic_rows(rows, users, rnd, heavy_share)
+    with database._get_pool().connection() as conn:
+        while True:
+            chunk = [row for _, row in zip(range(batch), generator)]
+            if not chunk:
+                break
+            conn.executemany(database.SQL_INSERT_CONSULTATION, chunk)
+    return time.perf_counter() - start
+
+
+def time_queries(func, queries, repeat):
+    latencies = []
+    results = 0
+    for _ in range(repeat):
+        for args in queries:
+            start = time.perf_counter()
+            results += len(func(*args))
+            latencies.append(time.perf_counter() - start)
+    summary = summarize(latencies)
+    summary["results"] = results
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 vs LIKE consultation search")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--heavy-share", type=float, default=0.05,
+                        help="Fraction of rows owned by user 1, a clinic-sized history")
+    parser.add_argument("--queries", type=int, default=50, help="Random (user, term) pairs per workload")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", help="Database path (default: a temp file)")
+    parser.add_argument("--reuse", action="store_true", help="Use an existing --db instead of building one")
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    import database
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="ai_doctor_search_"), "search.db")
+    if os.path.exists(db_path) and not args.reuse:
+        sys.exit(f"{db_path} exists; pass --reuse to benchmark it as is")
+    database.init_database(db_path)
+
+    results = {"config": vars(args)}
+    if not args.reuse:
+        results["build_s"] = round(build(database, args.rows, args.users, args.heavy_share), 2)
+        with database._get_pool().connection() as conn:
+            conn.execute("INSERT INTO consultations_fts (consultations_fts) VALUES ('optimize')")
+    results["db_mb"] = round(os.path.getsize(db_path) / 1e6, 1)
+
+    start = time.perf_counter()
+    database.rebuild_search_index()
+    results["rebuild_s"] = round(time.perf_counter() - start, 2)
+
+    rnd = random.Random(7)
+    workloads = {
+        "user_common_term": [(rnd.randint(2, args.users), rnd.choice(ENGLISH_WORDS[:12]))
+                             for _ in range(args.queries)],
+        "user_hindi_term": [(rnd.randint(2, args.users), rnd.choice(HINDI_WORDS))
+                            for _ in range(args.queries)],
+        "user_two_terms": [(rnd.randint(2, args.users), " ".join(rnd.sample(ENGLISH_WORDS, 2)))
+                           for _ in range(args.queries)],
+        "user_rare_term": [(rnd.randint(2, args.users), rnd.choice(RARE_TERMS))
+                           for _ in range(args.queries)],
+        "clinic_common_term": [(1, rnd.choice(ENGLISH_WORDS[:12])) for _ in range(args.queries)],
+        "clinic_rare_term": [(1, rnd.choice(RARE_TERMS)) for _ in range(args.queries)],
+    }
+
+    def fts(user_id, term):
+        return database.search_consultations(user_id, term, limit=20)
+
+    def like(user_id, term):
+        # A LIKE scan matches one phrase, so multi-word queries only need the first word here
+        pattern = f"%{term.split()[0]}%"
+        with database._get_pool().connection() as conn:
+            return conn.execute(SQL_LIKE, (user_id, pattern, pattern, 20)).fetchall()
+
+    def like_all_users(user_id, term):
+        pattern = f"%{term.split()[0]}%"
+        with database._get_pool().connection() as conn:
+            return conn.execute("SELECT id FROM consultations WHERE patient_speech LIKE ? LIMIT 20",
+                                (pattern,)).fetchall()
+
+    def fts_all_users(user_id, term):
+        with database._get_pool().connection() as conn:
+            return conn.execute("SELECT rowid FROM consultations_fts WHERE consultations_fts MATCH ? "
+                                "ORDER BY rank LIMIT 20", (database.search_query(term),)).fetchall()
+
+    results["queries"] = {}
+    for name, queries in workloads.items():
+        results["queries"][name] = {
+            "fts": time_queries(fts, queries, args.repeat),
+            "like": time_queries(like, queries, args.repeat),
+        }
+    rare = workloads["user_rare_term"]
+    results["queries"]["global_rare_term"] = {
+        "fts": time_queries(fts_all_users, rare, args.repeat),
+        "like": time_queries(like_all_users, rare, 1),
+    }
+
+    for name, pair in results["queries"].items():
+        pair["p50_speedup"] = round(pair["like"]["p50_s"] / max(pair["fts"]["p50_s"], 1e-6), 1)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
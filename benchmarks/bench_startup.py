@@ -0,0 +1,120 @@
+# benchmarks/bench_startup.py
+"""Cold-start import time of the app and worker modules.
+
+Each import runs in a fresh interpreter (from a scratch working directory,
+so nothing touches the real database), repeated and summarized by median.
+--baseline also measures an earlier git revision for comparison, and
+--profile prints the slowest imports from python -X importtime.
+
+    python benchmarks/bench_startup.py --baseline HEAD~1 --profile gradio_app
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("consultation", "jobs", "gradio_app")
+IMPORT_TIMEOUT = 120
+
+# Trees from before the app factory launch the server when gradio_app is
+# imported. Turn Blocks.launch into a no-op as soon as gradio is loaded,
+# without importing gradio up front, which would hide its import cost.
+NO_LAUNCH = """
+import sys, builtins
+_import = builtins.__import__
+def _no_launch_import(*args, **kwargs):
+    module = _import(*args, **kwargs)
+    blocks = sys.modules.get("gradio.blocks")
+    if blocks is not None and hasattr(blocks, "Blocks"):
+        blocks.Blocks.launch = lambda self, *a, **k: None
+        builtins.__import__ = _import
+    return module
+builtins.__import__ = _no_launch_import
+"""
+
+
+def _run(args, workdir, what):
+    try:
+        return subprocess.run(args, cwd=workdir, capture_output=True, text=True, timeout=IMPORT_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        print(f"{what} timed out after {IMPORT_TIMEOUT} s", file=sys.stderr)
+        return None
+
+
+def time_import(tree, module, workdir):
+    """Seconds to import module in a fresh interpreter, or None if it fails or times out"""
+    code = (NO_LAUNCH + "sys.path.insert(0, sys.argv[1])\nimport time\nstart = time.perf_counter()\n"
+            f"import {module}\nprint(time.perf_counter() - start)")
+    proc = _run([sys.executable, "-c", code, tree], workdir, f"Importing {module} from {tree}")
+    if proc is None or proc.returncode != 0:
+        return None
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(tree, repeats, workdir):
+    results = {}
+    for module in MODULES:
+        samples = [time_import(tree, module, workdir) for _ in range(repeats)]
+        samples = [s for s in samples if s is not None]
+        results[module] = round(statistics.median(samples), 4) if samples else None
+    return results
+
+
+def import_profile(tree, module, workdir, top):
+    """(cumulative_us, self_us, name) of the slowest imports"""
+    code = NO_LAUNCH + f"sys.path.insert(0, sys.argv[1])\nimport {module}"
+    proc = _run([sys.executable, "-X", "importtime", "-c", code, tree], workdir, f"Profiling {module}")
+    if proc is None:
+        return []
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def export_revision(revision, dest):
+    archive = subprocess.run(["git", "archive", revision], cwd=REPO_ROOT, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", dest], input=archive.stdout, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", help="Git revision to compare against, e.g. HEAD~1")
+    parser.add_argument("--profile", metavar="MODULE", help="Print the slowest imports of MODULE")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_startup_")
+    try:
+        results = {"current": measure(REPO_ROOT, args.repeats, workdir)}
+        if args.baseline:
+            baseline_tree = os.path.join(workdir, "baseline")
+            os.mkdir(baseline_tree)
+            export_revision(args.baseline, baseline_tree)
+            results["baseline"] = measure(baseline_tree, args.repeats, workdir)
+            results["reduction_pct"] = {
+                module: round((1 - results["current"][module] / before) * 100, 1)
+                for module, before in results["baseline"].items()
+                if before and results["current"].get(module)
+            }
+        print(json.dumps(results, indent=2))
+
+        if args.profile:
+            print(f"\nSlowest imports for {args.profile} (cumulative ms / self ms):")
+            for cumulative_us, self_us, name in import_profile(REPO_ROOT, args.profile, workdir, args.top):
+                print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
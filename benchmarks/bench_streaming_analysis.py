@@ -0,0 +1,83 @@
+# benchmarks/bench_streaming_analysis.py
+"""Perceived latency of streamed vs buffered doctor responses.
+
+Measures when the patient first sees analysis text and first hears audio,
+plus total time, for run_consultation (everything appears at the end)
+and stream_consultation (tokens and per-sentence audio as they are ready).
+
+    python benchmarks/bench_streaming_analysis.py --token-latency 0.03 --language Hindi
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from bench_consultation import REPO_ROOT, IMAGE_FIXTURES, AUDIO_FIXTURES, summarize
+
+
+def buffered(workdir, i, language):
+    from consultation import run_consultation
+
+    start = time.perf_counter()
+    run_consultation(1, AUDIO_FIXTURES[0], IMAGE_FIXTURES[0], language,
+                     os.path.join(workdir, f"buffered_{i}.mp3"))
+    total = time.perf_counter() - start
+    return total, total, total
+
+
+def streamed(workdir, i, language):
+    from consultation import stream_consultation
+
+    start = time.perf_counter()
+    first_text = first_audio = None
+    for update in stream_consultation(1, AUDIO_FIXTURES[0], IMAGE_FIXTURES[0], language,
+                                      os.path.join(workdir, f"streamed_{i}.mp3")):
+        now = time.perf_counter() - start
+        if first_text is None and update["display_doctor_response"]:
+            first_text = now
+        if first_audio is None and update["audio"]:
+            first_audio = now
+    return first_text, first_audio, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamed vs buffered analysis benchmark")
+    parser.add_argument("--groq-latency", type=float, default=0.3, help="Injected latency per Groq call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.03, help="Delay between streamed words (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="Injected base latency per gTTS call (s)")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--language", default="English", choices=["English", "Hindi"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_stream_")
+    os.chdir(workdir)
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+    from fake_groq_server import FakeGroqServer
+    from fake_gtts import install
+    install(base_latency=args.tts_latency)
+
+    results = {}
+    try:
+        # unique replies keep the response caches from hiding synthesis time
+        with FakeGroqServer(latency=args.groq_latency, token_latency=args.token_latency, unique=True) as server:
+            from groq_client import configure_client_manager
+            configure_client_manager(base_url=server.base_url)
+            for name, run in (("buffered", buffered), ("streamed", streamed)):
+                samples = [run(workdir, i, args.language) for i in range(args.requests)]
+                results[name] = {
+                    "first_text": summarize([s[0] for s in samples]),
+                    "first_audio": summarize([s[1] for s in samples if s[1] is not None]),
+                    "total": summarize([s[2] for s in samples]),
+                }
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
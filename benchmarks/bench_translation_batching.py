@@ -0,0 +1,142 @@
+# benchmarks/bench_translation_batching.py
+"""Concurrent translate_text calls with and without micro-batching.
+
+Runs bursts of concurrent Hindi -> English translations, then Hindi
+consultations, against the fake Groq server with TRANSLATION_BATCHING off
+and on, and once more with replies that lose their segment markers to
+measure the per-item fallback. Reports latency, chat requests sent and
+the batcher's own counters.
+
+    python benchmarks/bench_translation_batching.py --concurrency 1,8,32 --window-ms 20
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_consultation import REPO_ROOT, IMAGE_FIXTURES, AUDIO_FIXTURES, summarize
+
+CHAT_PATH = "/openai/v1/chat/completions"
+PHRASES = ["Mere chehre par daane hain", "Do hafte se khujli ho rahi hai", "Haath par laal chakatte hain",
+           "Raat ko jalan badh jaati hai", "Kya mujhe krim lagani chahiye"]
+
+
+def set_batching(enabled):
+    import brain_of_the_doctor
+    os.environ["TRANSLATION_BATCHING"] = "true" if enabled else "false"
+    brain_of_the_doctor._batcher = None
+
+
+def batcher_stats():
+    from brain_of_the_doctor import get_translation_batcher
+    batcher = get_translation_batcher()
+    return batcher.stats() if batcher else None
+
+
+def run_translations(server, concurrency, requests):
+    from brain_of_the_doctor import translate_text
+
+    def one(i):
+        start = time.perf_counter()
+        translate_text(f"{PHRASES[i % len(PHRASES)]} ({i})", "hi", "en", "fake-key", use_cache=False)
+        return time.perf_counter() - start
+
+    calls_before = server.requests.get(CHAT_PATH, 0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["chat_requests"] = server.requests.get(CHAT_PATH, 0) - calls_before
+    return result
+
+
+def run_consultations(server, workdir, concurrency, requests):
+    from consultation import run_consultation
+
+    def one(i):
+        start = time.perf_counter()
+        run_consultation(
+            user_id=1,
+            audio_filepath=AUDIO_FIXTURES[i % len(AUDIO_FIXTURES)],
+            image_filepath=IMAGE_FIXTURES[0],
+            language="Hindi",
+            audio_response_path=os.path.join(workdir, f"batch_{concurrency}_{i}.mp3"),
+        )
+        return time.perf_counter() - start
+
+    calls_before = server.requests.get(CHAT_PATH, 0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["chat_requests"] = server.requests.get(CHAT_PATH, 0) - calls_before
+    return result
+
+
+def compare(run):
+    results = {}
+    for mode, enabled in (("unbatched", False), ("batched", True)):
+        set_batching(enabled)
+        results[mode] = run()
+        if enabled:
+            results[mode]["batcher"] = batcher_stats()
+    results["chat_requests_saved_pct"] = round(
+        (1 - results["batched"]["chat_requests"] / max(results["unbatched"]["chat_requests"], 1)) * 100, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="translate_text micro-batching benchmark")
+    parser.add_argument("--groq-latency", type=float, default=0.3, help="Injected latency per Groq call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.002,
+                        help="Injected generation time per reply word (s), so batch replies take longer")
+    parser.add_argument("--tts-latency", type=float, default=0.1, help="Injected base latency per gTTS call (s)")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="Translations per mode and level")
+    parser.add_argument("--consultations", type=int, default=16, help="Hindi consultations per mode (0 to skip)")
+    parser.add_argument("--window-ms", type=float, default=20)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_batching_")
+    os.chdir(workdir)
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    os.environ["TRANSLATION_BATCH_WINDOW_MS"] = str(args.window_ms)
+    os.environ["TRANSLATION_BATCH_SIZE"] = str(args.batch_size)
+
+    from fake_groq_server import FakeGroqServer
+    from fake_gtts import install
+    install(base_latency=args.tts_latency)
+
+    results = {"config": vars(args)}
+    try:
+        # unique replies keep the translation cache from answering for the batcher
+        with FakeGroqServer(latency=args.groq_latency, token_latency=args.token_latency, unique=True) as server:
+            from groq_client import configure_client_manager
+            configure_client_manager(base_url=server.base_url)
+            levels = [int(c) for c in args.concurrency.split(",")]
+            results["translations"] = {
+                f"concurrency_{level}": compare(lambda: run_translations(server, level, args.requests))
+                for level in levels
+            }
+            if args.consultations:
+                level = max(levels)
+                results[f"hindi_consultations_concurrency_{level}"] = compare(
+                    lambda: run_consultations(server, workdir, level, args.consultations))
+
+            server.garble_batches = True
+            set_batching(True)
+            results["garbled_batches"] = run_translations(server, max(levels), args.requests)
+            results["garbled_batches"]["batcher"] = batcher_stats()
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
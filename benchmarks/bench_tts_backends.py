@@ -0,0 +1,132 @@
+# benchmarks/bench_tts_backends.py
+"""Offline comparison of the gTTS and local TTS backends.
+
+gTTS is replaced by fake_gtts (network-like latency) and espeak-ng by
+fake_espeak_ng.py unless --espeak points at a real binary. Reports:
+
+  * first request on a cold vs a pre-warmed pyttsx3 worker pool (skipped
+    for espeak-ng, which starts a process per sentence either way)
+  * per-sentence latency of each backend at several concurrency levels
+  * request latency while gTTS is down, with the router falling back
+
+    python benchmarks/bench_tts_backends.py
+    python benchmarks/bench_tts_backends.py --espeak /usr/bin/espeak-ng
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_consultation import summarize
+
+SENTENCES = [
+    "Based on what I'm seeing, this looks like a mild case of acne.",
+    "Wash the area twice a day with a gentle cleanser.",
+    "Avoid picking or squeezing the spots.",
+    "मुझे लगता है कि यह हल्के मुंहासे हैं।",
+    "दिन में दो बार हल्के क्लीन्ज़र से चेहरा धोएं।",
+]
+
+
+def language_of(sentence):
+    return "hi" if any("ऀ" <= ch <= "ॿ" for ch in sentence) else "en"
+
+
+def timed_requests(func, concurrency, requests):
+    def one(i):
+        sentence = SENTENCES[i % len(SENTENCES)]
+        start = time.perf_counter()
+        func(f"{sentence} ({i})", language_of(sentence))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def bench_warmup(workers):
+    import importlib.util
+    from tts_backends import LocalTTSBackend
+
+    if not importlib.util.find_spec("pyttsx3"):
+        return {"skipped": "pyttsx3 not installed; espeak-ng has no pool to warm"}
+    results = {}
+    for warm in (False, True):
+        backend = LocalTTSBackend(engine="pyttsx3", workers=workers)
+        try:
+            start = time.perf_counter()
+            if warm:
+                backend.warm()
+            warm_s = time.perf_counter() - start
+            start = time.perf_counter()
+            backend.synthesize_bytes(SENTENCES[0], "en")
+            results["warm" if warm else "cold"] = {
+                "warmup_s": round(warm_s, 4),
+                "first_request_s": round(time.perf_counter() - start, 4),
+            }
+        finally:
+            backend.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gTTS vs local TTS backend, offline")
+    parser.add_argument("--gtts-latency", type=float, default=0.25, help="Fake gTTS base latency (s)")
+    parser.add_argument("--espeak", default=os.path.join(BENCH_DIR, "fake_espeak_ng.py"),
+                        help="espeak-ng binary (default: the offline stand-in)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent local TTS processes")
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--requests", type=int, default=40)
+    args = parser.parse_args()
+
+    os.environ["LOCAL_TTS_BINARY"] = args.espeak
+    os.environ["LOCAL_TTS_ENGINE"] = "espeak-ng"
+    os.environ["LOCAL_TTS_WORKERS"] = str(args.workers)
+    # Only whole sentences are timed here, so WAV output is fine without ffmpeg
+    os.environ["LOCAL_TTS_ALLOW_WAV"] = "true"
+    os.environ["TTS_CACHE_DIR"] = tempfile.mkdtemp(prefix="ai_doctor_tts_")
+
+    from fake_gtts import install
+    install(base_latency=args.gtts_latency)
+    import voice_of_the_doctor
+    from tts_backends import TTSRouter
+
+    results = {"config": vars(args), "warmup": bench_warmup(args.workers)}
+
+    gtts = voice_of_the_doctor.GTTSBackend()
+    local = voice_of_the_doctor.get_tts_router().backends["local"]
+    local.warm()
+    results["backends"] = {}
+    for level in (int(c) for c in args.concurrency.split(",")):
+        results["backends"][f"concurrency_{level}"] = {
+            "gtts": timed_requests(lambda text, lang: gtts.synthesize_bytes(text, lang), level, args.requests),
+            "local": timed_requests(lambda text, lang: local.synthesize_bytes(text, lang), level, args.requests),
+        }
+
+    # gTTS unreachable: each call fails after a connect timeout until its breaker opens
+    class Unreachable:
+        def __init__(self, **kwargs):
+            time.sleep(args.gtts_latency)
+            raise ConnectionError("gTTS unreachable")
+
+    voice_of_the_doctor.gTTS = Unreachable
+    router = TTSRouter([gtts, local], {"*": ["gtts", "local"]})
+    results["gtts_down_fallback"] = timed_requests(
+        lambda text, lang: router.run(lang, lambda backend: backend.synthesize_bytes(text, lang)),
+        1, args.requests)
+    results["gtts_down_fallback"]["router"] = router.stats()
+    local.close()
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
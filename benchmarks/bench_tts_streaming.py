@@ -0,0 +1,83 @@
+# benchmarks/bench_tts_streaming.py
+"""Compare time-to-first-audio and total time for whole-file vs streaming TTS.
+
+    python benchmarks/bench_tts_streaming.py            # stubbed gTTS, offline
+    python benchmarks/bench_tts_streaming.py --live     # real gTTS (network)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_RESPONSE = (
+    "Based on what I'm seeing, this looks like a mild case of acne with a few inflamed papules. "
+    "I recommend washing the area twice a day with a gentle cleanser. "
+    "Avoid picking or squeezing the spots, as that can lead to scarring. "
+    "If it does not improve within a few weeks, please see a dermatologist."
+)
+
+
+def bench_whole_file(text, workdir, i):
+    from voice_of_the_doctor import text_to_speech_with_gtts
+
+    path = os.path.join(workdir, f"whole_{i}.mp3")
+    start = time.perf_counter()
+    text_to_speech_with_gtts(text, path, use_cache=False)
+    total = time.perf_counter() - start
+    # Nothing can play until the whole file exists
+    return total, total
+
+
+def bench_streaming(text, workdir, i):
+    from voice_of_the_doctor import stream_text_to_speech
+
+    path = os.path.join(workdir, f"stream_{i}.mp3")
+    start = time.perf_counter()
+    first = None
+    for _ in stream_text_to_speech(text, path, use_cache=False):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def summarize(samples):
+    first = [s[0] for s in samples]
+    total = [s[1] for s in samples]
+    return {
+        "first_audio_median_s": round(statistics.median(first), 4),
+        "total_median_s": round(statistics.median(total), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-file vs streaming TTS latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="Use the real gTTS service")
+    parser.add_argument("--latency", type=float, default=0.15, help="Stub base latency per request")
+    parser.add_argument("--text", default=SAMPLE_RESPONSE)
+    args = parser.parse_args()
+
+    if not args.live:
+        from fake_gtts import install
+        install(base_latency=args.latency)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        whole = [bench_whole_file(args.text, workdir, i) for i in range(args.runs)]
+        streamed = [bench_streaming(args.text, workdir, i) for i in range(args.runs)]
+
+    print(json.dumps({
+        "backend": "gtts" if args.live else "stub",
+        "runs": args.runs,
+        "characters": len(args.text),
+        "whole_file": summarize(whole),
+        "streaming": summarize(streamed),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
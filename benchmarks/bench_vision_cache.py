@@ -0,0 +1,98 @@
+# benchmarks/bench_vision_cache.py
+"""Hit rate and saved latency of the perceptual-hash vision cache.
+
+Replays a resubmission-heavy workload against the fake Groq server: each
+user sends the sample photo, then near-duplicate re-captures (brightness
+change, slight crop, rotation, downscale) with the same or a trivially
+reworded description, plus one unrelated image. Another user sending the
+same photo must not hit the first user's entries.
+
+    python benchmarks/bench_vision_cache.py --users 5 --groq-latency 0.5
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from bench_consultation import IMAGE_FIXTURES, summarize
+
+QUERIES = [
+    "I have had these red spots on my face for about two weeks.",
+    "i have had these red spots on my face for about two weeks",
+    "I have had these red spots on my face, for about two weeks!",
+]
+
+
+def make_variants(workdir):
+    """Write re-captures of the sample photo plus one unrelated image"""
+    from PIL import Image, ImageEnhance
+
+    original = Image.open(IMAGE_FIXTURES[0]).convert("RGB")
+    w, h = original.size
+    variants = {
+        "brighter": ImageEnhance.Brightness(original).enhance(1.1),
+        "cropped": original.crop((w // 50, h // 50, w - w // 50, h - h // 50)),
+        "rotated": original.rotate(3),
+        "downscaled": original.resize((w // 2, h // 2)),
+        "unrelated": Image.effect_noise((w, h), 40).convert("RGB"),
+    }
+    paths = {"original": IMAGE_FIXTURES[0]}
+    for name, img in variants.items():
+        paths[name] = os.path.join(workdir, f"{name}.jpg")
+        img.save(paths[name], quality=80)
+    return paths
+
+
+def workload(users, paths):
+    for user_id in range(1, users + 1):
+        yield user_id, paths["original"], QUERIES[0]
+        for i, name in enumerate(("brighter", "cropped", "rotated", "downscaled")):
+            yield user_id, paths[name], QUERIES[i % len(QUERIES)]
+        yield user_id, paths["unrelated"], QUERIES[0]
+
+
+def run(paths, users, use_cache):
+    from brain_of_the_doctor import analyze_image_with_query
+    from consultation import system_prompt, VISION_MODEL
+    from image_preprocessing import prepare_image
+
+    latencies = []
+    start = time.perf_counter()
+    for user_id, path, query in workload(users, paths):
+        image = prepare_image(path)
+        call_start = time.perf_counter()
+        analyze_image_with_query(f"{system_prompt}\n\nPatient says: {query}", VISION_MODEL, image.data,
+                                 mime_type=image.mime_type, user_id=user_id if use_cache else None)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vision result cache benchmark")
+    parser.add_argument("--groq-latency", type=float, default=0.5, help="Injected latency per Groq call (s)")
+    parser.add_argument("--users", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_vision_cache_")
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+    from fake_groq_server import FakeGroqServer
+    from vision_cache import get_vision_cache
+
+    try:
+        paths = make_variants(workdir)
+        with FakeGroqServer(latency=args.groq_latency) as server:
+            from groq_client import configure_client_manager
+            configure_client_manager(base_url=server.base_url)
+            uncached = run(paths, args.users, use_cache=False)
+            cached = run(paths, args.users, use_cache=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"uncached": uncached, "cached": cached, "cache": get_vision_cache().stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/check_serve.py
+"""Smoke check for serve.py: several workers with metrics enabled.
+
+Starts serve.py with benchmarks/consultation_worker.py as the worker
+command and METRICS_PORT set, waits, then checks that no worker was
+restarted, that every worker answers on its own metrics port and that the
+balancer reaches every worker. Exits non-zero on failure.
+
+    python benchmarks/check_serve.py --workers 3
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py multi-worker smoke check")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=18810)
+    parser.add_argument("--metrics-port", type=int, default=18910)
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to watch for worker restarts")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="ai_doctor_check_")
+    env = dict(os.environ, METRICS_PORT=str(args.metrics_port), GROQ_API_KEY="fake-key")
+    command = [sys.executable, os.path.join(REPO_ROOT, "serve.py"), "--workers", str(args.workers),
+               "--host", "127.0.0.1", "--port", str(args.port), "--worker-port", str(args.port + 1),
+               "--data-dir", data_dir, "--", sys.executable, os.path.join(BENCH_DIR, "consultation_worker.py")]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    log = []
+    threading.Thread(target=lambda: log.extend(process.stderr), daemon=True).start()
+
+    failures = []
+    try:
+        for line in process.stdout:
+            if line.startswith("Serving"):
+                break
+        else:
+            failures.append("serve.py exited before it started serving")
+        time.sleep(args.settle)
+
+        restarts = [line.strip() for line in log if "restarting" in line]
+        if restarts:
+            failures.append(f"workers restarted: {restarts}")
+        for i in range(args.workers):
+            try:
+                status, _ = get(args.metrics_port + i, "/metrics")
+                if status != 200:
+                    failures.append(f"worker {i} metrics returned {status}")
+            except OSError as e:
+                failures.append(f"worker {i} metrics on port {args.metrics_port + i}: {e}")
+        pids = set()
+        for i in range(args.workers):
+            status, body = get(args.port, "/health", {"Cookie": f"ai_doctor_worker={i}"})
+            if status == 200:
+                pids.add(json.loads(body)["pid"])
+        if len(pids) != args.workers:
+            failures.append(f"balancer reached {len(pids)} of {args.workers} workers")
+    finally:
+        process.terminate()
+        process.wait(30)
+
+    print(json.dumps({"workers": args.workers, "ok": not failures, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
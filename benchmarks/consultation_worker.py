@@ -0,0 +1,77 @@
+# benchmarks/consultation_worker.py
+"""Headless stand-in for one gradio_app.py worker, for serve.py load tests.
+
+Listens on $GRADIO_SERVER_PORT and runs a full consultation (fake Groq via
+$GROQ_BASE_URL, fake gTTS) for each POST /consult. Like a Gradio event with
+the default concurrency limit, it works on WORKER_CONCURRENCY (default 1)
+consultations at a time and queues the rest.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_consultation import IMAGE_FIXTURES, AUDIO_FIXTURES
+
+_slots = threading.BoundedSemaphore(int(os.environ.get("WORKER_CONCURRENCY", 1)))
+_served = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200, {"pid": os.getpid(), "served": _served})
+
+    def do_POST(self):
+        global _served
+        from consultation import run_consultation
+        from media_store import get_media_store
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        i = request.get("i", 0)
+        start = time.perf_counter()
+        with _slots:
+            waited = time.perf_counter() - start
+            result = run_consultation(
+                user_id=request.get("user_id", 1),
+                audio_filepath=AUDIO_FIXTURES[i % len(AUDIO_FIXTURES)],
+                image_filepath=IMAGE_FIXTURES[0],
+                language=request.get("language", "English"),
+                audio_response_path=get_media_store().allocate(".mp3"),
+            )
+            _served += 1
+        self._reply(200, {"pid": os.getpid(), "consultation_id": result["consultation_id"],
+                          "queued_s": round(waited, 4), "seconds": round(time.perf_counter() - start, 4)})
+
+
+def main():
+    from fake_gtts import install
+    install(base_latency=float(os.environ.get("FAKE_TTS_LATENCY", 0.1)))
+    # Like gradio_app.main(): serve metrics when METRICS_PORT is set
+    from metrics import start_metrics_server
+    start_metrics_server(host="127.0.0.1")
+    server = ThreadingHTTPServer(("127.0.0.1", int(os.environ["GRADIO_SERVER_PORT"])), _Handler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# benchmarks/fake_espeak_ng.py
+"""Offline stand-in for the espeak-ng command line used by LocalTTSBackend.
+
+Accepts -v VOICE -s RATE -w FILE --stdin (or --version), sleeps FAKE_ESPEAK_LATENCY plus
+FAKE_ESPEAK_PER_CHAR seconds per character, and writes a silent 16 kHz WAV
+as long as the text would take to speak at RATE words per minute.
+"""
+import os
+import sys
+import time
+import wave
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", dest="voice", default="en")
+    parser.add_argument("-s", dest="rate", type=int, default=175)
+    parser.add_argument("-w", dest="output")
+    parser.add_argument("--stdin", action="store_true")
+    parser.add_argument("--version", action="store_true")
+    args = parser.parse_args()
+    if args.version:
+        print("eSpeak NG text-to-speech: fake (benchmarks/fake_espeak_ng.py)")
+        return
+    if not args.output:
+        parser.error("-w is required")
+
+    text = sys.stdin.read() if args.stdin else ""
+    time.sleep(float(os.environ.get("FAKE_ESPEAK_LATENCY", 0.03))
+               + float(os.environ.get("FAKE_ESPEAK_PER_CHAR", 0.0002)) * len(text))
+    seconds = max(0.2, len(text.split()) / args.rate * 60)
+    with wave.open(args.output, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(16000)
+        out.writeframes(b"\x00\x00" * int(16000 * seconds))
+
+
+if __name__ == "__main__":
+    main()
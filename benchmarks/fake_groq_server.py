@@ -0,0 +1,220 @@
+# benchmarks/fake_groq_server.py
+"""Local stand-in for the Groq HTTP API used by benchmarks and smoke checks.
+
+Serves the OpenAI-compatible chat completion (plain and streamed) and audio
+transcription endpoints over keep-alive HTTP/1.1 with a configurable injected latency,
+so the client layer can be exercised without network access.
+
+    python benchmarks/fake_groq_server.py --port 8765 --latency 0.2
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=fake python gradio_app.py
+"""
+import os
+import sys
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_REPLY = ("Based on what I'm seeing, this looks like mild inflammation of the skin. "
+                 "I recommend keeping the area clean and seeing a dermatologist if it persists.")
+DEFAULT_REPLY_HI = ("जो मैं देख रहा हूँ, उसके आधार पर यह त्वचा की हल्की सूजन लगती है। "
+                    "मैं सलाह देता हूँ कि उस जगह को साफ़ रखें और अगर यह बनी रहे तो त्वचा विशेषज्ञ को दिखाएँ।")
+DEFAULT_TRANSCRIPT = "I have had these red spots on my face for about two weeks."
+SEGMENT_MARKER = re.compile(r"<<<\d+>>>")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model, text):
+        """Send text as server-sent chat.completion.chunk events, one word at a time"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None):
+            return json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        try:
+            event(chunk({"role": "assistant", "content": ""}))
+            for i, word in enumerate(text.split(" ")):
+                if self.server.token_latency:
+                    time.sleep(self.server.token_latency)
+                event(chunk({"content": word if i == 0 else " " + word}))
+            event(chunk({}, "stop"))
+            event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading part-way through
+            self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        server = self.server
+        server.record(self.path, len(raw))
+
+        delay = server.latency
+        if self.path.endswith("/audio/transcriptions"):
+            # Real STT time grows with the length of the upload
+            delay += server.per_mb_latency * len(raw) / (1024 * 1024)
+        if delay:
+            time.sleep(delay)
+
+        if self.path.endswith("/chat/completions"):
+            request = json.loads(raw or b"{}")
+            reply = server.reply_for(request)
+            if request.get("stream"):
+                self._send_stream(request.get("model", "fake"), reply)
+                return
+            # A buffered reply still takes as long to generate as a streamed one
+            if server.token_latency:
+                time.sleep(server.token_latency * len(reply.split(" ")))
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        elif self.path.endswith("/audio/transcriptions"):
+            self._send_json(200, {"text": server.transcript_for()})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+
+class FakeGroqServer(ThreadingHTTPServer):
+    """Threaded stub server; use as a context manager to run it in the background"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, reply=DEFAULT_REPLY,
+                 transcript=DEFAULT_TRANSCRIPT, unique=False, per_mb_latency=0.0, token_latency=0.0,
+                 garble_batches=False):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.per_mb_latency = per_mb_latency
+        # Delay between words of a streamed reply
+        self.token_latency = token_latency
+        self.reply = reply
+        self.transcript = transcript
+        # Tag every reply with a counter so response caches never hit
+        self.unique = unique
+        # Answer batched translations without their segment markers
+        self.garble_batches = garble_batches
+        self._counter = 0
+        self.requests = {}
+        self.bytes_received = 0
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path, size):
+        with self._stats_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.bytes_received += size
+
+    def _tag(self, text):
+        if not self.unique:
+            return text
+        with self._stats_lock:
+            self._counter += 1
+            return f"{text} (ref {self._counter})"
+
+    def reply_for(self, request):
+        # JSON mode is only used by the fused bilingual analysis
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps({"english": self._tag(self.reply), "hindi": DEFAULT_REPLY_HI},
+                              ensure_ascii=False)
+        # Batched translations: one reply per marked segment, markers kept
+        content = request["messages"][-1].get("content")
+        markers = SEGMENT_MARKER.findall(content) if isinstance(content, str) else []
+        if markers and not self.garble_batches:
+            return "\n\n".join(f"{marker}\n{self._tag(self.reply)}" for marker in markers)
+        return self._tag(self.reply)
+
+    def transcript_for(self):
+        return self._tag(self.transcript)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--smoke", action="store_true",
+                        help="Run a few calls through groq_client and print reuse counters")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(port=args.port, latency=args.latency)
+    if not args.smoke:
+        print(f"Fake Groq API listening on {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    from groq_client import configure_client_manager
+    from brain_of_the_doctor import translate_text
+
+    with server:
+        manager = configure_client_manager(base_url=server.base_url, max_connections=4)
+        for _ in range(5):
+            translate_text("Namaste", "hi", "en", "fake-key")
+        print(json.dumps(manager.stats(), indent=2))
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
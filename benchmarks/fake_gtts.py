@@ -0,0 +1,45 @@
+# benchmarks/fake_gtts.py
+"""Offline stand-in for gTTS with configurable synthesis latency"""
+import time
+
+
+class FakeGTTS:
+    """Mimics the parts of gTTS used by voice_of_the_doctor.
+
+    Synthesis takes base_latency plus per_char_latency for every character,
+    which roughly matches how gTTS request time grows with text length.
+    """
+
+    base_latency = 0.15
+    per_char_latency = 0.002
+    calls = 0
+
+    def __init__(self, text, lang="en", slow=False, **kwargs):
+        self.text = text
+        self.lang = lang
+        self.slow = slow
+
+    def _audio(self):
+        FakeGTTS.calls += 1
+        time.sleep(self.base_latency + self.per_char_latency * len(self.text))
+        # Roughly the size of gTTS output for the same text
+        return b"\xff\xf3\x44\xc4" + b"\x00" * (len(self.text.encode("utf-8")) * 120)
+
+    def write_to_fp(self, fp):
+        fp.write(self._audio())
+
+    def save(self, savefile):
+        with open(savefile, "wb") as f:
+            self.write_to_fp(f)
+
+
+def install(base_latency=None, per_char_latency=None):
+    """Patch voice_of_the_doctor to use FakeGTTS and return the class"""
+    import voice_of_the_doctor
+
+    if base_latency is not None:
+        FakeGTTS.base_latency = base_latency
+    if per_char_latency is not None:
+        FakeGTTS.per_char_latency = per_char_latency
+    voice_of_the_doctor.gTTS = FakeGTTS
+    return FakeGTTS
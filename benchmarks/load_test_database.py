@@ -0,0 +1,131 @@
+# benchmarks/load_test_database.py
+"""Concurrent insert and history throughput for the SQLite data layer.
+
+Runs many writer threads calling save_consultation while reader threads
+call get_user_history, first against the pooled WAL layer in database.py
+and then against the original connect-per-call layout for comparison.
+
+    python benchmarks/load_test_database.py --writers 16 --inserts 200
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+import io
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class NaiveLayer:
+    """The pre-pool behaviour: a fresh default-journal connection per call, no index"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        conn.execute('''CREATE TABLE consultations (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, audio_path TEXT,
+                        image_path TEXT, patient_speech TEXT, doctor_response TEXT,
+                        audio_response_path TEXT, language TEXT)''')
+        conn.commit()
+        conn.close()
+
+    def save_consultation(self, *args):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('''INSERT INTO consultations (user_id, audio_path, image_path, patient_speech,
+                        doctor_response, audio_response_path, language) VALUES (?, ?, ?, ?, ?, ?, ?)''', args)
+        conn.commit()
+        conn.close()
+
+    def get_user_history(self, user_id):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        rows = conn.execute('''SELECT id, timestamp, patient_speech, doctor_response, language
+                               FROM consultations WHERE user_id = ? ORDER BY timestamp DESC''',
+                            (user_id,)).fetchall()
+        conn.close()
+        return rows
+
+
+class PooledLayer:
+    def __init__(self, db_path):
+        import database
+        database.init_database(db_path, max_connections=16)
+        self._db = database
+
+    def save_consultation(self, *args):
+        self._db.save_consultation(*args)
+
+    def get_user_history(self, user_id):
+        return self._db.get_user_history(user_id)
+
+
+def run(layer, writers, inserts, readers, reads, users):
+    errors = []
+    text = "Based on what I'm seeing, this looks like mild irritation. " * 3
+
+    def writer(seed):
+        rnd = random.Random(seed)
+        for i in range(inserts):
+            try:
+                layer.save_consultation(rnd.randint(1, users), "a.wav", "i.jpg", "patient text",
+                                        text, f"r_{seed}_{i}.mp3", "English")
+            except Exception as e:
+                errors.append(repr(e))
+
+    def reader(seed):
+        rnd = random.Random(seed)
+        for _ in range(reads):
+            try:
+                layer.get_user_history(rnd.randint(1, users))
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(1000 + i,)) for i in range(readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "inserts_per_s": round(writers * inserts / elapsed, 1),
+        "history_reads_per_s": round(readers * reads / elapsed, 1),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite data layer load test")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--inserts", type=int, default=200, help="Inserts per writer")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--reads", type=int, default=200, help="History queries per reader")
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # database.py initializes its default file on import; keep that in the temp dir
+        os.chdir(workdir)
+        for name, factory in (("pooled_wal", PooledLayer), ("connect_per_call", NaiveLayer)):
+            layer = factory(os.path.join(workdir, f"{name}.db"))
+            # get_user_history prints every row it returns
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = run(layer, args.writers, args.inserts, args.readers, args.reads, args.users)
+        os.chdir(os.path.dirname(workdir))
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/load_test_jobs.py
+"""Drive the consultation job queue headless against a fake Groq API.
+
+Submits bursts of consultations (using the repo's sample audio and image)
+to jobs.JobQueue, with the Groq endpoints served by fake_groq_server and
+gTTS replaced by fake_gtts, and reports admission, latency and throughput.
+
+    python benchmarks/load_test_jobs.py --jobs 64 --workers 4 --max-queued 16
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SAMPLE_AUDIO = os.path.join(REPO_ROOT, "patient_voice_test_for_patient.mp3")
+SAMPLE_IMAGE = os.path.join(REPO_ROOT, "acne.jpg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load test of the consultation job queue")
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queued", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake Groq latency per call")
+    parser.add_argument("--language", default="English", choices=["English", "Hindi"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ai_doctor_jobs_")
+    # database.py and the caches write relative to the working directory
+    os.chdir(workdir)
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+    from fake_groq_server import FakeGroqServer
+    from fake_gtts import install
+    install(base_latency=0.1)
+
+    with FakeGroqServer(latency=args.latency) as server:
+        from groq_client import configure_client_manager
+        from jobs import JobQueue
+        from consultation import run_consultation
+        from translation_cache import get_translation_cache
+        configure_client_manager(base_url=server.base_url)
+
+        queue = JobQueue(run_consultation, workers=args.workers, max_queued=args.max_queued)
+        start = time.perf_counter()
+        jobs = []
+        for i in range(args.jobs):
+            jobs.append(queue.submit(
+                user_id=1 + i % 10,
+                audio_filepath=SAMPLE_AUDIO,
+                image_filepath=SAMPLE_IMAGE,
+                language=args.language,
+                audio_response_path=os.path.join(workdir, f"response_{i}.mp3"),
+            ))
+        for job in jobs:
+            job.wait()
+        elapsed = time.perf_counter() - start
+        queue.shutdown()
+
+        done = [j for j in jobs if j.status == "done"]
+        latencies = sorted(j.finished_at - j.submitted_at for j in done)
+        queue_waits = [j.started_at - j.submitted_at for j in done]
+        print(json.dumps({
+            "config": vars(args),
+            "queue": queue.stats(),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(len(done) / elapsed, 2),
+            "latency_median_s": round(statistics.median(latencies), 3) if latencies else None,
+            "latency_max_s": round(latencies[-1], 3) if latencies else None,
+            "queue_wait_median_s": round(statistics.median(queue_waits), 3) if queue_waits else None,
+            "groq_requests": server.requests,
+            "translation_cache": get_translation_cache().stats(),
+        }, indent=2))
+
+    os.chdir(REPO_ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/load_test_workers.py
+"""Throughput of serve.py's multi-process mode as workers are added.
+
+For each worker count, starts serve.py with benchmarks/consultation_worker.py
+as the worker command and a shared temp --data-dir, then has --clients
+simulated browsers (each keeping its affinity cookie) run consultations
+through the load balancer against a fake Groq server.
+
+    python benchmarks/load_test_workers.py --workers 1,2,4 --clients 16 --requests 64
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import http.client
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_consultation import summarize
+
+
+def start_cluster(workers, port, data_dir, env):
+    command = [sys.executable, os.path.join(REPO_ROOT, "serve.py"), "--workers", str(workers),
+               "--host", "127.0.0.1", "--port", str(port), "--worker-port", str(port + 1),
+               "--data-dir", data_dir, "--", sys.executable, os.path.join(BENCH_DIR, "consultation_worker.py")]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if line.startswith("Serving"):
+            return process
+    raise RuntimeError("serve.py exited before it started serving")
+
+
+def run_clients(port, clients, requests, language):
+    def client(c):
+        cookie = None
+        results = []
+        for i in range(c, requests, clients):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+            body = json.dumps({"user_id": 1 + c, "language": language, "i": i})
+            headers = {"Content-Type": "application/json"}
+            if cookie:
+                headers["Cookie"] = cookie
+            start = time.perf_counter()
+            conn.request("POST", "/consult", body, headers)
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+            results.append((time.perf_counter() - start, payload["pid"]))
+            cookie = (response.getheader("Set-Cookie") or "").split(";")[0] or cookie
+            conn.close()
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = [r for batch in executor.map(client, range(clients)) for r in batch]
+    elapsed = time.perf_counter() - start
+    summary = summarize([latency for latency, _ in results], elapsed)
+    summary["per_worker"] = sorted(Counter(pid for _, pid in results).values(), reverse=True)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py throughput by worker count")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake Groq latency per call (s)")
+    parser.add_argument("--language", default="English", choices=["English", "Hindi"])
+    parser.add_argument("--port", type=int, default=18710)
+    args = parser.parse_args()
+
+    from fake_groq_server import FakeGroqServer
+
+    results = {"config": vars(args), "cpus": os.cpu_count(), "runs": {}}
+    with FakeGroqServer(latency=args.latency, unique=True) as server:
+        env = dict(os.environ, GROQ_BASE_URL=server.base_url, GROQ_API_KEY="fake-key")
+        for workers in (int(w) for w in args.workers.split(",")):
+            data_dir = tempfile.mkdtemp(prefix="ai_doctor_cluster_")
+            cluster = start_cluster(workers, args.port, data_dir, env)
+            try:
+                results["runs"][f"workers_{workers}"] = run_clients(
+                    args.port, args.clients, args.requests, args.language)
+            finally:
+                cluster.terminate()
+                cluster.wait(30)
+                shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
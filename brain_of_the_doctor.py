@@ -1,87 +1,347 @@
 # brain_of_the_doctor.py
-from dotenv import load_dotenv
+from config import load_config
 
-load_dotenv()
+load_config()
 
 import os
-import base64
-from groq import Groq
+import re
+import json
 import time
+import threading
+import metrics
+from config import env_flag
+from retry import RetryPolicy, call_with_retry, get_breaker
+from groq_client import get_groq_client
+from image_preprocessing import prepare_image, perceptual_hash
+from translation_cache import get_translation_cache, make_key
+from translation_batcher import TranslationBatcher
+from vision_cache import get_vision_cache
 
 
 def encode_image(image_path):
     """Encode image to base64"""
     try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        return prepare_image(image_path).data
     except Exception as e:
         print(f"Image encoding error: {e}")
         return None
 
 
-def analyze_image_with_query(query, model, encoded_image, max_retries=3):
-    """Analyze image with Groq API"""
-    if not encoded_image:
-        return "Could not process the image. Please try another one."
-
-    client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-
-    messages = [
+def _image_messages(query, encoded_image, mime_type):
+    return [
         {
             "role": "user",
             "content": [
                 {"type": "text", "text": query},
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"},
+                    "image_url": {"url": f"data:{mime_type};base64,{encoded_image}"},
                 },
             ],
         }
     ]
 
-    for attempt in range(max_retries):
-        try:
-            chat_completion = client.chat.completions.create(
-                messages=messages,
-                model=model
-            )
-            return chat_completion.choices[0].message.content
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # Exponential backoff
-                print(f"Image analysis attempt {attempt + 1} failed. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"Image analysis failed after {max_retries} attempts: {e}")
-                return "I'm having trouble analyzing this image. Please try again."
-
-
-def translate_text(text, source_lang, target_lang, GROQ_API_KEY):
-    """Translate text between languages"""
-    if not text.strip():
-        return ""
 
-    client = Groq(api_key=GROQ_API_KEY)
-    lang_map = {"English": "en", "Hindi": "hi", "en": "en", "hi": "hi"}
+def _vision_cache_lookup(user_id, query, model, encoded_image):
+    """Return (cache, image_hash, cached result); caching is per user, so no user means no cache"""
+    cache = get_vision_cache() if user_id is not None else None
+    if cache is None:
+        return None, None, None
+    try:
+        image_hash = perceptual_hash(encoded_image)
+    except Exception as e:
+        print(f"Could not hash image for the vision cache: {e}")
+        return None, None, None
+    return cache, image_hash, cache.get(user_id, query, model, image_hash)
 
+
+def analyze_image_with_query(query, model, encoded_image, max_retries=3, mime_type="image/jpeg",
+                             user_id=None):
+    """Analyze image with Groq API"""
+    if not encoded_image:
+        return "Could not process the image. Please try another one."
+
+    cache, image_hash, cached = _vision_cache_lookup(user_id, query, model, encoded_image)
+    if cached is not None:
+        return cached
+
+    client = get_groq_client(os.environ.get("GROQ_API_KEY"))
+    messages = _image_messages(query, encoded_image, mime_type)
+    metrics.record_payload("analyze", len(encoded_image))
+
+    start = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        f"You are a professional medical translator. "
-                        f"Translate this text from {source_lang} to {target_lang} "
-                        "without adding any explanations. Maintain medical terminology accuracy."
-                    )
-                },
-                {"role": "user", "content": text}
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
-            max_tokens=1024
+        chat_completion = call_with_retry(
+            lambda: client.chat.completions.create(messages=messages, model=model),
+            policy=RetryPolicy(max_attempts=max_retries),
+            breaker=get_breaker("vision"),
+            operation="Image analysis",
+            on_retry=lambda attempt, e: metrics.record_retry("analyze")
+        )
+    except Exception as e:
+        print(f"Image analysis failed: {e}")
+        metrics.record_error("analyze")
+        return "I'm having trouble analyzing this image. Please try again."
+
+    content = chat_completion.choices[0].message.content
+    if cache and content:
+        cache.put(user_id, query, model, image_hash, content, time.perf_counter() - start)
+    return content
+
+
+def stream_image_analysis(query, model, encoded_image, max_retries=3, mime_type="image/jpeg",
+                          user_id=None):
+    """Yield the analysis text piece by piece as the model generates it.
+
+    Only opening the stream is retried; a failure part-way through ends the
+    text early. If nothing was produced the usual fallback message is yielded.
+    A cached analysis is yielded in one piece.
+    """
+    if not encoded_image:
+        yield "Could not process the image. Please try another one."
+        return
+
+    cache, image_hash, cached = _vision_cache_lookup(user_id, query, model, encoded_image)
+    if cached is not None:
+        yield cached
+        return
+
+    client = get_groq_client(os.environ.get("GROQ_API_KEY"))
+    messages = _image_messages(query, encoded_image, mime_type)
+    metrics.record_payload("analyze", len(encoded_image))
+
+    produced = []
+    stream = None
+    start = time.perf_counter()
+    try:
+        stream = call_with_retry(
+            lambda: client.chat.completions.create(messages=messages, model=model, stream=True),
+            policy=RetryPolicy(max_attempts=max_retries),
+            breaker=get_breaker("vision"),
+            operation="Image analysis",
+            on_retry=lambda attempt, e: metrics.record_retry("analyze")
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                produced.append(delta)
+                yield delta
+    except Exception as e:
+        print(f"Image analysis failed: {e}")
+        metrics.record_error("analyze")
+        if not produced:
+            yield "I'm having trouble analyzing this image. Please try again."
+    else:
+        # Only a stream that ran to completion is worth caching
+        if cache and produced:
+            cache.put(user_id, query, model, image_hash, "".join(produced), time.perf_counter() - start)
+    finally:
+        # Free the pooled connection even if the caller stops reading early
+        if stream is not None:
+            stream.close()
+
+
+BILINGUAL_INSTRUCTIONS = """
+The patient may speak Hindi. Reply with a JSON object and nothing else:
+{"english": "<your response in English>", "hindi": "<the same response in Hindi, Devanagari script>"}
+"""
+
+
+def parse_bilingual_response(content):
+    """Return (english, hindi) from a bilingual JSON reply, or None if it is unusable"""
+    if not content:
+        return None
+    # Tolerate code fences or stray text around the object
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    english, hindi = data.get("english"), data.get("hindi")
+    if not isinstance(english, str) or not isinstance(hindi, str) or not english.strip() or not hindi.strip():
+        return None
+    return english.strip(), hindi.strip()
+
+
+def analyze_image_bilingual(query, model, encoded_image, max_retries=3, mime_type="image/jpeg",
+                            user_id=None):
+    """Analyze an image and answer in English and Hindi with a single call.
+
+    query should already include BILINGUAL_INSTRUCTIONS. Returns
+    (english, hindi), or None if the call fails or the reply cannot be parsed,
+    so the caller can fall back to separate translation calls.
+    """
+    if not encoded_image:
+        return None
+
+    cache, image_hash, cached = _vision_cache_lookup(user_id, query, model, encoded_image)
+    if cached is not None:
+        return cached
+
+    client = get_groq_client(os.environ.get("GROQ_API_KEY"))
+    messages = _image_messages(query, encoded_image, mime_type)
+    metrics.record_payload("analyze", len(encoded_image))
+
+    start = time.perf_counter()
+    try:
+        chat_completion = call_with_retry(
+            lambda: client.chat.completions.create(
+                messages=messages,
+                model=model,
+                response_format={"type": "json_object"}
+            ),
+            policy=RetryPolicy(max_attempts=max_retries),
+            breaker=get_breaker("vision"),
+            operation="Bilingual image analysis",
+            on_retry=lambda attempt, e: metrics.record_retry("analyze")
         )
-        return response.choices[0].message.content
+    except Exception as e:
+        print(f"Bilingual image analysis failed: {e}")
+        metrics.record_error("analyze")
+        return None
+
+    result = parse_bilingual_response(chat_completion.choices[0].message.content)
+    if result is None:
+        print("Bilingual image analysis returned an unparseable reply")
+        metrics.record_error("analyze_bilingual")
+    elif cache:
+        cache.put(user_id, query, model, image_hash, result, time.perf_counter() - start)
+    return result
+
+
+TRANSLATION_MODEL = "llama-3.3-70b-versatile"
+TRANSLATION_TEMPERATURE = 0.3
+TRANSLATION_MAX_TOKENS = 1024
+# A batch reply holds every segment; stay well inside the model's output limit
+BATCH_MAX_TOKENS = 8192
+SEGMENT_MARKER = "<<<{}>>>"
+SEGMENT_PATTERN = re.compile(r"<<<(\d+)>>>")
+
+BATCH_INSTRUCTIONS = (
+    "The text contains {count} numbered segments, each starting with a marker line like <<<1>>>. "
+    "Translate each segment separately. Reply with every marker line, unchanged and in the same "
+    "order, each followed by the translation of its segment, and nothing else."
+)
+
+
+def _translation_prompt(source_lang, target_lang):
+    return (
+        f"You are a professional medical translator. "
+        f"Translate this text from {source_lang} to {target_lang} "
+        "without adding any explanations. Maintain medical terminology accuracy."
+    )
+
+
+def _request_translation(messages, GROQ_API_KEY, max_tokens=TRANSLATION_MAX_TOKENS):
+    client = get_groq_client(GROQ_API_KEY)
+    response = call_with_retry(
+        lambda: client.chat.completions.create(
+            messages=messages,
+            model=TRANSLATION_MODEL,
+            temperature=TRANSLATION_TEMPERATURE,
+            max_tokens=max_tokens
+        ),
+        policy=RetryPolicy(max_attempts=2),
+        breaker=get_breaker("translation"),
+        operation="Translation",
+        on_retry=lambda attempt, e: metrics.record_retry("translate")
+    )
+    return response.choices[0].message.content
+
+
+def _translate_one(text, source_lang, target_lang, GROQ_API_KEY):
+    """Translate one text with its own request; None on failure"""
+    messages = [
+        {"role": "system", "content": _translation_prompt(source_lang, target_lang)},
+        {"role": "user", "content": text}
+    ]
+    try:
+        return _request_translation(messages, GROQ_API_KEY)
     except Exception as e:
         print(f"Translation error: {e}")
-        return text  # Return original text on failure
\ No newline at end of file
+        metrics.record_error("translate")
+        return None
+
+
+def split_segments(content, count):
+    """Split a batched reply back into count translations, or raise ValueError"""
+    parts = SEGMENT_PATTERN.split(content or "")
+    # parts = [preamble, "1", text, "2", text, ...]
+    numbers = [int(n) for n in parts[1::2]]
+    if numbers != list(range(1, count + 1)):
+        raise ValueError(f"expected segments 1..{count}, got {numbers[:count + 2]}")
+    segments = [segment.strip() for segment in parts[2::2]]
+    if not all(segments):
+        raise ValueError("empty segment in batched translation")
+    return segments
+
+
+def translate_segments(texts, source_lang, target_lang, GROQ_API_KEY):
+    """Translate several texts with one request; raises if the reply cannot be split"""
+    body = "\n\n".join(f"{SEGMENT_MARKER.format(i)}\n{text.strip()}" for i, text in enumerate(texts, 1))
+    messages = [
+        {
+            "role": "system",
+            "content": f"{_translation_prompt(source_lang, target_lang)} {BATCH_INSTRUCTIONS.format(count=len(texts))}"
+        },
+        {"role": "user", "content": body}
+    ]
+    max_tokens = min(TRANSLATION_MAX_TOKENS * len(texts), BATCH_MAX_TOKENS)
+    return split_segments(_request_translation(messages, GROQ_API_KEY, max_tokens), len(texts))
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_translation_batcher():
+    """Process-wide translation batcher, or None unless TRANSLATION_BATCHING is set.
+
+    TRANSLATION_BATCH_WINDOW_MS is how long the first request waits for
+    others to join (default 20), TRANSLATION_BATCH_SIZE and
+    TRANSLATION_BATCH_MAX_CHARS cap a batch (default 8 texts, 6000 chars).
+    """
+    global _batcher
+    if not env_flag("TRANSLATION_BATCHING"):
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = TranslationBatcher(
+                    _translate_one,
+                    translate_segments,
+                    window=float(os.environ.get("TRANSLATION_BATCH_WINDOW_MS", 20)) / 1000,
+                    max_items=int(os.environ.get("TRANSLATION_BATCH_SIZE", 8)),
+                    max_chars=int(os.environ.get("TRANSLATION_BATCH_MAX_CHARS", 6000)),
+                )
+    return _batcher
+
+
+def translate_text(text, source_lang, target_lang, GROQ_API_KEY, use_cache=True):
+    """Translate text between languages"""
+    if not text.strip():
+        return ""
+
+    cache = get_translation_cache() if use_cache else None
+    cache_key = make_key(text, source_lang, target_lang, TRANSLATION_MODEL, TRANSLATION_TEMPERATURE)
+    if cache:
+        cached = cache.get(cache_key)
+        metrics.record_cache("translation", cached is not None)
+        if cached is not None:
+            return cached
+
+    batcher = get_translation_batcher()
+    if batcher and not SEGMENT_PATTERN.search(text):
+        translated = batcher.translate(text, source_lang, target_lang, GROQ_API_KEY)
+    else:
+        translated = _translate_one(text, source_lang, target_lang, GROQ_API_KEY)
+    if translated is None:
+        return text  # Return original text on failure
+
+    if cache and translated:
+        cache.put(cache_key, translated)
+    return translated
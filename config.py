@@ -0,0 +1,31 @@
+# config.py
+import os
+import threading
+
+TRUE_VALUES = ("1", "true", "yes")
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_config(dotenv_path=None):
+    """Load .env into the environment once per process; later calls are no-ops"""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        try:
+            from dotenv import load_dotenv
+        except ImportError:  # python-dotenv missing: rely on the real environment
+            load_dotenv = None
+        if load_dotenv:
+            load_dotenv(dotenv_path)
+        _loaded = True
+
+
+def env_flag(name):
+    """True if the environment variable is set to 1/true/yes"""
+    load_config()
+    return os.environ.get(name, "").lower() in TRUE_VALUES
@@ -0,0 +1,418 @@
+# consultation.py
+import os
+import time
+import logging
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import metrics
+from config import env_flag
+from pipeline import Stage, Pipeline
+from database import save_consultation, save_consultation_trace, set_audio_response_path
+from media_store import store_upload
+from brain_of_the_doctor import (
+    analyze_image_with_query, analyze_image_bilingual, stream_image_analysis, translate_text,
+    BILINGUAL_INSTRUCTIONS
+)
+from image_preprocessing import prepare_image
+from voice_of_the_patient import transcribe_with_groq
+from voice_of_the_doctor import text_to_speech, synthesize_sentence, SENTENCE_BOUNDARY
+
+# Optimized system prompt
+system_prompt = """
+As a medical professional examining this image, provide your analysis directly to the patient.
+If you observe any medical concerns:
+1. Clearly describe your findings in plain language
+2. Suggest potential next steps or remedies
+3. Keep your response to 1-2 concise sentences
+
+Structure your response as if speaking directly to the patient:
+"Based on what I'm seeing, [your observation]. I recommend [suggestion]."
+
+Important:
+- Avoid AI/model references
+- Skip technical disclaimers
+- Never use markdown formatting
+- Start immediately with your analysis
+"""
+
+# Store each consultation's stage timings in consultations.trace
+RECORD_TRACES = env_flag("RECORD_TRACES")
+# Answer Hindi consultations in English and Hindi with one vision call
+# instead of translate -> analyze -> translate
+FUSED_HINDI = env_flag("FUSED_HINDI_ANALYSIS")
+
+STT_MODEL = "whisper-large-v3"
+VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+
+def _transcribe(ctx):
+    try:
+        return transcribe_with_groq(
+            stt_model=STT_MODEL,
+            audio_filepath=ctx["audio_filepath"],
+            GROQ_API_KEY=os.environ.get("GROQ_API_KEY"),
+            language=ctx["lang_code"]
+        )
+    except Exception as e:
+        return f"Speech recognition error: {str(e)}"
+
+
+def _translate_query(ctx):
+    if ctx["language"] == "Hindi":
+        return translate_text(
+            text=ctx["transcribe"],
+            source_lang="hi",
+            target_lang="en",
+            GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
+        )
+    return ctx["transcribe"]
+
+
+def _encode_image(ctx):
+    if not ctx["image_filepath"]:
+        return None
+    try:
+        return prepare_image(ctx["image_filepath"])
+    except Exception as e:
+        print(f"Image encoding error: {e}")
+        return None
+
+
+def _analysis_query(ctx):
+    return f"{system_prompt}\n\nPatient says: {ctx['translate_query']}"
+
+
+def _analyze(ctx):
+    image = ctx["encode_image"]
+    if image:
+        return analyze_image_with_query(
+            query=_analysis_query(ctx),
+            model=VISION_MODEL,
+            encoded_image=image.data,
+            mime_type=image.mime_type,
+            user_id=ctx["user_id"]
+        )
+    return "Please provide an image for analysis"
+
+
+def _translate_response(ctx):
+    if ctx["language"] == "Hindi":
+        return translate_text(
+            text=ctx["analyze"],
+            source_lang="en",
+            target_lang="hi",
+            GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
+        )
+    return ctx["analyze"]
+
+
+def _analyze_bilingual(ctx):
+    image = ctx["encode_image"]
+    if image:
+        result = analyze_image_bilingual(
+            query=f"{system_prompt}\n{BILINGUAL_INSTRUCTIONS}\nPatient says: {ctx['transcribe']}",
+            model=VISION_MODEL,
+            encoded_image=image.data,
+            mime_type=image.mime_type,
+            user_id=ctx["user_id"]
+        )
+        if result:
+            return result
+        logging.warning("Fused analysis unusable, falling back to separate translation calls")
+    english = _analyze({**ctx, "translate_query": _translate_query(ctx)})
+    return english, _translate_response({**ctx, "analyze": english})
+
+
+def _tts(ctx):
+    return text_to_speech(
+        input_text=ctx["translate_response"],
+        output_filepath=ctx["audio_response_path"],
+        language=ctx["lang_code"]
+    )
+
+
+def _save(ctx, audio_response_path=None):
+    # Uploads live in Gradio's temp dir; keep durable copies for the record.
+    # In the pipeline this runs alongside TTS, so the audio is attached later.
+    return save_consultation(
+        user_id=ctx["user_id"],
+        audio_path=store_upload(ctx["audio_filepath"]),
+        image_path=store_upload(ctx["image_filepath"]),
+        patient_speech=ctx["transcribe"],
+        doctor_response=ctx["analyze"],
+        audio_response_path=audio_response_path,
+        language=ctx["language"]
+    )
+
+
+def _attach_audio(ctx):
+    # text_to_speech returns "" when every backend failed; leave the record without audio then
+    if ctx["tts"] and ctx["save"]:
+        set_audio_response_path(ctx["save"], ctx["tts"])
+    return ctx["tts"] or None
+
+
+# Image encoding overlaps transcription, and the database write only needs
+# the English response, so it overlaps the Hindi translation and TTS; the
+# audio path is added to the record only after TTS has written the file.
+CONSULTATION_STAGES = [
+    Stage("transcribe", _transcribe, resource="stt"),
+    Stage("encode_image", _encode_image),
+    Stage("translate_query", _translate_query, depends_on=["transcribe"], resource="translation"),
+    Stage("analyze", _analyze, depends_on=["translate_query", "encode_image"], resource="vision"),
+    Stage("translate_response", _translate_response, depends_on=["analyze"], resource="translation"),
+    Stage("tts", _tts, depends_on=["translate_response"], resource="tts"),
+    Stage("save", _save, depends_on=["transcribe", "analyze"]),
+    Stage("attach_audio", _attach_audio, depends_on=["save", "tts"]),
+]
+
+# Process-wide caps on concurrent calls to each remote service, shared by
+# every consultation (STAGE_CONCURRENCY_<RESOURCE> overrides the default)
+STAGE_LIMITS = {
+    resource: threading.BoundedSemaphore(int(os.environ.get(f"STAGE_CONCURRENCY_{resource.upper()}", default)))
+    for resource, default in (("stt", 8), ("vision", 8), ("translation", 16), ("tts", 8))
+}
+
+# Fused Hindi path: one vision call yields both responses; the two picker
+# stages keep the result names the rest of the pipeline expects
+FUSED_STAGES = [
+    Stage("transcribe", _transcribe, resource="stt"),
+    Stage("encode_image", _encode_image),
+    Stage("analyze_bilingual", _analyze_bilingual, depends_on=["transcribe", "encode_image"], resource="vision"),
+    Stage("analyze", lambda ctx: ctx["analyze_bilingual"][0], depends_on=["analyze_bilingual"]),
+    Stage("translate_response", lambda ctx: ctx["analyze_bilingual"][1], depends_on=["analyze_bilingual"]),
+    Stage("tts", _tts, depends_on=["translate_response"], resource="tts"),
+    Stage("save", _save, depends_on=["transcribe", "analyze"]),
+    Stage("attach_audio", _attach_audio, depends_on=["save", "tts"]),
+]
+AUDIO_STAGES = ("tts", "attach_audio")
+
+consultation_pipeline = Pipeline(CONSULTATION_STAGES, limits=STAGE_LIMITS)
+fused_pipeline = Pipeline(FUSED_STAGES, limits=STAGE_LIMITS)
+
+# Used when the caller streams the doctor's voice itself (and attaches it to the record)
+text_only_pipeline = Pipeline([s for s in CONSULTATION_STAGES if s.name not in AUDIO_STAGES],
+                              limits=STAGE_LIMITS)
+fused_text_only_pipeline = Pipeline([s for s in FUSED_STAGES if s.name not in AUDIO_STAGES], limits=STAGE_LIMITS)
+
+# Everything the streamed analysis needs before it can start
+pre_analysis_pipeline = Pipeline(
+    [s for s in CONSULTATION_STAGES if s.name in ("transcribe", "encode_image", "translate_query")],
+    limits=STAGE_LIMITS)
+
+
+def _record_consultation(consultation_id, language, timings):
+    logging.info(f"Consultation stage timings: {timings}")
+    metrics.record_consultation(language)
+    if RECORD_TRACES and consultation_id:
+        try:
+            save_consultation_trace(consultation_id, json.dumps(timings))
+        except Exception as e:
+            logging.warning(f"Could not record consultation trace: {e}")
+
+
+def run_consultation(user_id, audio_filepath, image_filepath, language, audio_response_path,
+                     synthesize_audio=True, fused=None):
+    """Run one consultation through the stage pipeline.
+
+    Returns a dict with the patient speech, the English and displayed doctor
+    responses, the audio response path (None if TTS failed), the saved
+    consultation id and the per-stage timings. With
+    synthesize_audio=False the TTS stage is skipped so the caller can stream
+    the audio to audio_response_path instead, and must attach it to the
+    record with set_audio_response_path() once the file exists. fused overrides FUSED_HINDI for
+    Hindi consultations.
+    """
+    if language == "Hindi" and (FUSED_HINDI if fused is None else fused):
+        pipeline = fused_pipeline if synthesize_audio else fused_text_only_pipeline
+    else:
+        pipeline = consultation_pipeline if synthesize_audio else text_only_pipeline
+    results, timings = pipeline.run({
+        "user_id": user_id,
+        "audio_filepath": audio_filepath,
+        "image_filepath": image_filepath,
+        "language": language,
+        "lang_code": "hi" if language == "Hindi" else "en",
+        "audio_response_path": audio_response_path,
+    })
+    _record_consultation(results.get("save"), language, timings)
+
+    return {
+        "patient_speech": results["transcribe"],
+        "doctor_response": results["analyze"],
+        "display_doctor_response": results["translate_response"],
+        "audio_response_path": results["attach_audio"] if synthesize_audio else audio_response_path,
+        "consultation_id": results["save"],
+        "timings": timings,
+    }
+
+
+class _SentenceFollower:
+    """Translates and voices completed sentences of a streamed response.
+
+    Sentences are worked on concurrently but released strictly in order.
+    TTS runs on its own pool so it can wait for a translation without
+    starving the translation workers.
+    """
+
+    def __init__(self, language, lang_code, synthesize, max_workers=4):
+        self.language = language
+        self.lang_code = lang_code
+        self.synthesize = synthesize
+        self._translator = ThreadPoolExecutor(max_workers=max_workers)
+        self._speaker = ThreadPoolExecutor(max_workers=max_workers)
+        self._texts = []
+        self._audio = []
+        self._next_text = 0
+        self._next_audio = 0
+
+    def _translate(self, sentence):
+        if self.language != "Hindi":
+            return sentence
+        with STAGE_LIMITS["translation"]:
+            return _translate_response({"language": self.language, "analyze": sentence})
+
+    def _speak(self, text_future):
+        with STAGE_LIMITS["tts"]:
+            return synthesize_sentence(text_future.result(), self.lang_code)
+
+    def add(self, sentence):
+        text = self._translator.submit(self._translate, sentence)
+        self._texts.append(text)
+        if self.synthesize:
+            self._audio.append(self._speaker.submit(self._speak, text))
+
+    @property
+    def finished(self):
+        return self._next_text == len(self._texts) and self._next_audio == len(self._audio)
+
+    def poll(self, block=False):
+        """Return (display sentences, MP3 chunks) ready so far; block waits for the next one"""
+        if block and not self.finished:
+            if self._next_text < len(self._texts):
+                wait([self._texts[self._next_text]])
+            else:
+                wait([self._audio[self._next_audio]])
+
+        texts, chunks = [], []
+        while self._next_text < len(self._texts) and self._texts[self._next_text].done():
+            texts.append(self._texts[self._next_text].result())
+            self._next_text += 1
+        while self._next_audio < len(self._audio) and self._audio[self._next_audio].done():
+            try:
+                chunks.append(self._audio[self._next_audio].result())
+            except Exception as e:
+                print(f"TTS error: {e}")
+                metrics.record_error("tts")
+            self._next_audio += 1
+        return texts, chunks
+
+    def close(self):
+        self._translator.shutdown(wait=False, cancel_futures=True)
+        self._speaker.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_consultation(user_id, audio_filepath, image_filepath, language, audio_response_path,
+                        synthesize_audio=True):
+    """Run a consultation, yielding updates while the doctor's analysis streams in.
+
+    Each update is a dict with patient_speech, doctor_response (English so
+    far), display_doctor_response (what the patient should see so far) and
+    audio (an MP3 chunk or None). Each sentence is translated and voiced as
+    soon as it is complete. The last update also carries
+    consultation_id, audio_response_path and timings.
+    """
+    started = time.perf_counter()
+    lang_code = "hi" if language == "Hindi" else "en"
+    results, timings = pre_analysis_pipeline.run({
+        "user_id": user_id,
+        "audio_filepath": audio_filepath,
+        "image_filepath": image_filepath,
+        "language": language,
+        "lang_code": lang_code,
+    })
+    update = {"patient_speech": results["transcribe"], "doctor_response": "",
+              "display_doctor_response": "", "audio": None}
+    yield dict(update)
+
+    follower = _SentenceFollower(language, lang_code, synthesize_audio)
+    displayed = []
+    part_path = f"{audio_response_path}.part" if synthesize_audio else None
+    audio_out = open(part_path, "wb") if part_path else None
+
+    def updates(texts, chunks):
+        displayed.extend(texts)
+        update["display_doctor_response"] = (
+            " ".join(displayed) if language == "Hindi" else update["doctor_response"])
+        for chunk in chunks:
+            audio_out.write(chunk)
+            yield {**update, "audio": chunk}
+        if not chunks:
+            yield {**update, "audio": None}
+
+    try:
+        image = results["encode_image"]
+        analysis_start = time.perf_counter()
+        first_token = None
+        pending = ""
+        with STAGE_LIMITS["vision"]:
+            if image:
+                pieces = stream_image_analysis(_analysis_query(results), VISION_MODEL, image.data,
+                                               mime_type=image.mime_type, user_id=user_id)
+            else:
+                pieces = iter(["Please provide an image for analysis"])
+            for piece in pieces:
+                if first_token is None:
+                    first_token = time.perf_counter() - analysis_start
+                update["doctor_response"] += piece
+                # Everything before the last sentence boundary is complete
+                *complete, pending = SENTENCE_BOUNDARY.split(pending + piece)
+                for sentence in complete:
+                    if sentence.strip():
+                        follower.add(sentence.strip())
+                yield from updates(*follower.poll())
+        if pending.strip():
+            follower.add(pending.strip())
+        analysis_end = time.perf_counter()
+        metrics.observe_stage("analyze", analysis_end - analysis_start)
+
+        while not follower.finished:
+            yield from updates(*follower.poll(block=True))
+
+        if audio_out:
+            audio_out.close()
+            audio_out = None
+            if os.path.getsize(part_path):
+                os.replace(part_path, audio_response_path)
+            else:
+                audio_response_path = None
+
+        save_start = time.perf_counter()
+        consultation_id = _save({
+            "user_id": user_id,
+            "audio_filepath": audio_filepath,
+            "image_filepath": image_filepath,
+            "transcribe": results["transcribe"],
+            "analyze": update["doctor_response"],
+            "language": language,
+        }, audio_response_path)
+        end = time.perf_counter()
+        timings["analyze"] = {
+            "start": round(analysis_start - started, 4),
+            "end": round(analysis_end - started, 4),
+            "duration": round(analysis_end - analysis_start, 4),
+            "first_token": round(first_token, 4) if first_token is not None else None,
+        }
+        timings["save"] = {"start": round(save_start - started, 4), "end": round(end - started, 4),
+                           "duration": round(end - save_start, 4)}
+        timings["total"] = {"start": 0.0, "end": round(end - started, 4), "duration": round(end - started, 4)}
+        _record_consultation(consultation_id, language, timings)
+        yield {**update, "audio": None, "consultation_id": consultation_id,
+               "audio_response_path": audio_response_path, "timings": timings}
+    finally:
+        follower.close()
+        if audio_out:
+            audio_out.close()
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
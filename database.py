@@ -1,65 +1,302 @@
 # database.py
+from config import load_config
+
+# Settings below are read at import, so .env must be loaded first
+load_config()
+
 import sqlite3
 import os
+import time
+import queue
+import hashlib
+import logging
+import secrets
+import threading
+from contextlib import contextmanager
+
+# Every app process of a multi-worker deployment must point at the same file
+DB_PATH = os.environ.get("MEDICAL_HISTORY_DB", 'medical_history.db')
+SESSION_TTL = float(os.environ.get("SESSION_TTL_SECONDS", 7 * 24 * 3600))
+
+SEARCH_TOKENIZER = "unicode61 categories 'L* N* Co M*'"
+
+# Applied in order; PRAGMA user_version records the last one that ran.
+# Version 1 matches the original schema, so existing databases pick up
+# only the later migrations.
+MIGRATIONS = [
+    (1, [
+        '''CREATE TABLE IF NOT EXISTS users (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           username TEXT UNIQUE NOT NULL,
+           password TEXT NOT NULL,
+           full_name TEXT,
+           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TABLE IF NOT EXISTS consultations (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           user_id INTEGER NOT NULL,
+           timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           audio_path TEXT,
+           image_path TEXT,
+           patient_speech TEXT,
+           doctor_response TEXT,
+           audio_response_path TEXT,
+           language TEXT,
+           FOREIGN KEY (user_id) REFERENCES users (id)
+           )''',
+    ]),
+    (2, [
+        '''CREATE INDEX IF NOT EXISTS idx_consultations_user_timestamp
+           ON consultations (user_id, timestamp DESC)''',
+    ]),
+    (3, [
+        # Keyset pagination orders by (timestamp, id); include id so the
+        # index alone satisfies the ORDER BY without a temp sort
+        '''CREATE INDEX IF NOT EXISTS idx_consultations_user_timestamp_id
+           ON consultations (user_id, timestamp DESC, id DESC)''',
+        'DROP INDEX IF EXISTS idx_consultations_user_timestamp',
+    ]),
+    (4, [
+        # JSON per-stage timings of the consultation, when tracing is enabled
+        'ALTER TABLE consultations ADD COLUMN trace TEXT',
+    ]),
+    (5, [
+        # Full-text index over what was said and answered. It stores no text
+        # of its own (its content is the view below) and is kept in sync by
+        # triggers. The owner column holds a "u<user_id>" token so a search
+        # intersects with the user's own rows inside FTS instead of ranking
+        # every user's matches and filtering afterwards.
+        '''CREATE VIEW IF NOT EXISTS consultations_search AS
+           SELECT id, patient_speech, doctor_response, 'u' || user_id AS owner
+           FROM consultations''',
+        # unicode61 splits on marks by default, which cuts Hindi words apart
+        # at every vowel sign; counting M* as token characters keeps them whole.
+        f'''CREATE VIRTUAL TABLE IF NOT EXISTS consultations_fts USING fts5(
+           patient_speech, doctor_response, owner,
+           content='consultations_search', content_rowid='id',
+           tokenize="{SEARCH_TOKENIZER}"
+           )''',
+        '''CREATE TRIGGER IF NOT EXISTS consultations_fts_insert AFTER INSERT ON consultations BEGIN
+           INSERT INTO consultations_fts (rowid, patient_speech, doctor_response, owner)
+           VALUES (new.id, new.patient_speech, new.doctor_response, 'u' || new.user_id);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS consultations_fts_delete AFTER DELETE ON consultations BEGIN
+           INSERT INTO consultations_fts (consultations_fts, rowid, patient_speech, doctor_response, owner)
+           VALUES ('delete', old.id, old.patient_speech, old.doctor_response, 'u' || old.user_id);
+           END''',
+        # Only text and owner edits touch the index; trace and media path updates don't
+        '''CREATE TRIGGER IF NOT EXISTS consultations_fts_update
+           AFTER UPDATE OF patient_speech, doctor_response, user_id ON consultations BEGIN
+           INSERT INTO consultations_fts (consultations_fts, rowid, patient_speech, doctor_response, owner)
+           VALUES ('delete', old.id, old.patient_speech, old.doctor_response, 'u' || old.user_id);
+           INSERT INTO consultations_fts (rowid, patient_speech, doctor_response, owner)
+           VALUES (new.id, new.patient_speech, new.doctor_response, 'u' || new.user_id);
+           END''',
+        # Backfill consultations saved before the index existed
+        "INSERT INTO consultations_fts (consultations_fts) VALUES ('rebuild')",
+    ]),
+    (6, [
+        # Logins outlive any one app process; only a hash of the token is kept
+        '''CREATE TABLE IF NOT EXISTS sessions (
+           token_hash TEXT PRIMARY KEY,
+           user_id INTEGER NOT NULL,
+           created_at REAL NOT NULL,
+           expires_at REAL NOT NULL,
+           FOREIGN KEY (user_id) REFERENCES users (id)
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)',
+    ]),
+]
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+]
+
+# Statements are kept as constants so each pooled connection's statement
+# cache compiles them once and reuses the prepared form.
+SQL_INSERT_USER = "INSERT INTO users (username, password, full_name) VALUES (?, ?, ?)"
+SQL_AUTHENTICATE = "SELECT id, full_name FROM users WHERE username = ? AND password = ?"
+SQL_INSERT_CONSULTATION = '''INSERT INTO consultations
+                 (user_id, audio_path, image_path, patient_speech, doctor_response, audio_response_path, language)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)'''
+SQL_UPDATE_TRACE = "UPDATE consultations SET trace = ? WHERE id = ?"
+SQL_UPDATE_AUDIO_RESPONSE = "UPDATE consultations SET audio_response_path = ? WHERE id = ?"
+SQL_HISTORY_COLUMNS = "id, timestamp, patient_speech, doctor_response, language"
+SQL_USER_HISTORY = f'''SELECT {SQL_HISTORY_COLUMNS}
+                 FROM consultations
+                 WHERE user_id = ?
+                 ORDER BY timestamp DESC, id DESC
+                 LIMIT ?'''
+SQL_USER_HISTORY_AFTER = f'''SELECT {SQL_HISTORY_COLUMNS}
+                 FROM consultations
+                 WHERE user_id = ? AND (timestamp, id) < (?, ?)
+                 ORDER BY timestamp DESC, id DESC
+                 LIMIT ?'''
+SQL_CONSULTATION = f'''SELECT {SQL_HISTORY_COLUMNS}
+                 FROM consultations
+                 WHERE id = ? AND user_id = ?'''
+SQL_EXPORT_COLUMNS = ("id, user_id, timestamp, language, patient_speech, doctor_response, "
+                      "audio_path, image_path, audio_response_path")
+SQL_EXPORT_ALL = f"SELECT {SQL_EXPORT_COLUMNS} FROM consultations ORDER BY id"
+SQL_EXPORT_USER = f"SELECT {SQL_EXPORT_COLUMNS} FROM consultations WHERE user_id = ? ORDER BY id"
+# bm25 weights: a match in the patient's own words counts double; owner never scores
+SQL_SEARCH = '''SELECT c.id, c.timestamp, c.language,
+                        snippet(consultations_fts, 0, ?, ?, '…', ?),
+                        snippet(consultations_fts, 1, ?, ?, '…', ?),
+                        bm25(consultations_fts, 2.0, 1.0, 0.0) AS score
+                 FROM consultations_fts
+                 JOIN consultations c ON c.id = consultations_fts.rowid
+                 WHERE consultations_fts MATCH ? AND c.user_id = ?
+                 ORDER BY score, c.id DESC
+                 LIMIT ? OFFSET ?'''
+SQL_REBUILD_SEARCH = "INSERT INTO consultations_fts (consultations_fts) VALUES ('rebuild')"
+SQL_INSERT_SESSION = "INSERT INTO sessions (token_hash, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)"
+SQL_GET_SESSION = '''SELECT u.id, u.full_name, u.username
+                 FROM sessions s JOIN users u ON u.id = s.user_id
+                 WHERE s.token_hash = ? AND s.expires_at > ?'''
+SQL_DELETE_SESSION = "DELETE FROM sessions WHERE token_hash = ?"
+SQL_PURGE_SESSIONS = "DELETE FROM sessions WHERE expires_at <= ?"
+SQL_MEDIA_PATHS = "SELECT id, audio_path, image_path, audio_response_path FROM consultations"
+SQL_UPDATE_MEDIA = '''UPDATE consultations
+                 SET audio_path = ?, image_path = ?, audio_response_path = ?
+                 WHERE id = ?'''
+SQL_EXPIRE_MEDIA = '''UPDATE consultations
+                 SET audio_path = NULL, image_path = NULL, audio_response_path = NULL
+                 WHERE timestamp < datetime('now', ?)
+                   AND (audio_path IS NOT NULL OR image_path IS NOT NULL OR audio_response_path IS NOT NULL)'''
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections configured for concurrent use"""
+
+    def __init__(self, db_path, max_connections=8, timeout=30.0):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               check_same_thread=False, cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_connections:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"Timed out waiting for a connection to {self.db_path}")
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; commits on success and rolls back on error"""
+        conn = self._acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        """Close idle connections; busy ones are closed when returned"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
 
 
-def init_database():
+_pool = None
+_pool_lock = threading.Lock()
+# Set once migrations have run, so concurrent first users don't race them
+_ready = False
+_init_lock = threading.Lock()
+
+
+def _get_pool():
+    if not _ready:
+        with _init_lock:
+            if not _ready:
+                # Nobody called init_database() explicitly; do it on first use
+                init_database()
+    return _pool
+
+
+def migrate(conn):
+    """Apply any migrations newer than the database's user_version.
+
+    Runs under a write lock, so app processes starting together apply each
+    migration once; the others wait and then find nothing left to do.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {version}")
+        logging.info(f"Applied database migration {version}")
+    return max(current, MIGRATIONS[-1][0])
+
+
+def init_database(db_path=None, max_connections=8):
     """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect('medical_history.db')
-    c = conn.cursor()
-
-    # Create users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 username TEXT UNIQUE NOT NULL,
-                 password TEXT NOT NULL,
-                 full_name TEXT,
-                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                 )''')
-
-    # Create consultations table (updated schema)
-    c.execute('''CREATE TABLE IF NOT EXISTS consultations (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 user_id INTEGER NOT NULL,
-                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                 audio_path TEXT,
-                 image_path TEXT,
-                 patient_speech TEXT,
-                 doctor_response TEXT,
-                 audio_response_path TEXT,
-                 language TEXT,
-                 FOREIGN KEY (user_id) REFERENCES users (id)
-                 )''')
-
-    conn.commit()
-    conn.close()
+    global _pool, DB_PATH, _ready
+    with _pool_lock:
+        if db_path and db_path != DB_PATH:
+            DB_PATH = db_path
+            if _pool is not None:
+                _pool.close()
+                _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(DB_PATH, max_connections=max_connections)
+
+    with _pool.connection() as conn:
+        migrate(conn)
+    _ready = True
 
 
 def create_user(username, password, full_name):
     """Create a new user in the database"""
-    conn = sqlite3.connect('medical_history.db')
-    c = conn.cursor()
-
     try:
-        c.execute("INSERT INTO users (username, password, full_name) VALUES (?, ?, ?)",
-                  (username, password, full_name))
-        conn.commit()
+        with _get_pool().connection() as conn:
+            conn.execute(SQL_INSERT_USER, (username, password, full_name))
         return True
     except sqlite3.IntegrityError:
         return False  # Username already exists
-    finally:
-        conn.close()
 
 
 def authenticate_user(username, password):
     """Authenticate a user"""
-    conn = sqlite3.connect('medical_history.db')
-    c = conn.cursor()
-
-    c.execute("SELECT id, full_name FROM users WHERE username = ? AND password = ?",
-              (username, password))
-    user = c.fetchone()
-    conn.close()
+    with _get_pool().connection() as conn:
+        user = conn.execute(SQL_AUTHENTICATE, (username, password)).fetchone()
 
     if user:
         return {"user_id": user[0], "full_name": user[1]}
@@ -68,42 +305,197 @@ def authenticate_user(username, password):
 
 def save_consultation(user_id, audio_path, image_path, patient_speech, doctor_response, audio_response_path, language):
     """Save a consultation to the database"""
-    conn = sqlite3.connect('medical_history.db')
-    c = conn.cursor()
+    with _get_pool().connection() as conn:
+        cursor = conn.execute(SQL_INSERT_CONSULTATION,
+                              (user_id, audio_path, image_path, patient_speech, doctor_response,
+                               audio_response_path, language))
+        return cursor.lastrowid
 
-    c.execute('''INSERT INTO consultations 
-                 (user_id, audio_path, image_path, patient_speech, doctor_response, audio_response_path, language)
-                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
-              (user_id, audio_path, image_path, patient_speech, doctor_response, audio_response_path, language))
 
-    conn.commit()
-    conn.close()
+def set_audio_response_path(consultation_id, audio_response_path):
+    """Point a saved consultation at its doctor's audio once the file exists"""
+    with _get_pool().connection() as conn:
+        conn.execute(SQL_UPDATE_AUDIO_RESPONSE, (audio_response_path, consultation_id))
 
 
-def get_user_history(user_id):
-    """Retrieve a user's consultation history"""
-    conn = sqlite3.connect('medical_history.db')
-    c = conn.cursor()
+def save_consultation_trace(consultation_id, trace):
+    """Attach a JSON-serialized per-stage trace to a saved consultation"""
+    with _get_pool().connection() as conn:
+        conn.execute(SQL_UPDATE_TRACE, (trace, consultation_id))
 
-    c.execute('''SELECT id, timestamp, patient_speech, doctor_response, language 
-                 FROM consultations 
-                 WHERE user_id = ?
-                 ORDER BY timestamp DESC''', (user_id,))
 
-    history = []
-    for row in c.fetchall():
-        history.append({
-            "id": row[0],
-            "timestamp": row[1],
-            "patient_speech": row[2],
-            "doctor_response": row[3],
-            "language": row[4]
-        })
+def _history_row(row):
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "patient_speech": row[2],
+        "doctor_response": row[3],
+        "language": row[4]
+    }
+
+
+def get_user_history(user_id, after_timestamp=None, after_id=None, limit=None):
+    """Retrieve a user's consultation history, newest first.
+
+    Pass the timestamp and id of the last consultation already shown as
+    after_timestamp/after_id to fetch the next (older) page.
+    """
+    # SQLite treats a negative LIMIT as "no limit"
+    limit = -1 if limit is None else limit
+    with _get_pool().connection() as conn:
+        if after_timestamp is None:
+            rows = conn.execute(SQL_USER_HISTORY, (user_id, limit)).fetchall()
+        else:
+            # Without an id, include nothing from the boundary timestamp itself
+            after_id = -1 if after_id is None else after_id
+            rows = conn.execute(SQL_USER_HISTORY_AFTER,
+                                (user_id, after_timestamp, after_id, limit)).fetchall()
+
+    return [_history_row(row) for row in rows]
+
+
+def get_consultation(consultation_id, user_id):
+    """Fetch a single consultation belonging to user_id"""
+    with _get_pool().connection() as conn:
+        row = conn.execute(SQL_CONSULTATION, (consultation_id, user_id)).fetchone()
+    return _history_row(row) if row else None
+
+
+def iter_media_paths():
+    """Yield (id, audio_path, image_path, audio_response_path) for every consultation.
+
+    Rows are streamed from the cursor rather than loaded at once.
+    """
+    with _get_pool().connection() as conn:
+        yield from conn.execute(SQL_MEDIA_PATHS)
+
+
+def update_media_paths(consultation_id, audio_path, image_path, audio_response_path):
+    """Point a consultation at new media file locations"""
+    with _get_pool().connection() as conn:
+        conn.execute(SQL_UPDATE_MEDIA, (audio_path, image_path, audio_response_path, consultation_id))
+
+
+def expire_media_paths(max_age_days):
+    """Drop media references from consultations older than max_age_days.
+
+    The consultation text stays; media GC then removes files that no newer
+    consultation refers to. Returns the number of consultations changed.
+    """
+    with _get_pool().connection() as conn:
+        return conn.execute(SQL_EXPIRE_MEDIA, (f"-{float(max_age_days)} days",)).rowcount
+
+
+def iter_consultations(user_id=None, batch_size=500):
+    """Yield full consultation rows as dicts, oldest first, for one user or everyone.
+
+    Rows are pulled from the cursor batch_size at a time, so memory stays
+    flat however many consultations there are. The read is one statement,
+    so it sees a consistent snapshot while writers carry on (WAL).
+    """
+    with _get_pool().connection() as conn:
+        if user_id is None:
+            cursor = conn.execute(SQL_EXPORT_ALL)
+        else:
+            cursor = conn.execute(SQL_EXPORT_USER, (user_id,))
+        columns = [description[0] for description in cursor.description]
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            cursor.close()
+
+
+def search_query(text, user_id=None, prefix=False):
+    """Turn free text into an FTS5 query matching every word, optionally in one user's rows.
+
+    Words are quoted so user input can't inject FTS operators; with prefix
+    the last word also matches as a prefix, for search-as-you-type.
+    """
+    terms = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if not terms:
+        return ""
+    if prefix:
+        terms[-1] += "*"
+    query = " ".join(terms)
+    if user_id is not None:
+        # Terms are left unrestricted: a column filter on them costs more than the
+        # rare false hit on an owner token, which is always the searcher's own row
+        query = f'owner : "u{int(user_id)}" AND {query}'
+    return query
+
+
+def search_consultations(user_id, text, limit=20, offset=0, prefix=False,
+                         highlight=("<mark>", "</mark>"), snippet_tokens=16):
+    """Search one user's consultations, best match first.
+
+    Returns dicts with id, timestamp, language, score and a highlighted
+    snippet of each text column. Page with offset.
+    """
+    query = search_query(text, user_id, prefix)
+    if not query:
+        return []
+    start, end = highlight
+    with _get_pool().connection() as conn:
+        rows = conn.execute(SQL_SEARCH, (start, end, snippet_tokens, start, end, snippet_tokens,
+                                         query, user_id, limit, offset)).fetchall()
+    return [{
+        "id": row[0],
+        "timestamp": row[1],
+        "language": row[2],
+        "patient_speech": row[3],
+        "doctor_response": row[4],
+        "score": row[5],
+    } for row in rows]
+
+
+def rebuild_search_index():
+    """Re-index every consultation, e.g. after rows were changed with triggers disabled"""
+    with _get_pool().connection() as conn:
+        conn.execute(SQL_REBUILD_SEARCH)
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_session(user_id, ttl=None):
+    """Start a login session any app process can resume; returns its token.
+
+    Expired sessions are purged here, so the table stays about as large as
+    the number of live logins.
+    """
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    with _get_pool().connection() as conn:
+        conn.execute(SQL_PURGE_SESSIONS, (now,))
+        conn.execute(SQL_INSERT_SESSION, (_token_hash(token), user_id, now, now + (ttl or SESSION_TTL)))
+    return token
+
+
+def get_session(token):
+    """The user a live session token belongs to, or None"""
+    if not token:
+        return None
+    with _get_pool().connection() as conn:
+        row = conn.execute(SQL_GET_SESSION, (_token_hash(token), time.time())).fetchone()
+    if row:
+        return {"user_id": row[0], "full_name": row[1], "username": row[2]}
+    return None
+
 
-    conn.close()
-    print(history)
-    return history
+def delete_session(token):
+    """End a session (logout)"""
+    if token:
+        with _get_pool().connection() as conn:
+            conn.execute(SQL_DELETE_SESSION, (_token_hash(token),))
 
 
-# Initialize the database when this module is imported
-init_database()
\ No newline at end of file
+def purge_expired_sessions():
+    """Delete expired sessions; returns how many were removed"""
+    with _get_pool().connection() as conn:
+        return conn.execute(SQL_PURGE_SESSIONS, (time.time(),)).rowcount
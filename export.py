@@ -0,0 +1,215 @@
+# export.py
+"""Streaming export of consultation records.
+
+    python export.py --user 3 --format csv -o records.csv
+    python export.py --archive zip -o all_records.zip
+
+Records are read from a cursor and written one at a time, and media files
+are copied into archives in chunks, so memory use does not grow with the
+number or size of consultations.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import uuid
+import logging
+import tarfile
+import zipfile
+import argparse
+import tempfile
+
+from database import iter_consultations
+
+EXPORT_FIELDS = ["id", "user_id", "timestamp", "language", "patient_speech", "doctor_response",
+                 "audio_path", "image_path", "audio_response_path"]
+# Path column -> file name inside an archive's per-consultation folder
+MEDIA_FIELDS = {"audio_path": "audio", "image_path": "image", "audio_response_path": "response"}
+COPY_CHUNK_SIZE = 1024 * 1024
+# Manifests stay in memory up to this size, then spill to a temp file
+MANIFEST_SPOOL_BYTES = 8 * 1024 * 1024
+ARCHIVE_FORMATS = ("zip", "tar", "tar.gz")
+# Archives built for download in the UI are deleted after this long by default
+EXPORT_MAX_AGE_SECONDS = 24 * 3600
+
+
+def write_jsonl(records, out):
+    """Write one JSON object per line to a text stream; returns the record count"""
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(records, out, fields=None):
+    """Write records as CSV with a header row; returns the record count"""
+    writer = csv.DictWriter(out, fieldnames=fields or EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+WRITERS = {"jsonl": write_jsonl, "csv": write_csv}
+
+
+def export_records(out, user_id=None, fmt="jsonl"):
+    """Stream one user's (or every user's) consultations to a text stream as JSONL or CSV"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {sorted(WRITERS)}")
+    return WRITERS[fmt](iter_consultations(user_id), out)
+
+
+class _ZipWriter:
+    def __init__(self, fileobj):
+        self._zip = zipfile.ZipFile(fileobj, "w")
+
+    def add(self, stream, size, mtime, arcname, compress=False):
+        info = zipfile.ZipInfo(arcname, time.localtime(mtime)[:6])
+        # Audio and images are already compressed; deflating them again only costs CPU
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        info.file_size = size
+        with self._zip.open(info, "w", force_zip64=True) as dst:
+            while chunk := stream.read(COPY_CHUNK_SIZE):
+                dst.write(chunk)
+
+    def close(self):
+        self._zip.close()
+
+
+class _TarWriter:
+    def __init__(self, fileobj, compression=""):
+        # Stream mode ("w|") never seeks, so the output can be a pipe or socket
+        self._tar = tarfile.open(fileobj=fileobj, mode=f"w|{compression}")
+
+    def add(self, stream, size, mtime, arcname, compress=False):
+        info = tarfile.TarInfo(arcname)
+        info.size = size
+        info.mtime = int(mtime)
+        self._tar.addfile(info, stream)
+
+    def close(self):
+        self._tar.close()
+
+
+def _open_archive(fileobj, fmt):
+    if fmt == "zip":
+        return _ZipWriter(fileobj)
+    if fmt == "tar":
+        return _TarWriter(fileobj)
+    if fmt == "tar.gz":
+        return _TarWriter(fileobj, "gz")
+    raise ValueError(f"Unknown archive format {fmt!r}, expected one of {ARCHIVE_FORMATS}")
+
+
+def write_archive(fileobj, user_id=None, fmt="zip"):
+    """Stream consultations and their media files into a zip or tar archive.
+
+    Each consultation's files go in a <id>/ folder; records.jsonl at the end
+    lists every consultation with its archive-relative file names (null when
+    the file is gone). fileobj is a binary stream; tar output never seeks.
+    Returns a summary of what was written.
+    """
+    archive = _open_archive(fileobj, fmt)
+    summary = {"consultations": 0, "files": 0, "bytes": 0, "missing_files": 0}
+    with tempfile.SpooledTemporaryFile(max_size=MANIFEST_SPOOL_BYTES) as manifest:
+        try:
+            for record in iter_consultations(user_id):
+                for field, name in MEDIA_FIELDS.items():
+                    path = record[field]
+                    record[field] = None
+                    if not path:
+                        continue
+                    if not os.path.isfile(path):
+                        summary["missing_files"] += 1
+                        continue
+                    arcname = f"{record['id']}/{name}{os.path.splitext(path)[1].lower()}"
+                    try:
+                        src = open(path, "rb")
+                    except OSError as e:
+                        logging.warning(f"Skipping {path} in export: {e}")
+                        summary["missing_files"] += 1
+                        continue
+                    # Errors writing the archive itself are not skippable; let them propagate
+                    with src:
+                        st = os.fstat(src.fileno())
+                        archive.add(src, st.st_size, st.st_mtime, arcname)
+                    record[field] = arcname
+                    summary["files"] += 1
+                    summary["bytes"] += st.st_size
+                manifest.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                summary["consultations"] += 1
+
+            size = manifest.tell()
+            manifest.seek(0)
+            archive.add(manifest, size, time.time(), "records.jsonl", compress=True)
+        finally:
+            archive.close()
+    return summary
+
+
+def export_dir():
+    """Where download archives are written (EXPORT_DIR, default <tmp>/ai_doctor_exports)"""
+    return os.path.abspath(os.environ.get("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "ai_doctor_exports"))
+
+
+def new_export_path(user_id, fmt="zip"):
+    """Fresh path for a user's download archive, under export_dir().
+
+    The directory is kept apart from the media store, whose GC would remove
+    an archive that is still being downloaded. Archives older than
+    EXPORT_MAX_AGE_SECONDS are pruned here instead, when the next one is made.
+    """
+    directory = export_dir()
+    max_age = float(os.environ.get("EXPORT_MAX_AGE_SECONDS", EXPORT_MAX_AGE_SECONDS))
+    os.makedirs(directory, exist_ok=True)
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            continue  # pruned by another process
+    return os.path.join(directory, f"records_{user_id}_{uuid.uuid4().hex}.{fmt}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export consultation records")
+    parser.add_argument("--user", type=int, help="Only this user's consultations (default: everyone)")
+    parser.add_argument("--format", default="jsonl", choices=sorted(WRITERS), help="Record format")
+    parser.add_argument("--archive", choices=ARCHIVE_FORMATS,
+                        help="Write an archive with the audio, image and response files instead")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--db", help="Database path (default: medical_history.db)")
+    args = parser.parse_args()
+
+    from config import load_config
+    from database import init_database
+    load_config()
+    init_database(args.db)
+
+    started = time.perf_counter()
+    if args.archive:
+        if args.output:
+            with open(args.output, "wb") as out:
+                summary = write_archive(out, args.user, args.archive)
+        else:
+            summary = write_archive(sys.stdout.buffer, args.user, args.archive)
+    else:
+        if args.output:
+            with open(args.output, "w", newline="", encoding="utf-8") as out:
+                count = export_records(out, args.user, args.format)
+        else:
+            count = export_records(sys.stdout, args.user, args.format)
+        summary = {"consultations": count}
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,133 +1,130 @@
 # gradio_app.py
-from dotenv import load_dotenv
+from config import load_config, env_flag, TRUE_VALUES
 
-load_dotenv()
+load_config()
 
 import os
-import gradio as gr
-import uuid
-import datetime
+import html
 import sqlite3
-from database import create_user, authenticate_user, save_consultation, get_user_history
-from brain_of_the_doctor import encode_image, analyze_image_with_query, translate_text
-from voice_of_the_patient import transcribe_with_groq
-from voice_of_the_doctor import text_to_speech_with_gtts
-
-# Optimized system prompt
-system_prompt = """
-As a medical professional examining this image, provide your analysis directly to the patient.
-If you observe any medical concerns:
-1. Clearly describe your findings in plain language
-2. Suggest potential next steps or remedies
-3. Keep your response to 1-2 concise sentences
-
-Structure your response as if speaking directly to the patient:
-"Based on what I'm seeing, [your observation]. I recommend [suggestion]."
-
-Important:
-- Avoid AI/model references
-- Skip technical disclaimers
-- Never use markdown formatting
-- Start immediately with your analysis
-"""
-
-# State management
-current_user = gr.State(None)
+from database import (init_database, create_user, authenticate_user, get_user_history, get_consultation,
+                      search_consultations, create_session, get_session, delete_session,
+                      set_audio_response_path)
+from consultation import run_consultation, stream_consultation
+from brain_of_the_doctor import get_translation_batcher
+from voice_of_the_doctor import stream_text_to_speech, get_tts_router
+from jobs import get_consultation_queue
+from metrics import REGISTRY, start_metrics_server
+from translation_cache import get_translation_cache
+from vision_cache import get_vision_cache
+from tts_cache import get_audio_store
+from groq_client import get_client_manager
+from media_store import get_media_store, start_garbage_collector
+from export import write_archive, export_dir, new_export_path
+
+STREAMING_TTS = env_flag("STREAMING_TTS")
+JOB_MODE = env_flag("JOB_MODE")
+# Show the doctor's analysis token by token and voice it sentence by sentence
+STREAMING_ANALYSIS = env_flag("STREAMING_ANALYSIS")
+# Browser storage key for the login session token
+SESSION_STORAGE_KEY = "ai_doctor_session"
+# Search snippets are highlighted with these control characters, which
+# survive HTML escaping and are then swapped for <mark> tags
+SNIPPET_MARKERS = ("\x02", "\x03")
 
 
 def process_inputs(audio_filepath, image_filepath, language, user_state):
     """Process user inputs and generate medical analysis"""
     if not user_state:
-        return "Please log in first", "", ""
-
-    lang_code = "hi" if language == "Hindi" else "en"
-
-    # Generate unique filenames
-    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    audio_response_path = f"response_{user_state['user_id']}_{timestamp}.mp3"
-
-    # Initialize variables
-    patient_speech = ""
-    doctor_response = ""
-    display_doctor_response = ""
-
-    try:
-        # Transcribe patient's speech
-        patient_speech = transcribe_with_groq(
-            stt_model="whisper-large-v3",
-            audio_filepath=audio_filepath,
-            GROQ_API_KEY=os.environ.get("GROQ_API_KEY"),
-            language=lang_code
-        )
-    except Exception as e:
-        patient_speech = f"Speech recognition error: {str(e)}"
-
-    display_patient_speech = patient_speech
-
-    # Translate if needed
-    if language == "Hindi":
-        patient_query = translate_text(
-            text=patient_speech,
-            source_lang="hi",
-            target_lang="en",
-            GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
-        )
-    else:
-        patient_query = patient_speech
+        yield "Please log in first", "", "", None
+        return
 
-    # Image analysis
-    encoded_img = encode_image(image_filepath) if image_filepath else None
+    # Collision-free path in the sharded media store
+    audio_response_path = get_media_store().allocate(".mp3")
 
-    if encoded_img:
-        doctor_response = analyze_image_with_query(
-            query=f"{system_prompt}\n\nPatient says: {patient_query}",
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            encoded_image=encoded_img
-        )
-    else:
-        doctor_response = "Please provide an image for analysis"
-
-    # Translate response
-    if language == "Hindi":
-        display_doctor_response = translate_text(
-            text=doctor_response,
-            source_lang="en",
-            target_lang="hi",
-            GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
-        )
-    else:
-        display_doctor_response = doctor_response
-
-    # Generate doctor's voice response
-    tts_lang = "hi" if language == "Hindi" else "en"
-    text_to_speech_with_gtts(
-        input_text=display_doctor_response,
-        output_filepath=audio_response_path,
-        language=tts_lang
-    )
-
-    # Save to database
-    save_consultation(
+    consultation_args = dict(
         user_id=user_state["user_id"],
-        audio_path=audio_filepath,
-        image_path=image_filepath,
-        patient_speech=patient_speech,
-        doctor_response=doctor_response,
+        audio_filepath=audio_filepath,
+        image_filepath=image_filepath,
+        language=language,
         audio_response_path=audio_response_path,
-        language=language
+        synthesize_audio=not STREAMING_TTS
     )
 
-    return display_patient_speech, display_doctor_response, audio_response_path
+    if STREAMING_ANALYSIS and not JOB_MODE:
+        consultation_args.pop("synthesize_audio")
+        update = None
+        for update in stream_consultation(**consultation_args):
+            # Audio chunks only make sense to a streaming player
+            audio = update["audio"] if STREAMING_TTS else None
+            yield update["patient_speech"], update["display_doctor_response"], audio, None
+        if update:
+            # A non-streaming player gets the assembled file once it is complete
+            audio = None if STREAMING_TTS else update.get("audio_response_path")
+            yield update["patient_speech"], update["display_doctor_response"], audio, update.get("consultation_id")
+        return
+
+    if JOB_MODE:
+        # Run on the bounded consultation queue and report progress while waiting
+        queue = get_consultation_queue()
+        job = queue.submit(**consultation_args)
+        for status in queue.iter_status(job):
+            if status["status"] == "queued":
+                yield f"Waiting in queue (position {status['position']})...", "", None, None
+            elif status["status"] == "running":
+                yield "Analyzing your consultation...", "", None, None
+        if job.status != "done":
+            yield job.error or "Consultation failed. Please try again.", "", None, None
+            return
+        result = job.result
+    else:
+        result = run_consultation(**consultation_args)
+
+    speech, response, consultation_id = (result["patient_speech"], result["display_doctor_response"],
+                                         result["consultation_id"])
+    if not STREAMING_TTS:
+        yield speech, response, result["audio_response_path"], consultation_id
+        return
+
+    # Stream the doctor's voice sentence by sentence; the full file is
+    # assembled at audio_response_path for the consultation record
+    streamed = False
+    try:
+        for chunk in stream_text_to_speech(
+                response,
+                output_filepath=audio_response_path,
+                language="hi" if language == "Hindi" else "en"):
+            streamed = True
+            yield speech, response, chunk, consultation_id
+    finally:
+        # Also runs if the client goes away mid-stream; the record only ever
+        # points at a complete file
+        if consultation_id and os.path.exists(audio_response_path):
+            set_audio_response_path(consultation_id, audio_response_path)
+    if not streamed:
+        yield speech, response, None, consultation_id
 
 
 def login_user(username, password):
-    """Authenticate user and return state"""
+    """Authenticate user and return state.
+
+    The login is also recorded as a session in the database, so any app
+    process can resume it from the token kept in the browser.
+    """
     user = authenticate_user(username, password)
     if user:
-        return {**user, "username": username}, f"Welcome, {user['full_name']}!"
+        session = create_session(user["user_id"])
+        return {**user, "username": username, "session": session}, f"Welcome, {user['full_name']}!"
     return None, "Invalid username or password"
 
 
+def restore_session(token):
+    """Rebuild user_state from a stored session token, e.g. after a page reload"""
+    user = get_session(token)
+    if user:
+        return {**user, "session": token}
+    return None
+
+
 def create_account(username, password, full_name):
     """Create a new user account"""
     if create_user(username, password, full_name):
@@ -135,23 +132,12 @@ def create_account(username, password, full_name):
     return None, "Username already exists"
 
 
-# Function to render history UI content as a single HTML string
-def render_history_ui_content(user_state):
-    """Dynamically creates and returns a single HTML string for the history section."""
-    if not user_state:
-        # If no user, hide the container and return empty HTML
-        return gr.update(visible=False), ""
-
-    history = get_user_history(user_state["user_id"])
+HISTORY_PAGE_SIZE = 10
 
-    html_content = ""
 
-    if not history:
-        html_content = "<p>No consultation history found.</p>"
-    else:
-        html_content = f"<h2>Medical History for {user_state['full_name']}</h2>"
-        for consult in history:
-            html_content += f"""
+def render_consultation_html(consult):
+    """Render one consultation as a collapsible HTML block"""
+    html_content = f"""
             <details style="border: 1px solid #ccc; border-radius: 5px; margin-bottom: 10px; padding: 10px; background-color: var(--background-fill-secondary);">
                 <summary style="font-weight: bold; cursor: pointer; padding: 5px; background-color: var(--block-background);">
                     Consultation - {consult['timestamp']} ({consult['language']})
@@ -164,19 +150,115 @@ def render_history_ui_content(user_state):
                     <h3>Doctor's Analysis</h3>
                     <p>{consult['doctor_response']}</p>
             """
-            # Note: Embedding local audio/image files directly in gr.HTML for playback/display
-            # requires base64 encoding or a Gradio server route for static files,
-            # which adds complexity. For now, we'll just indicate their presence.
-            if consult.get('audio_path'):
-                html_content += f"<p>Patient's Audio: Available (File: {os.path.basename(consult['audio_path'])})</p>"
-            if consult.get('audio_response_path'):
-                html_content += f"<p>Doctor's Audio: Available (File: {os.path.basename(consult['audio_response_path'])})</p>"
-            if consult.get('image_path'):
-                html_content += f"<p>Consultation Image: Available (File: {os.path.basename(consult['image_path'])})</p>"
+    # Note: Embedding local audio/image files directly in gr.HTML for playback/display
+    # requires base64 encoding or a Gradio server route for static files,
+    # which adds complexity. For now, we'll just indicate their presence.
+    if consult.get('audio_path'):
+        html_content += f"<p>Patient's Audio: Available (File: {os.path.basename(consult['audio_path'])})</p>"
+    if consult.get('audio_response_path'):
+        html_content += f"<p>Doctor's Audio: Available (File: {os.path.basename(consult['audio_response_path'])})</p>"
+    if consult.get('image_path'):
+        html_content += f"<p>Consultation Image: Available (File: {os.path.basename(consult['image_path'])})</p>"
+
+    html_content += "</div></details>"
+    return html_content
+
+
+def _compose_history_html(user_state, entries_html):
+    if not entries_html:
+        return "<p>No consultation history found.</p>"
+    return f"<h2>Medical History for {user_state['full_name']}</h2>" + entries_html
+
+
+def _load_history_page(user_state, cursor):
+    """Render the page after cursor; returns (entries_html, next_cursor)"""
+    after_timestamp, after_id = cursor if cursor else (None, None)
+    page = get_user_history(user_state["user_id"], after_timestamp=after_timestamp,
+                            after_id=after_id, limit=HISTORY_PAGE_SIZE + 1)
+    # One extra row tells us whether a further page exists
+    has_more = len(page) > HISTORY_PAGE_SIZE
+    page = page[:HISTORY_PAGE_SIZE]
+    next_cursor = (page[-1]["timestamp"], page[-1]["id"]) if has_more else None
+    return "".join(render_consultation_html(consult) for consult in page), next_cursor
+
+
+# Function to render history UI content as a single HTML string
+def render_history_ui_content(user_state):
+    """Render the first page of history.
+
+    Returns updates for the history container, the HTML, the rendered
+    entries and pagination cursor states, and the "Show more" button.
+    """
+    import gradio as gr
+
+    if not user_state:
+        # If no user, hide the container and return empty HTML
+        return gr.update(visible=False), "", None, None, gr.update(visible=False)
 
-            html_content += "</div></details>"
+    entries_html, cursor = _load_history_page(user_state, None)
+    return (gr.update(visible=True), _compose_history_html(user_state, entries_html),
+            entries_html, cursor, gr.update(visible=cursor is not None))
 
-    return gr.update(visible=True), html_content
+
+def load_more_history(user_state, entries_html, cursor):
+    """Append the next page of older consultations to the rendered history"""
+    import gradio as gr
+
+    if not user_state or cursor is None:
+        return gr.update(), entries_html, cursor, gr.update(visible=False)
+
+    more_html, next_cursor = _load_history_page(user_state, cursor)
+    entries_html = (entries_html or "") + more_html
+    return (_compose_history_html(user_state, entries_html), entries_html, next_cursor,
+            gr.update(visible=next_cursor is not None))
+
+
+def _highlight_snippet(snippet):
+    """Escape a stored-text snippet, then turn its match markers into <mark> tags"""
+    start, end = SNIPPET_MARKERS
+    return html.escape(snippet or "").replace(start, "<mark>").replace(end, "</mark>")
+
+
+def search_history(user_state, text, results_html=None, offset=0):
+    """Render ranked search results; offset > 0 appends the next page.
+
+    Returns the HTML, the rendered results, the next offset and an update
+    for the "More results" button.
+    """
+    import gradio as gr
+
+    if not user_state or not text.strip():
+        return "", None, 0, gr.update(visible=False)
+
+    page = search_consultations(user_state["user_id"], text, limit=HISTORY_PAGE_SIZE + 1, offset=offset,
+                                highlight=SNIPPET_MARKERS)
+    has_more = len(page) > HISTORY_PAGE_SIZE
+    for consult in page:
+        for field in ("patient_speech", "doctor_response"):
+            consult[field] = _highlight_snippet(consult[field])
+    results_html = (results_html if offset else "") + "".join(
+        render_consultation_html(consult) for consult in page[:HISTORY_PAGE_SIZE])
+    query = html.escape(text)
+    body = results_html or f"<p>No consultations match \"{query}\".</p>"
+    return (f"<h2>Search results for \"{query}\"</h2>" + body, results_html,
+            offset + HISTORY_PAGE_SIZE, gr.update(visible=has_more))
+
+
+def add_consultation_to_history(user_state, consultation_id, entries_html, cursor):
+    """Prepend only the new consultation instead of re-rendering the whole history"""
+    import gradio as gr
+
+    if not user_state:
+        return gr.update(visible=False), "", None, None, gr.update(visible=False)
+    if entries_html is None:
+        # History has not been loaded in this session yet
+        return render_history_ui_content(user_state)
+
+    consult = get_consultation(consultation_id, user_state["user_id"]) if consultation_id else None
+    if consult:
+        entries_html = render_consultation_html(consult) + entries_html
+    return (gr.update(visible=True), _compose_history_html(user_state, entries_html),
+            entries_html, cursor, gr.update(visible=cursor is not None))
 
 
 # Custom CSS for clean UI
@@ -210,147 +292,277 @@ custom_css = """
 }
 """
 
-# Main application
-with gr.Blocks(title="🩺 AI Doctor with Medical History", theme=gr.themes.Soft(), css=custom_css) as app:
-    user_state = gr.State(None)
-    login_status = gr.Markdown("", visible=False)
-
-    # Header with profile button
-    with gr.Row():
-        gr.Markdown("# 🩺 AI Doctor")
-        profile_button = gr.Button("Login", elem_classes="profile-button")
-
-    # Authentication section
-    with gr.Column(visible=False) as auth_section:
-        with gr.Tab("Login"):
-            login_username = gr.Textbox(label="Username")
-            login_password = gr.Textbox(label="Password", type="password")
-            login_btn = gr.Button("Login")
-
-        with gr.Tab("Create Account"):
-            create_username = gr.Textbox(label="Choose Username")
-            create_password = gr.Textbox(label="Choose Password", type="password")
-            create_fullname = gr.Textbox(label="Full Name")
-            create_btn = gr.Button("Create Account")
-
-    # Main Content Section
-    with gr.Column(visible=False) as main_content:
+def create_app():
+    """Build the Gradio UI; nothing is launched until the caller does so"""
+    import gradio as gr
+
+    # Main application
+    with gr.Blocks(title="🩺 AI Doctor with Medical History", theme=gr.themes.Soft(), css=custom_css) as app:
+        user_state = gr.State(None)
+        login_status = gr.Markdown("", visible=False)
+        session_token = gr.Textbox(visible=False)
+
+        # Header with profile button
         with gr.Row():
-            with gr.Column():
-                gr.Markdown("## Patient Information")
-                audio_input = gr.Audio(sources=["microphone"], type="filepath", label="Describe your condition")
-                image_input = gr.Image(type="filepath", label="Upload Medical Image")
-                language_select = gr.Radio(["English", "Hindi"], label="Language", value="English")
-                submit_btn = gr.Button("Analyze Condition")
-
-            with gr.Column():
-                gr.Markdown("## Doctor's Analysis")
-                patient_speech = gr.Textbox(label="Patient's Speech", interactive=False)
-                doctor_response = gr.Textbox(label="Doctor's Analysis", interactive=False)
-                doctor_voice = gr.Audio(label="Doctor's Voice Response", interactive=False)
-
-        # History section - this will be the container that gets its visibility updated
-        # and its content will be rendered into history_display_html
-        with gr.Column(visible=False) as history_section_container:
-            history_display_html = gr.HTML("")  # This HTML component will show the history
-
-        # Profile options section (only visible after login)
-        with gr.Column(visible=False) as profile_options:
-            with gr.Group(elem_classes="profile-options"):
-                gr.Markdown("### Profile Options")
+            gr.Markdown("# 🩺 AI Doctor")
+            profile_button = gr.Button("Login", elem_classes="profile-button")
+
+        # Authentication section
+        with gr.Column(visible=False) as auth_section:
+            with gr.Tab("Login"):
+                login_username = gr.Textbox(label="Username")
+                login_password = gr.Textbox(label="Password", type="password")
+                login_btn = gr.Button("Login")
+
+            with gr.Tab("Create Account"):
+                create_username = gr.Textbox(label="Choose Username")
+                create_password = gr.Textbox(label="Choose Password", type="password")
+                create_fullname = gr.Textbox(label="Full Name")
+                create_btn = gr.Button("Create Account")
+
+        # Main Content Section
+        with gr.Column(visible=False) as main_content:
+            with gr.Row():
+                with gr.Column():
+                    gr.Markdown("## Patient Information")
+                    audio_input = gr.Audio(sources=["microphone"], type="filepath", label="Describe your condition")
+                    image_input = gr.Image(type="filepath", label="Upload Medical Image")
+                    language_select = gr.Radio(["English", "Hindi"], label="Language", value="English")
+                    submit_btn = gr.Button("Analyze Condition")
+
+                with gr.Column():
+                    gr.Markdown("## Doctor's Analysis")
+                    patient_speech = gr.Textbox(label="Patient's Speech", interactive=False)
+                    doctor_response = gr.Textbox(label="Doctor's Analysis", interactive=False)
+                    doctor_voice = gr.Audio(label="Doctor's Voice Response", interactive=False,
+                                            streaming=STREAMING_TTS, autoplay=STREAMING_TTS)
+
+            # History section - this will be the container that gets its visibility updated
+            # and its content will be rendered into history_display_html
+            with gr.Column(visible=False) as history_section_container:
                 with gr.Row():
-                    view_history_btn = gr.Button("View History")
-                    logout_btn = gr.Button("Logout")
+                    search_box = gr.Textbox(placeholder="Search your consultations", show_label=False, scale=4)
+                    search_btn = gr.Button("Search", scale=1)
+                search_results_html = gr.HTML("")
+                search_more_btn = gr.Button("More results", visible=False)
+                history_display_html = gr.HTML("")  # This HTML component will show the history
+                show_more_btn = gr.Button("Show more", visible=False)
+            search_results = gr.State(None)
+            search_offset = gr.State(0)
+            # Rendered history entries and the keyset cursor for the next page
+            history_entries = gr.State(None)
+            history_cursor = gr.State(None)
+            last_consultation_id = gr.State(None)
+
+            # Profile options section (only visible after login)
+            with gr.Column(visible=False) as profile_options:
+                with gr.Group(elem_classes="profile-options"):
+                    gr.Markdown("### Profile Options")
+                    with gr.Row():
+                        view_history_btn = gr.Button("View History")
+                        export_btn = gr.Button("Download Records")
+                        logout_btn = gr.Button("Logout")
+                    export_file = gr.File(label="Your consultation records", visible=False)
+
+
+        # Profile button events
+        def toggle_auth_section():
+            return gr.Column(visible=True), gr.Column(visible=False)
+
+
+        profile_button.click(
+            toggle_auth_section,
+            outputs=[auth_section, main_content]
+        )
 
 
-    # Profile button events
-    def toggle_auth_section():
-        return gr.Column(visible=True), gr.Column(visible=False)
+        # Authentication events
+        def update_ui_after_login(user_state_val):
+            if user_state_val:
+                return [
+                    gr.Column(visible=False),  # auth_section
+                    gr.Column(visible=True),  # main_content
+                    gr.Button("Profile", elem_classes="profile-button"),
+                    f"Welcome, {user_state_val['full_name']}!",
+                    gr.Column(visible=True)  # Show profile_options
+                ]
+            return [
+                gr.Column(visible=True),
+                gr.Column(visible=False),
+                gr.Button("Login", elem_classes="profile-button"),
+                "Login failed",
+                gr.Column(visible=False)
+            ]
 
 
-    profile_button.click(
-        toggle_auth_section,
-        outputs=[auth_section, main_content]
-    )
+        def remember_session(user_state_val):
+            return user_state_val["session"] if user_state_val else ""
+
+        for login_event in (
+            login_btn.click(login_user, inputs=[login_username, login_password],
+                            outputs=[user_state, login_status]),
+            create_btn.click(create_account, inputs=[create_username, create_password, create_fullname],
+                             outputs=[user_state, login_status]),
+        ):
+            login_event.then(
+                update_ui_after_login,
+                inputs=[user_state],
+                outputs=[auth_section, main_content, profile_button, login_status, profile_options]
+            ).then(
+                remember_session, inputs=[user_state], outputs=[session_token]
+            ).then(
+                None, inputs=[session_token],
+                js=f"(token) => {{ if (token) localStorage.setItem('{SESSION_STORAGE_KEY}', token); }}"
+            )
+
+        # Resume a stored login; the page may be served by any app process
+        def restore_ui(user_state_val):
+            if user_state_val:
+                return update_ui_after_login(user_state_val)
+            return [gr.update()] * 5
+
+        app.load(
+            restore_session, inputs=[session_token], outputs=[user_state],
+            js=f"() => localStorage.getItem('{SESSION_STORAGE_KEY}') || ''"
+        ).then(
+            restore_ui,
+            inputs=[user_state],
+            outputs=[auth_section, main_content, profile_button, login_status, profile_options]
+        )
+
+        # View history button
+        view_history_btn.click(
+            render_history_ui_content,
+            inputs=[user_state],
+            outputs=[history_section_container, history_display_html, history_entries, history_cursor,
+                     show_more_btn]
+        )
+
+        show_more_btn.click(
+            load_more_history,
+            inputs=[user_state, history_entries, history_cursor],
+            outputs=[history_display_html, history_entries, history_cursor, show_more_btn]
+        )
+
+        for trigger in (search_btn.click, search_box.submit):
+            trigger(
+                search_history,
+                inputs=[user_state, search_box],
+                outputs=[search_results_html, search_results, search_offset, search_more_btn]
+            )
+        search_more_btn.click(
+            search_history,
+            inputs=[user_state, search_box, search_results, search_offset],
+            outputs=[search_results_html, search_results, search_offset, search_more_btn]
+        )
 
+        export_btn.click(export_user_records, inputs=[user_state], outputs=[export_file])
 
-    # Authentication events
-    def update_ui_after_login(user_state_val):
-        if user_state_val:
+
+        # Logout button
+        def logout_user(user_state_val):
+            if user_state_val:
+                delete_session(user_state_val.get("session"))
             return [
-                gr.Column(visible=False),  # auth_section
-                gr.Column(visible=True),  # main_content
-                gr.Button("Profile", elem_classes="profile-button"),
-                f"Welcome, {user_state_val['full_name']}!",
-                gr.Column(visible=True)  # Show profile_options
+                None,
+                gr.Column(visible=False),  # main_content
+                gr.Column(visible=True),  # auth_section
+                gr.Button("Login", elem_classes="profile-button"),
+                "Logged out successfully",
+                gr.Column(visible=False),  # profile_options
+                gr.update(visible=False),  # Hide history_section_container
+                "",  # Clear HTML content of history_display_html
+                None,  # history_entries
+                None,  # history_cursor
+                gr.update(visible=False),  # show_more_btn
+                "",  # search_results_html
+                None,  # search_results
+                gr.update(visible=False)  # search_more_btn
             ]
-        return [
-            gr.Column(visible=True),
-            gr.Column(visible=False),
-            gr.Button("Login", elem_classes="profile-button"),
-            "Login failed",
-            gr.Column(visible=False)
-        ]
-
-
-    login_btn.click(
-        login_user,
-        inputs=[login_username, login_password],
-        outputs=[user_state, login_status]
-    ).then(
-        update_ui_after_login,
-        inputs=[user_state],
-        outputs=[auth_section, main_content, profile_button, login_status, profile_options]
-    )
 
-    create_btn.click(
-        create_account,
-        inputs=[create_username, create_password, create_fullname],
-        outputs=[user_state, login_status]
-    ).then(
-        update_ui_after_login,
-        inputs=[user_state],
-        outputs=[auth_section, main_content, profile_button, login_status, profile_options]
-    )
 
-    # View history button
-    view_history_btn.click(
-        render_history_ui_content,
-        inputs=[user_state],
-        outputs=[history_section_container, history_display_html]
-    )
+        logout_btn.click(
+            logout_user,
+            inputs=[user_state],
+            outputs=[user_state, main_content, auth_section, profile_button, login_status, profile_options,
+                     history_section_container, history_display_html, history_entries, history_cursor,
+                     show_more_btn, search_results_html, search_results, search_more_btn]
+        ).then(None, js=f"() => localStorage.removeItem('{SESSION_STORAGE_KEY}')")
+
+        # Consultation submission. Gradio runs one call per event at a time by
+        # default; in job mode every request goes through to the JobQueue, which
+        # bounds the work itself and rejects requests once it is full.
+        submit_btn.click(
+            process_inputs,
+            inputs=[audio_input, image_input, language_select, user_state],
+            outputs=[patient_speech, doctor_response, doctor_voice, last_consultation_id],
+            concurrency_limit=None if JOB_MODE else 1
+        ).then(
+            add_consultation_to_history,  # Add only the new consultation to the history view
+            inputs=[user_state, last_consultation_id, history_entries, history_cursor],
+            outputs=[history_section_container, history_display_html, history_entries, history_cursor,
+                     show_more_btn]
+        )
 
+    return app
 
-    # Logout button
-    def logout_user():
-        return [
-            None,
-            gr.Column(visible=False),  # main_content
-            gr.Column(visible=True),  # auth_section
-            gr.Button("Login", elem_classes="profile-button"),
-            "Logged out successfully",
-            gr.Column(visible=False),  # profile_options
-            gr.update(visible=False),  # Hide history_section_container
-            ""  # Clear HTML content of history_display_html
-        ]
-
-
-    logout_btn.click(
-        logout_user,
-        outputs=[user_state, main_content, auth_section, profile_button, login_status, profile_options,
-                 history_section_container, history_display_html]
-    )
 
-    # Consultation submission
-    submit_btn.click(
-        process_inputs,
-        inputs=[audio_input, image_input, language_select, user_state],
-        outputs=[patient_speech, doctor_response, doctor_voice]
-    ).then(
-        render_history_ui_content,  # Re-render history after new consultation
-        inputs=[user_state],
-        outputs=[history_section_container, history_display_html]
+def export_user_records(user_state):
+    """Zip the user's consultations and media for download"""
+    import gradio as gr
+
+    if not user_state:
+        return gr.update(visible=False)
+    path = new_export_path(user_state["user_id"], "zip")
+    with open(path, "wb") as out:
+        write_archive(out, user_state["user_id"], "zip")
+    return gr.update(value=path, visible=True)
+
+
+def register_metrics_collectors():
+    """Expose cache, connection and queue counters on the metrics endpoint"""
+    REGISTRY.register_collector("ai_doctor_translation_cache", "Translation cache counters",
+                                lambda: get_translation_cache().stats())
+    if get_translation_batcher():
+        REGISTRY.register_collector("ai_doctor_translation_batches", "Translation batches and requests saved",
+                                    lambda: get_translation_batcher().stats())
+    REGISTRY.register_collector("ai_doctor_tts_cache", "TTS audio store counters",
+                                lambda: get_audio_store().stats())
+    REGISTRY.register_collector("ai_doctor_tts_backends", "TTS backend successes, failures and fallbacks",
+                                lambda: get_tts_router().stats())
+    if get_vision_cache():
+        REGISTRY.register_collector("ai_doctor_vision_cache", "Vision result cache counters",
+                                    lambda: get_vision_cache().stats())
+    REGISTRY.register_collector("ai_doctor_media_store", "Media store writes, GC and disk usage",
+                                lambda: get_media_store().stats())
+    REGISTRY.register_collector("ai_doctor_groq_connections", "Groq client and connection reuse",
+                                lambda: get_client_manager().stats())
+    if JOB_MODE:
+        REGISTRY.register_collector("ai_doctor_job_queue", "Consultation job queue",
+                                    lambda: get_consultation_queue().stats())
+
+
+def main():
+    """Initialize the database, start metrics if configured and launch the app"""
+    init_database()
+    # Start pyttsx3 workers (or check the espeak-ng binary) before the first consultation needs them
+    get_tts_router().warm()
+    # Periodic media cleanup, if MEDIA_GC_INTERVAL_SECONDS is set (or run `python media_store.py gc`)
+    start_garbage_collector()
+    # Serve stage metrics on METRICS_PORT alongside the app, if configured
+    if start_metrics_server():
+        register_metrics_collectors()
+
+    # serve.py runs several of these behind its load balancer, each on its own port
+    create_app().launch(
+        debug=True,
+        server_name=os.environ.get("GRADIO_SERVER_NAME"),
+        server_port=int(os.environ.get("GRADIO_SERVER_PORT", 7710)),
+        share=os.environ.get("GRADIO_SHARE", "true").lower() in TRUE_VALUES,
+        # Record downloads are served from here, which may be outside the app's directory
+        allowed_paths=[export_dir()],
     )
 
-# Launch with share=True
-app.launch(debug=True, server_port=7710, share=True)
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# groq_client.py
+import os
+import logging
+import threading
+import weakref
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class _ConnectionTracker:
+    """Counts how many responses arrived on a new vs an already-open connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = weakref.WeakSet()
+        self._seen_ids = set()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def record(self, response):
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self.requests += 1
+            if stream is None:
+                return
+            try:
+                reused = stream in self._seen
+                self._seen.add(stream)
+            except TypeError:
+                reused = id(stream) in self._seen_ids
+                self._seen_ids.add(id(stream))
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+
+class GroqClientManager:
+    """Process-wide cache of Groq clients sharing keep-alive connection pools.
+
+    One sync and one async client is built per API key and reused by every
+    caller, so consecutive stages of a consultation reuse open connections
+    instead of paying for a new TLS handshake each time.
+    """
+
+    def __init__(self, max_connections=None, max_keepalive_connections=None,
+                 timeout=None, connect_timeout=None, keepalive_expiry=None,
+                 base_url=None, max_retries=None):
+        self.max_connections = max_connections or _env_int("GROQ_MAX_CONNECTIONS", 20)
+        self.max_keepalive_connections = max_keepalive_connections or _env_int(
+            "GROQ_MAX_KEEPALIVE_CONNECTIONS", self.max_connections)
+        self.timeout = timeout or _env_float("GROQ_TIMEOUT", 60.0)
+        self.connect_timeout = connect_timeout or _env_float("GROQ_CONNECT_TIMEOUT", 10.0)
+        self.keepalive_expiry = keepalive_expiry or _env_float("GROQ_KEEPALIVE_EXPIRY", 30.0)
+        self.base_url = base_url or os.environ.get("GROQ_BASE_URL") or None
+        # Retries are handled by retry.call_with_retry, so the SDK's own are off by default
+        self.max_retries = max_retries if max_retries is not None else _env_int("GROQ_SDK_MAX_RETRIES", 0)
+
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._async_clients = {}
+        self._tracker = _ConnectionTracker()
+        self.clients_created = 0
+        self.client_reuses = 0
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _timeout(self):
+        import httpx
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def get_client(self, api_key=None):
+        """Return the shared sync client for api_key (defaults to GROQ_API_KEY)"""
+        api_key = api_key or os.environ.get("GROQ_API_KEY")
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is not None:
+                self.client_reuses += 1
+                return client
+
+            # groq and httpx take a few hundred ms to import; pay for it on first use
+            import httpx
+            from groq import Groq
+
+            http_client = httpx.Client(
+                limits=self._limits(),
+                timeout=self._timeout(),
+                event_hooks={"response": [self._tracker.record]},
+            )
+            client = Groq(
+                api_key=api_key,
+                base_url=self.base_url,
+                timeout=self._timeout(),
+                max_retries=self.max_retries,
+                http_client=http_client,
+            )
+            self._clients[api_key] = client
+            self.clients_created += 1
+            return client
+
+    def get_async_client(self, api_key=None):
+        """Return the shared async client for api_key (defaults to GROQ_API_KEY)"""
+        api_key = api_key or os.environ.get("GROQ_API_KEY")
+        with self._lock:
+            client = self._async_clients.get(api_key)
+            if client is not None:
+                self.client_reuses += 1
+                return client
+
+            import httpx
+            from groq import AsyncGroq
+
+            tracker = self._tracker
+
+            async def record(response):
+                tracker.record(response)
+
+            http_client = httpx.AsyncClient(
+                limits=self._limits(),
+                timeout=self._timeout(),
+                event_hooks={"response": [record]},
+            )
+            client = AsyncGroq(
+                api_key=api_key,
+                base_url=self.base_url,
+                timeout=self._timeout(),
+                max_retries=self.max_retries,
+                http_client=http_client,
+            )
+            self._async_clients[api_key] = client
+            self.clients_created += 1
+            return client
+
+    def stats(self):
+        """Client and connection reuse counters"""
+        return {
+            "clients_created": self.clients_created,
+            "client_reuses": self.client_reuses,
+            "requests": self._tracker.requests,
+            "new_connections": self._tracker.new_connections,
+            "reused_connections": self._tracker.reused_connections,
+        }
+
+    def close(self):
+        """Close every sync client; async clients must be closed with aclose()"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logging.warning(f"Error closing Groq client: {e}")
+
+    async def aclose(self):
+        """Close every async client"""
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logging.warning(f"Error closing async Groq client: {e}")
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_client_manager():
+    """Return the process-wide GroqClientManager, creating it on first use"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = GroqClientManager()
+    return _manager
+
+
+def configure_client_manager(**kwargs):
+    """Replace the process-wide manager, e.g. to point it at a stub server"""
+    global _manager
+    with _manager_lock:
+        old, _manager = _manager, GroqClientManager(**kwargs)
+    if old is not None:
+        old.close()
+    return _manager
+
+
+def get_groq_client(api_key=None):
+    """Shared sync Groq client"""
+    return get_client_manager().get_client(api_key)
+
+
+def get_async_groq_client(api_key=None):
+    """Shared async Groq client"""
+    return get_client_manager().get_async_client(api_key)
@@ -0,0 +1,167 @@
+# image_preprocessing.py
+import io
+import os
+import time
+import base64
+import logging
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow missing: uploads are sent as-is
+    Image = None
+
+MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", 1024))
+JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 85))
+
+# 3-byte aligned so each chunk encodes to base64 without padding
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+]
+
+MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+}
+
+
+class PreparedImage:
+    """Base64 payload of an image ready for the vision model, plus stats"""
+
+    def __init__(self, data, mime_type, source_format, original_bytes, payload_bytes,
+                 size, encode_seconds):
+        self.data = data
+        self.mime_type = mime_type
+        self.source_format = source_format
+        self.original_bytes = original_bytes
+        self.payload_bytes = payload_bytes
+        self.size = size
+        self.encode_seconds = encode_seconds
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.payload_bytes
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.data}"
+
+    def stats(self):
+        return {
+            "source_format": self.source_format,
+            "mime_type": self.mime_type,
+            "original_bytes": self.original_bytes,
+            "payload_bytes": self.payload_bytes,
+            "bytes_saved": self.bytes_saved,
+            "size": self.size,
+            "encode_seconds": round(self.encode_seconds, 4),
+        }
+
+
+def detect_image_format(header):
+    """Detect the real image format from the file's leading bytes"""
+    for signature, fmt in _SIGNATURES:
+        if header.startswith(signature):
+            return fmt
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def stream_base64(fileobj, chunk_size=BASE64_CHUNK_SIZE):
+    """Yield base64 text for fileobj one chunk at a time"""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk).decode("ascii")
+
+
+def _reencode(image_path, max_edge, quality):
+    """Resize, drop metadata and re-encode as JPEG; returns (buffer, size)"""
+    with Image.open(image_path) as img:
+        # Apply the EXIF orientation before the metadata is dropped
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        # No exif/icc arguments, so the output carries no metadata
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        buffer.seek(0)
+        return buffer, img.size
+
+
+def prepare_image(image_path, max_edge=None, quality=None):
+    """Downscale, strip metadata and base64-encode an image for upload"""
+    max_edge = max_edge or MAX_EDGE
+    quality = quality or JPEG_QUALITY
+    start = time.perf_counter()
+
+    original_bytes = os.path.getsize(image_path)
+    with open(image_path, "rb") as f:
+        source_format = detect_image_format(f.read(16))
+
+    buffer, size, mime_type = None, None, MIME_TYPES.get(source_format, "image/jpeg")
+    if Image is not None:
+        try:
+            buffer, size = _reencode(image_path, max_edge, quality)
+            mime_type = "image/jpeg"
+        except Exception as e:
+            logging.warning(f"Image preprocessing failed, sending original: {e}")
+
+    if buffer is not None:
+        payload_bytes = buffer.getbuffer().nbytes
+        data = "".join(stream_base64(buffer))
+    else:
+        payload_bytes = original_bytes
+        with open(image_path, "rb") as f:
+            data = "".join(stream_base64(f))
+
+    prepared = PreparedImage(
+        data=data,
+        mime_type=mime_type,
+        source_format=source_format,
+        original_bytes=original_bytes,
+        payload_bytes=payload_bytes,
+        size=size,
+        encode_seconds=time.perf_counter() - start,
+    )
+    logging.info(f"Prepared image {os.path.basename(image_path)}: {prepared.stats()}")
+    return prepared
+
+
+def perceptual_hash(data, hash_size=8):
+    """64-bit difference hash (dHash) of base64 image data, or None without Pillow.
+
+    Re-captures of the same scene differ in a few bits, so callers compare
+    hashes by Hamming distance rather than equality.
+    """
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(base64.b64decode(data))) as img:
+        # Let the JPEG decoder downscale while decoding; we only need a thumbnail
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
@@ -0,0 +1,180 @@
+# jobs.py
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from consultation import run_consultation
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+REJECTED = "rejected"
+
+
+class Job:
+    """One unit of queued work and its outcome"""
+
+    def __init__(self, kwargs):
+        self.id = uuid.uuid4().hex
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, REJECTED)
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns True if it did"""
+        return self._done.wait(timeout)
+
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self._done.set()
+
+
+class JobQueue:
+    """Bounded work queue served by a fixed pool of worker threads.
+
+    submit() never blocks: when the queue already holds max_queued jobs the
+    new job is rejected immediately (admission control) instead of piling
+    up behind a degraded upstream.
+    """
+
+    def __init__(self, handler, workers=4, max_queued=32, keep_finished=1000):
+        self.handler = handler
+        self.max_queued = max_queued
+        self._lock = threading.Condition()
+        self._queue = deque()
+        self._jobs = {}
+        self._finished = deque(maxlen=keep_finished)
+        self._stopping = False
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, **kwargs):
+        """Queue handler(**kwargs); returns the Job, already rejected if the queue is full"""
+        job = Job(kwargs)
+        with self._lock:
+            self.submitted += 1
+            if self._stopping or len(self._queue) >= self.max_queued:
+                self.rejected += 1
+                job._finish(REJECTED, error="Server is busy, please try again shortly")
+                return job
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._lock.notify()
+        return job
+
+    def get(self, job_id):
+        """Look up a pending or recently finished job by id"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = next((j for j in self._finished if j.id == job_id), None)
+            return job
+
+    def position(self, job):
+        """1-based position of a queued job, 0 once it has started"""
+        with self._lock:
+            try:
+                return self._queue.index(job) + 1
+            except ValueError:
+                return 0
+
+    def status(self, job):
+        """Snapshot of a job's state suitable for polling clients"""
+        return {
+            "id": job.id,
+            "status": job.status,
+            "position": self.position(job) if job.status == QUEUED else 0,
+            "error": job.error,
+        }
+
+    def iter_status(self, job, poll_interval=0.5):
+        """Yield status snapshots until the job finishes, ending with the final one"""
+        while not job.wait(poll_interval):
+            yield self.status(job)
+        yield self.status(job)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._stopping:
+                    self._lock.wait()
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                result = self.handler(**job.kwargs)
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {e}")
+                job._finish(FAILED, error=str(e))
+            else:
+                job._finish(DONE, result=result)
+
+            with self._lock:
+                if job.status == DONE:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._jobs.pop(job.id, None)
+                self._finished.append(job)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs; workers exit once the queue drains"""
+        with self._lock:
+            self._stopping = True
+            self._lock.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+
+_consultation_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_consultation_queue():
+    """Process-wide consultation queue sized from JOB_WORKERS / JOB_MAX_QUEUED"""
+    global _consultation_queue
+    if _consultation_queue is None:
+        with _queue_lock:
+            if _consultation_queue is None:
+                _consultation_queue = JobQueue(
+                    run_consultation,
+                    workers=int(os.environ.get("JOB_WORKERS", 4)),
+                    max_queued=int(os.environ.get("JOB_MAX_QUEUED", 32)),
+                )
+    return _consultation_queue
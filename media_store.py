@@ -0,0 +1,300 @@
+# media_store.py
+"""Sharded, content-addressed storage for consultation media.
+
+    python media_store.py gc                      # remove files no consultation refers to
+    python media_store.py gc --retention-days 365 # ...after dropping media older than a year
+    python media_store.py import-legacy           # move old response_*.mp3 files into the store
+    python media_store.py stats
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+
+# Two levels of two hex characters: 65536 leaf directories, so even
+# millions of files leave each directory with only a few dozen entries
+SHARD_WIDTH = 2
+SHARD_DEPTH = 2
+COPY_CHUNK_SIZE = 1024 * 1024
+# usage() walks the tree, so stats() reuses its result for this long
+USAGE_CACHE_SECONDS = 60
+
+
+class MediaStore:
+    """Sharded on-disk store for consultation audio, images and responses.
+
+    Uploads are content-addressed (sha256), so a resubmitted photo or
+    recording is stored once. Generated responses get a random name that
+    is allocated before synthesis starts. Either way files live under
+    <root>/ab/cd/<name>, and every write lands through an atomic rename so
+    readers never see a partial file.
+    """
+
+    def __init__(self, root="media"):
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._usage = None
+        self._usage_at = 0.0
+        self.files_written = 0
+        self.bytes_written = 0
+        self.dedup_hits = 0
+        self.collected_files = 0
+        self.collected_bytes = 0
+
+    def _shard_path(self, name):
+        parts = [name[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+        directory = os.path.join(self.root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def contains(self, path):
+        """Whether path is a file managed by this store"""
+        return bool(path) and os.path.abspath(path).startswith(self.root + os.sep)
+
+    def allocate(self, suffix=""):
+        """Collision-free path for a file the caller writes later (e.g. a TTS response)"""
+        return self._shard_path(uuid.uuid4().hex + suffix)
+
+    def temp_path(self, suffix=""):
+        """Scratch path on the same file system, for write-then-rename"""
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex + suffix)
+
+    def put_file(self, src_path, suffix=None):
+        """Copy a file into the store under its content hash and return the stored path"""
+        if self.contains(src_path):
+            return src_path
+        if suffix is None:
+            suffix = os.path.splitext(src_path)[1].lower()
+
+        digest = hashlib.sha256()
+        tmp = self.temp_path(suffix)
+        size = 0
+        try:
+            with open(src_path, "rb") as src, open(tmp, "wb") as dst:
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+            final = self._shard_path(digest.hexdigest() + suffix)
+            if os.path.exists(final):
+                # Refresh mtime so GC's grace period covers the new reference too
+                os.utime(final)
+                with self._lock:
+                    self.dedup_hits += 1
+                return final
+            # Concurrent writers of the same content replace it with identical bytes
+            os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        with self._lock:
+            self.files_written += 1
+            self.bytes_written += size
+        return final
+
+    def iter_files(self):
+        """Yield (path, stat) for every stored file"""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root and ".tmp" in dirnames:
+                dirnames.remove(".tmp")
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed while we walked
+
+    def usage(self):
+        """Files and bytes currently stored"""
+        files = total = 0
+        for _, st in self.iter_files():
+            files += 1
+            total += st.st_size
+        with self._lock:
+            self._usage = {"files": files, "bytes": total}
+            self._usage_at = time.monotonic()
+        return dict(self._usage)
+
+    def collect_garbage(self, referenced, grace_seconds=3600.0):
+        """Delete files not in `referenced` (absolute paths) once older than grace_seconds.
+
+        The grace period protects files whose consultation row has not been
+        written yet. Abandoned temp files are removed on the same schedule.
+        """
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        candidates = list(self.iter_files())
+        for entry in os.scandir(self.tmp_dir):
+            candidates.append((entry.path, entry.stat()))
+        for path, st in candidates:
+            if st.st_mtime > cutoff or path in referenced:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += st.st_size
+
+        with self._lock:
+            self.collected_files += removed
+            self.collected_bytes += freed
+            self._usage = None
+        if removed:
+            logging.info(f"Media GC removed {removed} files ({freed} bytes)")
+        return {"files": removed, "bytes": freed}
+
+    def stats(self):
+        """Write, dedupe and GC counters plus (cached) disk usage"""
+        if self._usage is None or time.monotonic() - self._usage_at > USAGE_CACHE_SECONDS:
+            self.usage()
+        with self._lock:
+            return {
+                "files_written": self.files_written,
+                "bytes_written": self.bytes_written,
+                "dedup_hits": self.dedup_hits,
+                "collected_files": self.collected_files,
+                "collected_bytes": self.collected_bytes,
+                "stored_files": self._usage["files"],
+                "stored_bytes": self._usage["bytes"],
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_media_store():
+    """Process-wide store rooted at MEDIA_ROOT (default ./media)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MediaStore(root=os.environ.get("MEDIA_ROOT", "media"))
+    return _store
+
+
+def store_upload(path):
+    """Keep a durable copy of an uploaded file; returns the path to record"""
+    if not path or not os.path.exists(path):
+        return path
+    try:
+        return get_media_store().put_file(path)
+    except OSError as e:
+        logging.warning(f"Could not store {path} in the media store: {e}")
+        return path
+
+
+def collect_garbage(store=None, grace_seconds=None, retention_days=None):
+    """Remove stored media that no consultation row refers to.
+
+    With retention_days (MEDIA_RETENTION_DAYS; 0 keeps media forever),
+    consultations older than that lose their media references first, so
+    their files are collected in the same pass.
+    """
+    from database import iter_media_paths, expire_media_paths
+
+    store = store or get_media_store()
+    if grace_seconds is None:
+        grace_seconds = float(os.environ.get("MEDIA_GC_GRACE_SECONDS", 3600))
+    if retention_days is None:
+        retention_days = float(os.environ.get("MEDIA_RETENTION_DAYS") or 0)
+    expired = expire_media_paths(retention_days) if retention_days > 0 else 0
+    referenced = set()
+    for _, *paths in iter_media_paths():
+        referenced.update(os.path.abspath(p) for p in paths if store.contains(p))
+    summary = store.collect_garbage(referenced, grace_seconds)
+    summary["expired_consultations"] = expired
+    return summary
+
+
+def import_legacy_media(store=None, remove_originals=False):
+    """Move media recorded outside the store (e.g. response_<user>_<time>.mp3) into it.
+
+    Rows are repointed at the stored copies; returns how many rows changed.
+    """
+    from database import iter_media_paths, update_media_paths
+
+    store = store or get_media_store()
+    moved = []
+    for consultation_id, *paths in list(iter_media_paths()):
+        new_paths = [
+            store.put_file(p) if p and not store.contains(p) and os.path.isfile(p) else p
+            for p in paths
+        ]
+        if new_paths != paths:
+            update_media_paths(consultation_id, *new_paths)
+            moved.extend(old for old, new in zip(paths, new_paths) if old != new)
+    if remove_originals:
+        for path in set(moved):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.warning(f"Could not remove {path}: {e}")
+    return len(moved)
+
+
+def start_garbage_collector(interval=None):
+    """Run collect_garbage() every MEDIA_GC_INTERVAL_SECONDS in a daemon thread.
+
+    Off unless the interval is set; returns the thread, or None.
+    """
+    if interval is None:
+        interval = float(os.environ.get("MEDIA_GC_INTERVAL_SECONDS") or 0)
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                collect_garbage()
+            except Exception as e:
+                logging.warning(f"Media GC failed: {e}")
+
+    thread = threading.Thread(target=run, name="media-gc", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Media store maintenance")
+    parser.add_argument("command", choices=["gc", "import-legacy", "stats"])
+    parser.add_argument("--grace", type=float,
+                        help="gc: keep unreferenced files younger than this many seconds "
+                             "(default MEDIA_GC_GRACE_SECONDS or 3600)")
+    parser.add_argument("--retention-days", type=float,
+                        help="gc: first drop media from consultations older than this "
+                             "(default MEDIA_RETENTION_DAYS, or keep forever)")
+    parser.add_argument("--remove-originals", action="store_true",
+                        help="import-legacy: delete the old files once their rows point into the store")
+    parser.add_argument("--db", help="Database path (default: medical_history.db)")
+    args = parser.parse_args()
+
+    from config import load_config
+    load_config()
+    from database import init_database
+    init_database(args.db)
+
+    if args.command == "gc":
+        summary = collect_garbage(grace_seconds=args.grace, retention_days=args.retention_days)
+    elif args.command == "import-legacy":
+        summary = {"moved": import_legacy_media(remove_originals=args.remove_originals)}
+    else:
+        summary = get_media_store().stats()
+    json.dump(summary, sys.stdout)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# metrics.py
+import os
+import time
+import bisect
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from config import env_flag
+
+# Everything below is a no-op unless metrics are enabled, so the hot path
+# pays for one global lookup when they are off.
+ENABLED = env_flag("METRICS_ENABLED") or bool(os.environ.get("METRICS_PORT"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # key -> [bucket_counts, sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+        for key, bucket_counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus collectors that report gauges at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name, help_text, collect):
+        """collect() returns a flat {field: value} stats dict, reported as one gauge per field"""
+        self._collectors.append((name, help_text, collect))
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for name, help_text, collect in self._collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                logging.warning(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for field, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'{name}{{field="{field}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.histogram("ai_doctor_stage_seconds", "Consultation stage latency")
+stage_wait_seconds = REGISTRY.histogram("ai_doctor_stage_wait_seconds",
+                                        "Time a stage waited for its concurrency limit")
+stage_errors = REGISTRY.counter("ai_doctor_stage_errors_total", "Stage failures and fallbacks")
+retries = REGISTRY.counter("ai_doctor_retries_total", "Retried remote calls")
+payload_bytes = REGISTRY.counter("ai_doctor_payload_bytes_total", "Bytes uploaded to or produced by a stage")
+cache_events = REGISTRY.counter("ai_doctor_cache_events_total", "Cache lookups by result")
+consultations = REGISTRY.counter("ai_doctor_consultations_total", "Completed consultations")
+batch_size = REGISTRY.histogram("ai_doctor_batch_size", "Requests coalesced into one remote call",
+                                buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32))
+batch_wait_seconds = REGISTRY.histogram("ai_doctor_batch_wait_seconds",
+                                        "Time a request waited for its batch to be sent")
+
+
+def observe_stage(stage, seconds, wait=0.0, error=False):
+    if not ENABLED:
+        return
+    stage_seconds.observe(seconds, stage=stage)
+    if wait:
+        stage_wait_seconds.observe(wait, stage=stage)
+    if error:
+        stage_errors.inc(stage=stage)
+
+
+def record_error(stage):
+    if ENABLED:
+        stage_errors.inc(stage=stage)
+
+
+def record_retry(operation):
+    if ENABLED:
+        retries.inc(operation=operation)
+
+
+def record_payload(stage, nbytes, direction="upload"):
+    if ENABLED:
+        payload_bytes.inc(nbytes, stage=stage, direction=direction)
+
+
+def record_cache(cache, hit):
+    if ENABLED:
+        cache_events.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_consultation(language):
+    if ENABLED:
+        consultations.inc(language=language)
+
+
+def record_batch(operation, size):
+    if ENABLED:
+        batch_size.observe(size, operation=operation)
+
+
+def record_batch_wait(operation, seconds):
+    if ENABLED:
+        batch_wait_seconds.observe(seconds, operation=operation)
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_stage(self.stage, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(stage):
+    """Context manager recording a stage's latency; free when metrics are off"""
+    return _Timer(stage) if ENABLED else _NULL_TIMER
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """Serve /metrics on a background thread; returns the server or None"""
+    global ENABLED
+    port = port or os.environ.get("METRICS_PORT")
+    if not port:
+        return None
+    ENABLED = True
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,137 @@
+# pipeline.py
+import time
+import logging
+import metrics
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """A named unit of work and the stages whose results it needs.
+
+    resource names the concurrency limit (see Pipeline limits) the stage
+    must hold while it runs, e.g. "stt" or "vision".
+    """
+
+    def __init__(self, name, func, depends_on=(), resource=None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.resource = resource
+
+
+class PipelineError(Exception):
+    """Raised when a stage fails; carries the timings collected so far"""
+
+    def __init__(self, stage_name, error, timings):
+        super().__init__(f"Stage '{stage_name}' failed: {error}")
+        self.stage_name = stage_name
+        self.error = error
+        self.timings = timings
+
+
+class Pipeline:
+    """Runs stages on a thread pool as soon as their dependencies finish.
+
+    Each stage function is called with a single dict holding the initial
+    inputs plus the result of every stage that has completed so far, keyed
+    by stage name. Independent stages therefore overlap instead of running
+    one after another.
+
+    limits maps a resource name to a semaphore shared by every run, which
+    caps how many stages using that resource run at once across requests.
+    """
+
+    def __init__(self, stages, max_workers=None, limits=None):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self._check_acyclic()
+        self.max_workers = max_workers or len(self.stages)
+        self.limits = limits or {}
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self, inputs=None):
+        """Run every stage and return (results, timings).
+
+        timings maps each stage name to start/end offsets and duration in
+        seconds relative to the start of the run and the time spent waiting
+        for its resource limit, plus a "total" entry with the wall-clock
+        time of the whole pipeline.
+        """
+        results = dict(inputs or {})
+        timings = {}
+        pending = dict(self.stages)
+        running = {}
+        run_start = time.perf_counter()
+
+        def timed_call(stage, snapshot):
+            limit = self.limits.get(stage.resource)
+            queued = time.perf_counter()
+            if limit is not None:
+                limit.acquire()
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = stage.func(snapshot)
+                failed = False
+                return result
+            finally:
+                finished = time.perf_counter()
+                if limit is not None:
+                    limit.release()
+                metrics.observe_stage(stage.name, finished - started, wait=started - queued, error=failed)
+                timings[stage.name] = {
+                    "start": round(started - run_start, 4),
+                    "end": round(finished - run_start, 4),
+                    "duration": round(finished - started, 4),
+                    "wait": round(started - queued, 4),
+                }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in results for d in s.depends_on)]
+                for stage in ready:
+                    del pending[stage.name]
+                    future = executor.submit(timed_call, stage, dict(results))
+                    running[future] = stage
+
+                if not running:
+                    # Nothing can make progress; only possible if a dependency was never produced
+                    raise PipelineError(next(iter(pending)), "unsatisfied dependencies", timings)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception as e:
+                        for other in running:
+                            other.cancel()
+                        logging.error(f"Pipeline stage '{stage.name}' failed: {e}")
+                        raise PipelineError(stage.name, e, timings) from e
+
+        elapsed = round(time.perf_counter() - run_start, 4)
+        timings["total"] = {"start": 0.0, "end": elapsed, "duration": elapsed}
+        return results, timings
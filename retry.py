@@ -0,0 +1,230 @@
+# retry.py
+import os
+import time
+import sys
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+# Status codes worth another attempt; any other 4xx (bad request, auth,
+# permission, not found) will fail the same way every time
+RETRYABLE_STATUS = {408, 409, 425, 429}
+FATAL_OS_ERRORS = (FileNotFoundError, IsADirectoryError, PermissionError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+
+class RetryPolicy:
+    """How often and how long to retry one call.
+
+    Delays use full jitter: a uniform draw between 0 and
+    min(max_delay, base_delay * 2 ** attempt). deadline caps the total time
+    spent on the call, including the attempts themselves.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=20.0, deadline=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline if deadline is not None else float(os.environ.get("GROQ_REQUEST_BUDGET", 60))
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures until a cool-down has passed.
+
+    closed: calls go through. After failure_threshold consecutive failures
+    the breaker opens and rejects calls for reset_timeout seconds, then lets
+    a single trial call through (half-open). Its success closes the breaker
+    and its failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """End a trial call that neither proved nor disproved the service's health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logging.warning(f"Circuit breaker '{self.name}' opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Shared breaker per remote service (e.g. "stt", "vision", "translation")"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5)),
+                reset_timeout=float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 30)),
+            )
+        return breaker
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(exc):
+    """Whether another attempt could succeed"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = _status_code(exc)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(exc, FATAL_OS_ERRORS):
+        return False
+    # Only look for groq's error type if groq is loaded; importing it here is slow
+    groq = sys.modules.get("groq")
+    if groq is not None and isinstance(exc, groq.APIConnectionError):
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError, OSError))
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait via Retry-After, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _next_delay(policy, attempt, exc, started):
+    """Delay before the next attempt, or None if we should give up"""
+    if attempt + 1 >= policy.max_attempts or not is_retryable(exc):
+        return None
+    delay = retry_after(exc)
+    if delay is None:
+        delay = policy.backoff(attempt)
+    remaining = policy.deadline - (time.monotonic() - started)
+    if delay >= remaining:
+        return None
+    return delay
+
+
+def call_with_retry(func, policy=None, breaker=None, operation="call", on_retry=None):
+    """Call func() with retries, honouring the breaker and the time budget"""
+    policy = policy or RetryPolicy()
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"{operation}: '{breaker.name}' is unavailable, failing fast")
+        try:
+            result = func()
+        except Exception as e:
+            if breaker is not None:
+                if is_retryable(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+            delay = _next_delay(policy, attempt, e, started)
+            if delay is None:
+                raise
+            logging.warning(f"{operation} attempt {attempt + 1} failed ({e}). Retrying in {delay:.2f} seconds...")
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(delay)
+            attempt += 1
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+
+async def acall_with_retry(func, policy=None, breaker=None, operation="call", on_retry=None):
+    """Async variant of call_with_retry; func returns an awaitable and sleeps don't block the loop"""
+    policy = policy or RetryPolicy()
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"{operation}: '{breaker.name}' is unavailable, failing fast")
+        try:
+            result = await func()
+        except Exception as e:
+            if breaker is not None:
+                if is_retryable(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+            delay = _next_delay(policy, attempt, e, started)
+            if delay is None:
+                raise
+            logging.warning(f"{operation} attempt {attempt + 1} failed ({e}). Retrying in {delay:.2f} seconds...")
+            if on_retry:
+                on_retry(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
@@ -0,0 +1,279 @@
+# serve.py
+"""Run several app processes behind a local load balancer.
+
+    python serve.py --workers 4 --port 7710 --data-dir /var/lib/ai-doctor
+
+Each worker is gradio_app.py on its own loopback port. All of them share
+the database, sessions, media, caches and Gradio's upload directory under
+--data-dir (any of MEDICAL_HISTORY_DB, MEDIA_ROOT, TTS_CACHE_DIR,
+TRANSLATION_CACHE_DB, VISION_CACHE_DB or GRADIO_TEMP_DIR already set in the
+environment wins). The balancer pins each browser to one worker with a
+cookie, because a Gradio session's queue and state live in that process;
+a login survives a worker restart through the shared session store.
+With METRICS_PORT set, worker i serves its metrics on METRICS_PORT + i.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+AFFINITY_COOKIE = "ai_doctor_worker"
+MAX_HEAD_BYTES = 64 * 1024
+# A worker that refused a connection is skipped for this long
+DOWN_SECONDS = 5.0
+PIPE_CHUNK_SIZE = 64 * 1024
+
+
+def shared_paths(data_dir):
+    """Environment pointing every worker at the same state"""
+    return {
+        "MEDICAL_HISTORY_DB": os.path.join(data_dir, "medical_history.db"),
+        "MEDIA_ROOT": os.path.join(data_dir, "media"),
+        "TTS_CACHE_DIR": os.path.join(data_dir, "tts_cache"),
+        "TRANSLATION_CACHE_DB": os.path.join(data_dir, "translation_cache.db"),
+        "VISION_CACHE_DB": os.path.join(data_dir, "vision_cache.db"),
+        "GRADIO_TEMP_DIR": os.path.join(data_dir, "uploads"),
+    }
+
+
+class Backend:
+    def __init__(self, index, host, port):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.active = 0
+        self.requests = 0
+        self.down_until = 0.0
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+
+def _header(head, name):
+    prefix = name.lower().encode() + b":"
+    for line in head.split(b"\r\n")[1:]:
+        if line.lower().startswith(prefix):
+            return line[len(prefix):].strip().decode("latin-1")
+    return None
+
+
+def _affinity(head):
+    cookies = _header(head, "cookie") or ""
+    for cookie in cookies.split(";"):
+        name, _, value = cookie.strip().partition("=")
+        if name == AFFINITY_COOKIE and value.isdigit():
+            return int(value)
+    return None
+
+
+class LoadBalancer:
+    """Cookie-sticky TCP/HTTP proxy in front of the worker processes.
+
+    Only the head of the first request on a connection is parsed: it picks
+    the worker (the affinity cookie, else the least busy healthy worker)
+    and the first response gets a Set-Cookie pinning the browser to it.
+    Everything after that, including SSE streams and websocket upgrades,
+    is piped through untouched.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.connections = 0
+
+    def _choose(self, preferred):
+        if preferred is not None and 0 <= preferred < len(self.backends) and self.backends[preferred].healthy:
+            return [self.backends[preferred]] + [b for b in self.backends if b.index != preferred]
+        healthy = sorted((b for b in self.backends if b.healthy), key=lambda b: (b.active, b.requests))
+        return healthy + [b for b in self.backends if not b.healthy]
+
+    async def _pipe(self, reader, writer):
+        try:
+            while chunk := await reader.read(PIPE_CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _forward_response_head(self, upstream, client, backend, pin):
+        head = await upstream.readuntil(b"\r\n\r\n")
+        if pin:
+            cookie = f"Set-Cookie: {AFFINITY_COOKIE}={backend.index}; Path=/; HttpOnly; SameSite=Lax\r\n"
+            head = head[:-2] + cookie.encode() + b"\r\n"
+        client.write(head)
+        await client.drain()
+
+    async def handle(self, client_reader, client_writer):
+        self.connections += 1
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        preferred = _affinity(head)
+        for backend in self._choose(preferred):
+            # Count the connection before awaiting the connect, or a burst of
+            # new browsers would all see the same "least busy" worker
+            backend.active += 1
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(backend.host, backend.port)
+            except OSError:
+                backend.active -= 1
+                backend.down_until = time.monotonic() + DOWN_SECONDS
+                logging.warning(f"Worker {backend.index} on port {backend.port} is unreachable")
+                continue
+            break
+        else:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+
+        backend.requests += 1
+        try:
+            upstream_writer.write(head)
+            await upstream_writer.drain()
+            upload = asyncio.ensure_future(self._pipe(client_reader, upstream_writer))
+            try:
+                await self._forward_response_head(upstream_reader, client_writer, backend,
+                                                  pin=preferred != backend.index)
+                await self._pipe(upstream_reader, client_writer)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                client_writer.close()
+            upload.cancel()
+        finally:
+            backend.active -= 1
+            upstream_writer.close()
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "workers": [{"port": b.port, "requests": b.requests, "active": b.active, "healthy": b.healthy}
+                        for b in self.backends],
+        }
+
+
+class Supervisor:
+    """Starts the worker processes and restarts any that exit"""
+
+    def __init__(self, command, ports, env):
+        self.command = command
+        self.ports = ports
+        self.env = env
+        self.processes = {}
+        self.stopping = False
+
+    def _start(self, port):
+        env = dict(self.env, GRADIO_SERVER_PORT=str(port), GRADIO_SERVER_NAME="127.0.0.1", GRADIO_SHARE="false")
+        if env.get("METRICS_PORT"):
+            # One metrics port per worker; a shared one would fail to bind in all but the first
+            env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + self.ports.index(port))
+        self.processes[port] = subprocess.Popen(self.command, env=env, cwd=REPO_ROOT)
+
+    def start(self):
+        for port in self.ports:
+            self._start(port)
+
+    async def monitor(self, interval=1.0):
+        while not self.stopping:
+            for port, process in list(self.processes.items()):
+                if process.poll() is not None and not self.stopping:
+                    logging.warning(f"Worker on port {port} exited with {process.returncode}; restarting")
+                    self._start(port)
+            await asyncio.sleep(interval)
+
+    def stop(self, timeout=10.0):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            try:
+                process.wait(max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def wait_for_ports(host, ports, timeout=120.0):
+    """Wait until every worker accepts connections"""
+    deadline = time.monotonic() + timeout
+    pending = set(ports)
+    while pending and time.monotonic() < deadline:
+        for port in list(pending):
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+                writer.close()
+                pending.discard(port)
+            except OSError:
+                pass
+        if pending:
+            await asyncio.sleep(0.2)
+    return not pending
+
+
+async def serve(args, command):
+    env = dict(os.environ)
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+        for name, path in shared_paths(os.path.abspath(args.data_dir)).items():
+            env.setdefault(name, path)
+
+    # Migrate once here rather than have N workers queue up to do it
+    from database import init_database
+    init_database(env.get("MEDICAL_HISTORY_DB"))
+
+    ports = [args.worker_port + i for i in range(args.workers)]
+    supervisor = Supervisor(command, ports, env)
+    supervisor.start()
+    balancer = LoadBalancer([Backend(i, "127.0.0.1", port) for i, port in enumerate(ports)])
+    try:
+        if not await wait_for_ports("127.0.0.1", ports):
+            logging.warning("Not every worker came up in time; serving with those that did")
+        server = await asyncio.start_server(balancer.handle, args.host, args.port, limit=MAX_HEAD_BYTES)
+        print(f"Serving {args.workers} workers on http://{args.host}:{args.port}", flush=True)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        monitor = asyncio.ensure_future(supervisor.monitor())
+        async with server:
+            await stop.wait()
+        monitor.cancel()
+        logging.info(f"Load balancer stats: {balancer.stats()}")
+    finally:
+        supervisor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run N app processes behind a local load balancer")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("APP_WORKERS", os.cpu_count() or 2)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=7710, help="Public port of the load balancer")
+    parser.add_argument("--worker-port", type=int, default=7711, help="First worker port; workers use consecutive ports")
+    parser.add_argument("--data-dir", help="Directory for state shared by the workers")
+    parser.add_argument("command", nargs=argparse.REMAINDER,
+                        help="Worker command (default: python gradio_app.py); it must listen on $GRADIO_SERVER_PORT")
+    args = parser.parse_args()
+
+    from config import load_config
+    load_config()
+    logging.basicConfig(level=logging.INFO)
+    command = [part for part in args.command if part != "--"] or [sys.executable, os.path.join(REPO_ROOT, "gradio_app.py")]
+    asyncio.run(serve(args, command))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# translation_batcher.py
+import time
+import logging
+import threading
+
+import metrics
+
+
+class _Pending:
+    """One caller's text waiting in a batch"""
+
+    __slots__ = ("text", "enqueued", "done", "result", "fallback")
+
+    def __init__(self, text):
+        self.text = text
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.fallback = False
+
+
+class _Batch:
+    __slots__ = ("items", "chars", "full")
+
+    def __init__(self):
+        self.items = []
+        self.chars = 0
+        self.full = threading.Event()
+
+
+class TranslationBatcher:
+    """Coalesces concurrent translations into one multi-segment request.
+
+    The first caller for a (source, target, key) group opens a batch and
+    waits up to `window` seconds for others to join, or until the batch
+    holds max_items texts or max_chars characters; then it sends the whole
+    batch with translate_many(texts, *group) and hands each caller its
+    segment. A batch of one goes through translate_one(text, *group).
+
+    If translate_many raises (an API error or a reply that does not split
+    back into the right segments), every caller falls back to its own
+    translate_one call, in its own thread, so a bad batch costs one extra
+    round trip rather than N sequential ones.
+    """
+
+    def __init__(self, translate_one, translate_many, window=0.02, max_items=8, max_chars=6000):
+        self.translate_one = translate_one
+        self.translate_many = translate_many
+        self.window = window
+        self.max_items = max_items
+        self.max_chars = max_chars
+
+        self._lock = threading.Lock()
+        self._open = {}  # group -> _Batch still accepting texts
+
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.requests_saved = 0
+        self.fallbacks = 0
+        self.wait_seconds = 0.0
+
+    def _join(self, group, pending):
+        """Add pending to the group's open batch; returns (batch, is_leader)"""
+        size = len(pending.text)
+        with self._lock:
+            self.requests += 1
+            batch = self._open.get(group)
+            if batch is not None and batch.chars + size > self.max_chars:
+                # Would overflow: dispatch the open batch now and start a new one
+                batch.full.set()
+                del self._open[group]
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._open[group] = _Batch()
+            batch.items.append(pending)
+            batch.chars += size
+            if len(batch.items) >= self.max_items or batch.chars >= self.max_chars:
+                batch.full.set()
+                del self._open[group]
+        return batch, leader
+
+    def _close(self, group, batch):
+        with self._lock:
+            if self._open.get(group) is batch:
+                del self._open[group]
+
+    def _dispatch(self, group, batch):
+        items = batch.items
+        now = time.perf_counter()
+        for item in items:
+            metrics.record_batch_wait("translation", now - item.enqueued)
+        metrics.record_batch("translation", len(items))
+        with self._lock:
+            self.batches += 1
+            self.wait_seconds += sum(now - item.enqueued for item in items)
+            if len(items) > 1:
+                self.batched_requests += len(items)
+                self.requests_saved += len(items) - 1
+
+        if len(items) == 1:
+            items[0].result = self.translate_one(items[0].text, *group)
+            items[0].done.set()
+            return
+
+        try:
+            results = self.translate_many([item.text for item in items], *group)
+        except Exception as e:
+            logging.warning(f"Batched translation of {len(items)} texts failed, translating each separately: {e}")
+            metrics.record_error("translate_batch")
+            with self._lock:
+                self.fallbacks += 1
+                self.requests_saved -= len(items) - 1
+            for item in items:
+                item.fallback = True
+                item.done.set()
+            return
+        for item, result in zip(items, results):
+            item.result = result
+            item.done.set()
+
+    def translate(self, text, *group):
+        """Translate text, possibly as part of a batch with concurrent callers"""
+        pending = _Pending(text)
+        batch, leader = self._join(group, pending)
+        if leader:
+            batch.full.wait(self.window)
+            self._close(group, batch)
+            try:
+                self._dispatch(group, batch)
+            finally:
+                # Never leave followers waiting, whatever the leader hit
+                for item in batch.items:
+                    if not item.done.is_set():
+                        item.fallback = True
+                        item.done.set()
+        else:
+            pending.done.wait()
+        if pending.fallback:
+            return self.translate_one(text, *group)
+        return pending.result
+
+    def stats(self):
+        """Batch counts, requests saved and mean added wait"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "batched_requests": self.batched_requests,
+                "mean_batch_size": round(self.requests / self.batches, 3) if self.batches else 0.0,
+                "requests_saved": self.requests_saved,
+                "fallbacks": self.fallbacks,
+                "mean_wait_seconds": round(self.wait_seconds / self.requests, 4) if self.requests else 0.0,
+            }
@@ -0,0 +1,204 @@
+# translation_cache.py
+import os
+import time
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def make_key(text, source_lang, target_lang, model, temperature):
+    """Content-addressed cache key for one translation request"""
+    payload = json.dumps(
+        [normalize_text(text), source_lang, target_lang, model, round(float(temperature), 3)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Two-tier translation cache: in-memory LRU in front of optional SQLite.
+
+    The memory tier is bounded by entry count and total bytes. The disk tier
+    survives restarts and is bounded by entry count; both honour the TTL.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=8 * 1024 * 1024, ttl=None,
+                 db_path=None, db_max_entries=100000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, stored_at, size)
+        self._memory_bytes = 0
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.bytes_served = 0
+
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute('''CREATE TABLE IF NOT EXISTS translations (
+                                key TEXT PRIMARY KEY,
+                                value TEXT NOT NULL,
+                                stored_at REAL NOT NULL,
+                                last_access REAL NOT NULL
+                                )''')
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_access "
+                             "ON translations (last_access)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Translation cache disk tier disabled ({self.db_path}): {e}")
+            self._db = None
+
+    def _is_expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _remember(self, key, value, stored_at):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old:
+            self._memory_bytes -= old[2]
+        self._memory[key] = (value, stored_at, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached translation for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                value, stored_at, size = entry
+                if not self._is_expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    self.bytes_served += size
+                    return value
+                del self._memory[key]
+                self._memory_bytes -= size
+                self.expired += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT value, stored_at FROM translations WHERE key = ?",
+                                           (key,)).fetchone()
+                    if row and self._is_expired(row[1], now):
+                        self._db.execute("DELETE FROM translations WHERE key = ?", (key,))
+                        self._db.commit()
+                        self.expired += 1
+                    elif row:
+                        self._db.execute("UPDATE translations SET last_access = ? WHERE key = ?",
+                                         (now, key))
+                        self._db.commit()
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        self.bytes_served += len(row[0].encode("utf-8"))
+                        return row[0]
+                except sqlite3.Error as e:
+                    logging.warning(f"Translation cache read failed: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a translation in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT OR REPLACE INTO translations (key, value, stored_at, last_access) "
+                                 "VALUES (?, ?, ?, ?)", (key, value, now, now))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Translation cache write failed: {e}")
+
+    def prune(self):
+        """Drop expired disk entries and trim the disk tier to db_max_entries"""
+        if self._db is None:
+            return 0
+        with self._lock:
+            removed = 0
+            if self.ttl is not None:
+                removed += self._db.execute("DELETE FROM translations WHERE stored_at < ?",
+                                            (time.time() - self.ttl,)).rowcount
+            removed += self._db.execute(
+                "DELETE FROM translations WHERE key IN ("
+                "SELECT key FROM translations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.db_max_entries,)).rowcount
+            self._db.commit()
+            self.evictions += removed
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss/byte counters for both tiers"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "bytes_served": self.bytes_served,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache():
+    """Process-wide cache configured from TRANSLATION_CACHE_* environment variables"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = os.environ.get("TRANSLATION_CACHE_TTL")
+                cache = TranslationCache(
+                    max_entries=int(os.environ.get("TRANSLATION_CACHE_SIZE", 1024)),
+                    ttl=float(ttl) if ttl else None,
+                    db_path=os.environ.get("TRANSLATION_CACHE_DB") or None,
+                )
+                cache.prune()
+                _cache = cache
+    return _cache
@@ -0,0 +1,280 @@
+# tts_backends.py
+import os
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+import importlib.util
+import multiprocessing
+
+import metrics
+from config import env_flag
+from retry import get_breaker
+
+
+class TTSUnavailableError(Exception):
+    """Raised when every backend routed for a language failed or was skipped"""
+
+
+class TTSBackend:
+    """One way of turning text into an audio file.
+
+    cache_voice distinguishes this backend's output in the audio cache;
+    None keeps the cache keys used before backends existed.
+    """
+
+    name = "base"
+    cache_voice = None
+    languages = None  # None: any language
+
+    def available(self):
+        return True
+
+    def supports(self, language):
+        return self.languages is None or language in self.languages
+
+    def synthesize(self, text, output_filepath, language, slow=False):
+        raise NotImplementedError
+
+    def synthesize_bytes(self, text, language, slow=False):
+        """Audio for text as bytes"""
+        fd, path = tempfile.mkstemp(suffix=".tts")
+        os.close(fd)
+        try:
+            self.synthesize(text, path, language, slow)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    def warm(self):
+        """Do any slow start-up work now rather than on the first request"""
+
+    def close(self):
+        pass
+
+
+# --- Local engines ----------------------------------------------------------------
+
+def _espeak(binary, text, wav_path, language, rate, timeout):
+    subprocess.run([binary, "-v", language, "-s", str(rate), "-w", wav_path, "--stdin"],
+                   input=text.encode("utf-8"), capture_output=True, check=True, timeout=timeout)
+
+
+# pyttsx3 worker processes keep an initialized engine between requests
+_worker_engine = None
+_worker_voices = {}
+
+
+def _init_worker():
+    """Runs once per pool process, so engine start-up is paid before the first request"""
+    global _worker_engine
+    import pyttsx3
+    _worker_engine = pyttsx3.init()
+
+
+def _pyttsx3_voice(engine, language):
+    if language not in _worker_voices:
+        match = None
+        for voice in engine.getProperty("voices"):
+            codes = [code.decode("utf-8", "ignore") if isinstance(code, bytes) else str(code)
+                     for code in (voice.languages or [])]
+            # espeak voices report languages like b"\x05hi"; ids look like "inc/hi"
+            if any(code.lstrip("\x00\x01\x02\x03\x04\x05").startswith(language) for code in codes) \
+                    or voice.id.split("/")[-1] == language:
+                match = voice.id
+                break
+        _worker_voices[language] = match
+    return _worker_voices[language]
+
+
+def _worker_ping():
+    return os.getpid()
+
+
+def _worker_synthesize(text, wav_path, language, rate):
+    voice = _pyttsx3_voice(_worker_engine, language)
+    if voice is None:
+        raise ValueError(f"No local voice for language {language!r}")
+    _worker_engine.setProperty("voice", voice)
+    _worker_engine.setProperty("rate", rate)
+    _worker_engine.save_to_file(text, wav_path)
+    _worker_engine.runAndWait()
+
+
+def _encode_mp3(wav_path, output_filepath):
+    from pydub import AudioSegment
+    AudioSegment.from_wav(wav_path).export(output_filepath, format="mp3", bitrate="64k")
+
+
+class LocalTTSBackend(TTSBackend):
+    """Offline speech from espeak-ng, driven directly or through pyttsx3.
+
+    pyttsx3 runs in a pool of worker processes whose engines warm()
+    initializes ahead of time. espeak-ng runs as a short-lived process per
+    sentence, at most `workers` at once, because its CLI cannot keep one
+    process running between utterances; warm() only checks the binary.
+
+    Output is encoded to MP3 with pydub and ffmpeg, because the rest of the
+    app stores .mp3 files and joins per-sentence chunks by concatenation,
+    which only works for MP3. Without ffmpeg the backend reports itself unavailable, unless
+    allow_wav (LOCAL_TTS_ALLOW_WAV) is set for callers that only use
+    whole-file output, such as benchmarks.
+    """
+
+    name = "local"
+    languages = {"en", "hi"}
+    # Words per minute; espeak's default of 175 is brisk for medical advice
+    RATE = 160
+    SLOW_RATE = 120
+
+    def __init__(self, engine=None, workers=None, timeout=None, binary=None, allow_wav=None):
+        self.engine = engine or os.environ.get("LOCAL_TTS_ENGINE", "auto")
+        self.workers = workers or int(os.environ.get("LOCAL_TTS_WORKERS", 2))
+        self.timeout = timeout or float(os.environ.get("LOCAL_TTS_TIMEOUT", 30))
+        self.binary = (binary or os.environ.get("LOCAL_TTS_BINARY")
+                       or shutil.which("espeak-ng") or shutil.which("espeak"))
+        if self.engine == "auto":
+            self.engine = "pyttsx3" if importlib.util.find_spec("pyttsx3") else "espeak-ng"
+        self.cache_voice = f"local:{self.engine}"
+        self.encode_mp3 = bool(importlib.util.find_spec("pydub") and shutil.which("ffmpeg"))
+        self.allow_wav = env_flag("LOCAL_TTS_ALLOW_WAV") if allow_wav is None else allow_wav
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    def available(self):
+        if not self.encode_mp3 and not self.allow_wav:
+            return False
+        if self.engine == "pyttsx3":
+            return importlib.util.find_spec("pyttsx3") is not None
+        return self.binary is not None
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn, not fork: the app has live threads and sockets by now
+                    context = multiprocessing.get_context("spawn")
+                    self._pool = context.Pool(self.workers, initializer=_init_worker)
+        return self._pool
+
+    def warm(self):
+        if not self.available():
+            if not self.encode_mp3 and not self.allow_wav:
+                logging.warning("pydub or ffmpeg not found; local TTS is disabled")
+            return
+        if self.engine == "pyttsx3":
+            pool = self._get_pool()
+            pids = {pool.apply_async(_worker_ping).get(self.timeout) for _ in range(self.workers)}
+            logging.info(f"Local TTS (pyttsx3) ready with {len(pids)} warm workers")
+        else:
+            # Fails now, rather than on the first request, if the binary is broken
+            subprocess.run([self.binary, "--version"], capture_output=True, check=True, timeout=self.timeout)
+            logging.info(f"Local TTS (espeak-ng) ready, up to {self.workers} concurrent processes")
+
+    def synthesize(self, text, output_filepath, language, slow=False):
+        rate = self.SLOW_RATE if slow else self.RATE
+        fd, wav_path = tempfile.mkstemp(suffix=".wav", prefix="local_tts_")
+        os.close(fd)
+        try:
+            if self.engine == "pyttsx3":
+                self._get_pool().apply_async(_worker_synthesize, (text, wav_path, language, rate)).get(self.timeout)
+            else:
+                with self._slots:
+                    _espeak(self.binary, text, wav_path, language, rate, self.timeout)
+            if os.path.getsize(wav_path) == 0:
+                raise RuntimeError(f"{self.engine} produced no audio")
+            if self.encode_mp3:
+                _encode_mp3(wav_path, output_filepath)
+            else:
+                shutil.move(wav_path, output_filepath)
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+# --- Routing --------------------------------------------------------------------
+
+def parse_routes(spec):
+    """Parse "hi=local,gtts;*=gtts,local" into {"hi": [...], "*": [...]}"""
+    routes = {}
+    for part in spec.split(";"):
+        if "=" not in part:
+            continue
+        language, names = part.split("=", 1)
+        routes[language.strip()] = [name.strip() for name in names.split(",") if name.strip()]
+    return routes
+
+
+class TTSRouter:
+    """Picks backends per language and falls back down the list on failure.
+
+    Each backend has its own circuit breaker, so a backend that keeps
+    failing (e.g. gTTS while offline) is skipped without waiting for its
+    timeout until the breaker lets a trial call through again.
+    """
+
+    def __init__(self, backends, routes=None):
+        self.backends = {backend.name: backend for backend in backends}
+        self.routes = routes or {"*": list(self.backends)}
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def backends_for(self, language):
+        names = self.routes.get(language, self.routes.get("*", []))
+        return [self.backends[name] for name in names
+                if name in self.backends and self.backends[name].supports(language)
+                and self.backends[name].available()]
+
+    def _count(self, backend, outcome):
+        with self._lock:
+            key = f"{backend}_{outcome}"
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def run(self, language, attempt):
+        """Call attempt(backend) for each routed backend until one succeeds"""
+        errors = []
+        for position, backend in enumerate(self.backends_for(language)):
+            breaker = get_breaker(f"tts_{backend.name}")
+            if not breaker.allow():
+                errors.append(f"{backend.name}: circuit open")
+                continue
+            try:
+                result = attempt(backend)
+            except Exception as e:
+                breaker.record_failure()
+                metrics.record_error("tts")
+                self._count(backend.name, "failures")
+                logging.warning(f"TTS backend {backend.name} failed for {language!r}: {e}")
+                errors.append(f"{backend.name}: {e}")
+                continue
+            breaker.record_success()
+            self._count(backend.name, "successes")
+            if position:
+                self._count(backend.name, "fallbacks")
+            return result
+        raise TTSUnavailableError(f"No TTS backend could voice {language!r} ({'; '.join(errors) or 'none routed'})")
+
+    def warm(self):
+        for backend in self.backends.values():
+            try:
+                backend.warm()
+            except Exception as e:
+                logging.warning(f"Could not warm TTS backend {backend.name}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def close(self):
+        for backend in self.backends.values():
+            backend.close()
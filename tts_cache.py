@@ -0,0 +1,238 @@
+# tts_cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+import metrics
+
+# Other processes sharing the directory add files this one never counts, so
+# the running size total is re-synced with a full scan at least this often
+RESCAN_SECONDS = 300
+# Eviction frees space down to this fraction of max_bytes, so a full store
+# is scanned once per 10% of churn rather than on every miss
+EVICT_TARGET = 0.9
+
+
+def audio_key(text, lang, slow, voice=None):
+    """Content hash identifying one synthesized utterance"""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    fields = [normalized, lang, bool(slow)]
+    if voice is not None:
+        # Only non-default voices extend the key, so gTTS entries stay valid
+        fields.append(voice)
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioStore:
+    """Content-addressed store of synthesized speech files.
+
+    Each utterance is kept once under <root>/<key>.mp3. Callers get their
+    own output path as a hard link to the stored file (or a copy where links
+    are not supported). A per-key lock makes concurrent requests for the same
+    text wait for a single synthesis instead of each calling the TTS service,
+    and eviction skips files whose key is locked, so a file is never removed
+    while a caller is still reading it.
+    """
+
+    def __init__(self, root="tts_cache", max_bytes=200 * 1024 * 1024, suffix=".mp3"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        os.makedirs(root, exist_ok=True)
+
+        self._locks_guard = threading.Lock()
+        self._key_locks = {}
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Running total of stored bytes, so a miss doesn't rescan the directory
+        self._bytes = None  # unknown until the first scan
+        self._scanned_at = 0.0
+        self._evict_lock = threading.Lock()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key + self.suffix)
+
+    def _key_lock(self, key):
+        with self._locks_guard:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry
+
+    def _release_key_lock(self, key, entry):
+        with self._locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._key_locks.pop(key, None)
+
+    def get_or_create(self, text, lang, slow, synthesize, voice=None, use=None):
+        """Return the stored file for (text, lang, slow, voice), synthesizing on a miss.
+
+        synthesize(path) must write the audio to path; it runs at most once
+        per key at a time. If given, use(stored) runs before the key lock is
+        released and its result is returned instead of the path; callers that
+        read or link the file should do it there, so eviction can't remove it
+        first.
+        """
+        key = audio_key(text, lang, slow, voice)
+        stored = self.path_for(key)
+        entry = self._key_lock(key)
+        try:
+            with entry[0]:
+                try:
+                    os.utime(stored)  # mark as recently used for eviction
+                    result = use(stored) if use else stored
+                except FileNotFoundError:
+                    # Not stored, or evicted by another process sharing the directory
+                    pass
+                else:
+                    with self._stats_lock:
+                        self.hits += 1
+                    metrics.record_cache("tts", True)
+                    return result
+
+                fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+                os.close(fd)
+                try:
+                    synthesize(tmp_path)
+                    os.replace(tmp_path, stored)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                size = os.path.getsize(stored)
+                with self._stats_lock:
+                    self.misses += 1
+                metrics.record_cache("tts", False)
+                metrics.record_payload("tts", size, direction="download")
+                result = use(stored) if use else stored
+        finally:
+            self._release_key_lock(key, entry)
+
+        if self._added(size):
+            self.evict()
+        return result
+
+    def _added(self, size):
+        """Count a new file; True when the store may be over its cap and needs a scan"""
+        if not self.max_bytes:
+            return False
+        with self._stats_lock:
+            if self._bytes is None:
+                return True
+            self._bytes += size
+            return self._bytes > self.max_bytes or time.monotonic() - self._scanned_at > RESCAN_SECONDS
+
+    def materialize(self, stored, output_filepath):
+        """Expose a stored file at output_filepath without re-encoding it"""
+        if os.path.abspath(stored) == os.path.abspath(output_filepath):
+            return output_filepath
+        # Link or copy next to the target, then rename, so nobody sees a partial file
+        tmp = f"{output_filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            try:
+                os.link(stored, tmp)
+            except OSError:
+                shutil.copyfile(stored, tmp)
+            os.replace(tmp, output_filepath)
+        finally:
+            # rename() leaves both names in place when output_filepath is
+            # already a link to the same stored file
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+        return output_filepath
+
+    def usage(self):
+        """Return (file_count, total_bytes) of the store"""
+        count, total = 0, 0
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                count += 1
+                total += entry.stat().st_size
+        return count, total
+
+    def evict(self):
+        """Once the store exceeds max_bytes, delete least recently used files down to EVICT_TARGET of it"""
+        if not self.max_bytes:
+            return 0
+        # One scan at a time; a thread that finds one running can skip its own
+        if not self._evict_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._evict()
+        finally:
+            self._evict_lock.release()
+
+    def _evict(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        target = self.max_bytes * EVICT_TARGET if total > self.max_bytes else total
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            key = os.path.basename(path)[:-len(self.suffix)]
+            entry = self._key_lock(key)
+            try:
+                # Being synthesized or read right now, so not least recently used
+                if not entry[0].acquire(blocking=False):
+                    continue
+                try:
+                    # Hard links handed out to callers keep their own copy alive
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except FileNotFoundError:
+                    total -= size
+                except OSError as e:
+                    logging.warning(f"TTS cache eviction failed for {path}: {e}")
+                finally:
+                    entry[0].release()
+            finally:
+                self._release_key_lock(key, entry)
+        with self._stats_lock:
+            self.evictions += removed
+            self._bytes = total
+            self._scanned_at = time.monotonic()
+        return removed
+
+    def stats(self):
+        count, total = self.usage()
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "files": count,
+                "bytes": total,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store():
+    """Process-wide store configured from TTS_CACHE_DIR / TTS_CACHE_MAX_BYTES"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AudioStore(
+                    root=os.environ.get("TTS_CACHE_DIR", "tts_cache"),
+                    max_bytes=int(os.environ.get("TTS_CACHE_MAX_BYTES", 200 * 1024 * 1024)),
+                )
+    return _store
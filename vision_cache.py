@@ -0,0 +1,233 @@
+# vision_cache.py
+import os
+import re
+import time
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import metrics
+from translation_cache import normalize_text
+
+
+def normalize_query(text):
+    """Case, punctuation and whitespace-insensitive form of a prompt"""
+    text = normalize_text(text).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def query_key(query, model):
+    return hashlib.sha256(f"{model}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+
+def _decode_value(stored):
+    """Values are stored as JSON so fused (english, hindi) pairs survive the round trip"""
+    try:
+        value = json.loads(stored)
+    except ValueError:
+        return stored  # Plain text written before values were JSON-encoded
+    return tuple(value) if isinstance(value, list) else value
+
+
+class VisionCache:
+    """LRU cache of image analyses keyed on a perceptual image hash.
+
+    Entries are scoped to (user, model, normalized query); within a scope an
+    image matches when its dHash is within `threshold` bits of a cached one,
+    so re-captures of the same photo hit. Results never cross users.
+
+    With db_path, entries are also written to SQLite, which app processes
+    sharing the file consult on a memory miss, like TranslationCache's disk tier.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600.0, threshold=6, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.db_path = db_path
+        self._db = None
+
+        self._lock = threading.Lock()
+        # (user_id, query_key, image_hash) -> (value, stored_at, latency)
+        self._entries = OrderedDict()
+        # (user_id, query_key) -> set of image hashes in that scope
+        self._scopes = {}
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self.disk_hits = 0
+
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Hashes are stored as hex: a 64-bit dHash can overflow SQLite's signed INTEGER
+            self._db.execute('''CREATE TABLE IF NOT EXISTS vision_analyses (
+                                user_id TEXT NOT NULL,
+                                query_key TEXT NOT NULL,
+                                image_hash TEXT NOT NULL,
+                                value TEXT NOT NULL,
+                                stored_at REAL NOT NULL,
+                                latency REAL NOT NULL,
+                                PRIMARY KEY (user_id, query_key, image_hash)
+                                )''')
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_vision_analyses_stored_at "
+                             "ON vision_analyses (stored_at)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Vision cache disk tier disabled ({self.db_path}): {e}")
+            self._db = None
+
+    def _disk_lookup(self, scope_key, image_hash, now):
+        """Closest cached analysis for the scope in the shared tier, or None"""
+        try:
+            rows = self._db.execute(
+                "SELECT image_hash, value, stored_at, latency FROM vision_analyses "
+                "WHERE user_id = ? AND query_key = ? AND stored_at > ?",
+                (str(scope_key[0]), scope_key[1], now - self.ttl if self.ttl is not None else 0)).fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"Vision cache read failed: {e}")
+            return None
+        best = None
+        for cached_hex, value, stored_at, latency in rows:
+            distance = bin(int(cached_hex, 16) ^ image_hash).count("1")
+            if distance <= self.threshold and (best is None or distance < best[0]):
+                best = (distance, int(cached_hex, 16), value, stored_at, latency)
+        if best is not None:
+            best = best[:2] + (_decode_value(best[2]),) + best[3:]
+        return best
+
+    def _remember(self, key, value, stored_at, latency):
+        self._drop(key)
+        self._entries[key] = (value, stored_at, latency)
+        self._scopes.setdefault(key[:2], set()).add(key[2])
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        scope = self._scopes.get(key[:2])
+        if scope is not None:
+            scope.discard(key[2])
+            if not scope:
+                del self._scopes[key[:2]]
+
+    def get(self, user_id, query, model, image_hash):
+        """Return the cached analysis for a similar image, or None on a miss"""
+        if image_hash is None:
+            return None
+        scope_key = (user_id, query_key(query, model))
+        now = time.time()
+        with self._lock:
+            best = None
+            for cached_hash in list(self._scopes.get(scope_key, ())):
+                key = scope_key + (cached_hash,)
+                if self.ttl is not None and now - self._entries[key][1] > self.ttl:
+                    self._drop(key)
+                    self.expired += 1
+                    continue
+                distance = bin(cached_hash ^ image_hash).count("1")
+                if distance <= self.threshold and (best is None or distance < best[0]):
+                    best = (distance, key)
+
+            if best is None and self._db is not None:
+                found = self._disk_lookup(scope_key, image_hash, now)
+                if found is not None:
+                    distance, cached_hash, value, stored_at, latency = found
+                    self._remember(scope_key + (cached_hash,), value, stored_at, latency)
+                    self.disk_hits += 1
+                    best = (distance, scope_key + (cached_hash,))
+
+            if best is None:
+                self.misses += 1
+                metrics.record_cache("vision", False)
+                return None
+
+            distance, key = best
+            value, _, latency = self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if distance:
+                self.near_hits += 1
+            self.saved_seconds += latency
+            metrics.record_cache("vision", True)
+            return value
+
+    def put(self, user_id, query, model, image_hash, value, latency=0.0):
+        """Store an analysis along with how long the call took"""
+        if image_hash is None:
+            return
+        key = (user_id, query_key(query, model), image_hash)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now, latency)
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT OR REPLACE INTO vision_analyses VALUES (?, ?, ?, ?, ?, ?)",
+                                 (str(user_id), key[1], f"{image_hash:016x}",
+                                  json.dumps(value, ensure_ascii=False), now, latency))
+                if self.ttl is not None:
+                    self._db.execute("DELETE FROM vision_analyses WHERE stored_at < ?", (now - self.ttl,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Vision cache write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM vision_analyses")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters and the model time saved by hits"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_vision_cache():
+    """Process-wide cache configured from VISION_CACHE_* environment variables, or None if disabled"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                size = int(os.environ.get("VISION_CACHE_SIZE", 512))
+                if size <= 0:
+                    return None
+                ttl = os.environ.get("VISION_CACHE_TTL", "3600")
+                _cache = VisionCache(
+                    max_entries=size,
+                    ttl=float(ttl) if ttl else None,
+                    threshold=int(os.environ.get("VISION_CACHE_THRESHOLD", 6)),
+                    db_path=os.environ.get("VISION_CACHE_DB") or None,
+                )
+    return _cache
@@ -1,22 +1,173 @@
 # voice_of_the_doctor.py (Updated)
-from dotenv import load_dotenv
-load_dotenv()
+from config import load_config
 
+load_config()
+
+import io
 import os
-from gtts import gTTS
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from tts_cache import get_audio_store
+from tts_backends import TTSBackend, TTSRouter, LocalTTSBackend, parse_routes
 
-def text_to_speech_with_gtts(input_text, output_filepath, language="en"):
-    if not input_text.strip():
-        return ""
-        
-    try:
-        audioobj = gTTS(
-            text=input_text,
+# Split after sentence-ending punctuation, including the Devanagari danda
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?।॥])\s+")
+
+# Imported on first synthesis (gtts pulls in requests); tests may assign a stand-in
+gTTS = None
+
+
+def _get_gtts():
+    global gTTS
+    if gTTS is None:
+        from gtts import gTTS as gtts_class
+        gTTS = gtts_class
+    return gTTS
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate's TTS service (network)"""
+
+    name = "gtts"
+
+    def synthesize(self, text, output_filepath, language, slow=False):
+        audioobj = _get_gtts()(
+            text=text,
             lang=language,
-            slow=False
+            slow=slow
         )
         audioobj.save(output_filepath)
+
+    def synthesize_bytes(self, text, language, slow=False):
+        buffer = io.BytesIO()
+        _get_gtts()(text=text, lang=language, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_tts_router():
+    """Process-wide backend router.
+
+    TTS_ROUTES maps languages to backends in order of preference, e.g.
+    "hi=local,gtts;*=gtts,local"; by default gTTS is tried first and the
+    local engine is the fallback. Backends that are not installed are skipped.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = TTSRouter([GTTSBackend(), LocalTTSBackend()],
+                                    parse_routes(os.environ.get("TTS_ROUTES", "*=gtts,local")))
+    return _router
+
+
+def _synthesize_file(backend, input_text, output_filepath, language, slow, use_cache):
+    if not use_cache:
+        backend.synthesize(input_text, output_filepath, language, slow)
         return output_filepath
+    store = get_audio_store()
+    return store.get_or_create(
+        input_text, language, slow,
+        lambda path: backend.synthesize(input_text, path, language, slow),
+        voice=backend.cache_voice,
+        use=lambda stored: store.materialize(stored, output_filepath),
+    )
+
+
+def text_to_speech(input_text, output_filepath, language="en", slow=False, use_cache=True):
+    """Voice input_text into output_filepath with the first backend that succeeds.
+
+    Returns the path, or "" if every backend routed for the language failed.
+    """
+    if not input_text.strip():
+        return ""
+
+    try:
+        return get_tts_router().run(
+            language,
+            lambda backend: _synthesize_file(backend, input_text, output_filepath, language, slow, use_cache)
+        )
     except Exception as e:
         print(f"TTS error: {e}")
-        return ""
\ No newline at end of file
+        metrics.record_error("tts")
+        return ""
+
+
+# The original, gTTS-only name; synthesis is routed like text_to_speech
+text_to_speech_with_gtts = text_to_speech
+
+
+def split_sentences(text):
+    """Split text into sentences for chunked synthesis"""
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _sentence_bytes(backend, sentence, language, slow, use_cache):
+    if not use_cache:
+        return backend.synthesize_bytes(sentence, language, slow)
+    return get_audio_store().get_or_create(
+        sentence, language, slow,
+        lambda path: backend.synthesize(sentence, path, language, slow),
+        voice=backend.cache_voice,
+        use=_read_bytes,
+    )
+
+
+def synthesize_sentence(sentence, language="en", slow=False, use_cache=True):
+    """MP3 bytes for one sentence, from the audio cache when possible"""
+    return get_tts_router().run(
+        language, lambda backend: _sentence_bytes(backend, sentence, language, slow, use_cache))
+
+
+def stream_text_to_speech(input_text, output_filepath=None, language="en", slow=False,
+                          use_cache=True, max_workers=4):
+    """Yield MP3 bytes sentence by sentence while later sentences synthesize.
+
+    All sentences are submitted at once and yielded in order, so playback can
+    start as soon as the first one is ready. MP3 frames concatenate cleanly,
+    so the chunks are also appended to output_filepath to produce the
+    complete file for the consultation record. output_filepath is only
+    created if at least one sentence was voiced and the stream ran to the end.
+    """
+    sentences = split_sentences(input_text)
+    if not sentences:
+        return
+
+    part_path = f"{output_filepath}.part" if output_filepath else None
+    out = open(part_path, "wb") if part_path else None
+    written = False
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(sentences))) as executor:
+            futures = [executor.submit(synthesize_sentence, s, language, slow, use_cache) for s in sentences]
+            for sentence, future in zip(sentences, futures):
+                try:
+                    chunk = future.result()
+                except Exception as e:
+                    print(f"TTS error for sentence '{sentence[:40]}': {e}")
+                    metrics.record_error("tts")
+                    continue
+                if out:
+                    out.write(chunk)
+                    written = True
+                yield chunk
+        if out:
+            out.close()
+            out = None
+            # Leave no file at all, rather than an empty MP3, if every sentence failed
+            if written:
+                os.replace(part_path, output_filepath)
+    finally:
+        if out:
+            out.close()
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
@@ -1,32 +1,114 @@
 # voice_of_the_patient.py (Updated with better retry handling)
-from dotenv import load_dotenv
+from config import load_config
 
-load_dotenv()
+load_config()
 
+import re
 import logging
-from groq import Groq
-import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from retry import RetryPolicy, call_with_retry, get_breaker
+from groq_client import get_groq_client
+from audio_preprocessing import AudioSegment, prepare_audio, split_on_pauses, export_segment
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Recordings longer than this are split and transcribed chunk by chunk
+LONG_AUDIO_SECONDS = float(os.environ.get("STT_LONG_AUDIO_SECONDS", 45))
+CHUNK_SECONDS = float(os.environ.get("STT_CHUNK_SECONDS", 20))
+CHUNK_OVERLAP_MS = int(os.environ.get("STT_CHUNK_OVERLAP_MS", 500))
+CHUNK_WORKERS = int(os.environ.get("STT_CHUNK_WORKERS", 4))
+# Longest run of repeated words removed where two chunk transcripts meet
+MAX_SEAM_WORDS = 8
 
-def transcribe_with_groq(stt_model, audio_filepath, GROQ_API_KEY, language="en", max_retries=3):
-    client = Groq(api_key=GROQ_API_KEY)
-
-    for attempt in range(max_retries):
-        try:
-            with open(audio_filepath, "rb") as audio_file:
-                transcription = client.audio.transcriptions.create(
-                    model=stt_model,
-                    file=audio_file,
-                    language=language
-                )
-            return transcription.text
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # Exponential backoff
-                logging.warning(f"Transcription attempt {attempt + 1} failed. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                logging.error(f"Transcription failed after {max_retries} attempts: {e}")
-                return "Could not transcribe audio. Please try again."
\ No newline at end of file
+
+def _transcribe_file(client, stt_model, path, language, max_retries):
+    def attempt():
+        with open(path, "rb") as audio_file:
+            return client.audio.transcriptions.create(
+                model=stt_model,
+                file=audio_file,
+                language=language
+            )
+
+    return call_with_retry(
+        attempt,
+        policy=RetryPolicy(max_attempts=max_retries),
+        breaker=get_breaker("stt"),
+        operation="Transcription",
+        on_retry=lambda attempt_number, e: metrics.record_retry("transcribe")
+    ).text
+
+
+def _seam_word(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def merge_transcripts(parts, max_overlap_words=MAX_SEAM_WORDS):
+    """Join chunk transcripts, dropping words repeated across a seam by the overlap"""
+    words = []
+    for part in parts:
+        new = part.split()
+        overlap = 0
+        for n in range(min(max_overlap_words, len(words), len(new)), 0, -1):
+            if [_seam_word(w) for w in words[-n:]] == [_seam_word(w) for w in new[:n]]:
+                overlap = n
+                break
+        words.extend(new[overlap:])
+    return " ".join(words)
+
+
+def transcribe_long_audio(stt_model, audio_filepath, GROQ_API_KEY, language="en", max_retries=3,
+                          chunk_seconds=None, overlap_ms=None, max_workers=None):
+    """Transcribe a long recording as overlapping chunks split at pauses, in parallel.
+
+    Each chunk is retried on its own, so a transient failure costs one chunk's
+    upload rather than the whole recording. Raises if any chunk still fails.
+    """
+    client = get_groq_client(GROQ_API_KEY)
+    audio = AudioSegment.from_file(audio_filepath)
+    pieces = split_on_pauses(audio, int((chunk_seconds or CHUNK_SECONDS) * 1000),
+                             overlap_ms=CHUNK_OVERLAP_MS if overlap_ms is None else overlap_ms)
+    paths = []
+    try:
+        for _, segment in pieces:
+            paths.append(export_segment(segment))
+        for path in paths:
+            metrics.record_payload("transcribe", os.path.getsize(path))
+        with ThreadPoolExecutor(max_workers=max_workers or CHUNK_WORKERS) as executor:
+            texts = list(executor.map(
+                lambda path: _transcribe_file(client, stt_model, path, language, max_retries), paths))
+    finally:
+        for path in paths:
+            os.remove(path)
+    logging.info(f"Transcribed {len(audio) / 1000:.1f}s of audio in {len(pieces)} chunks")
+    return merge_transcripts(texts)
+
+
+def transcribe_with_groq(stt_model, audio_filepath, GROQ_API_KEY, language="en", max_retries=3,
+                         preprocess=True, long_audio=True):
+    client = get_groq_client(GROQ_API_KEY)
+
+    # Upload a trimmed, mono, 16 kHz re-encode instead of the raw recording
+    prepared = None
+    upload_path = audio_filepath
+    if preprocess and audio_filepath and os.path.exists(audio_filepath):
+        prepared = prepare_audio(audio_filepath)
+        upload_path = prepared.path
+
+    try:
+        # Duration is only known when the recording could be decoded
+        duration = prepared.processed_duration if prepared else None
+        if long_audio and duration and duration > LONG_AUDIO_SECONDS:
+            return transcribe_long_audio(stt_model, upload_path, GROQ_API_KEY, language, max_retries)
+        if upload_path and os.path.exists(upload_path):
+            metrics.record_payload("transcribe", os.path.getsize(upload_path))
+        return _transcribe_file(client, stt_model, upload_path, language, max_retries)
+    except Exception as e:
+        logging.error(f"Transcription failed: {e}")
+        metrics.record_error("transcribe")
+        return "Could not transcribe audio. Please try again."
+    finally:
+        if prepared:
+            prepared.cleanup()